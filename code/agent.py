@@ -25,23 +25,48 @@ SOFTWARE.
 import os
 from pickle import FALSE
 import sys
+import signal
 import json
+import time
 from textwrap import indent
 import requests
 import argparse
 import logging
+import contextvars
 from benchmark_loader import BenchmarkLoader
+import api_client
+import response_cache
+import cassette
+import retry
+import concurrency
+import budget
+import call_metrics
+import tracing
+import checkpoint
+import log_writer
+import events
+import result_record
+from fanout import FanOut, first_to_pass, check_cancelled
+from usage import record_usage
+from verdict import parse_verdict
 
 # --- CONFIGURATION ---
 # The model to use. "gemini-1.5-flash" is fast and capable.
 #MODEL_NAME = "gemini-1.5-flash-latest" 
 MODEL_NAME = "gemini-2.5-pro" 
 # Use the Generative Language API endpoint, which is simpler for API key auth
-API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent"
+API_URL = os.getenv("GEMINI_API_URL", f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent")
+# Provider key for the shared HTTP connection pool (see api_client.py)
+PROVIDER = "gemini"
 
 # Global variables for logging
 _log_file = None
 original_print = print
+# Buffered stdout, written out by a background thread (see log_writer.py)
+_stdout = log_writer.stdout_writer()
+# Per-agent log target (log_file, echo_to_stdout) when several agents share
+# one process, e.g. the asyncio tasks of agent_async.py. Overrides _log_file.
+_agent_log = contextvars.ContextVar("agent_log", default=None)
 
 def log_print(*args, **kwargs):
     """
@@ -56,13 +81,19 @@ def log_print(*args, **kwargs):
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         message = f"[{timestamp}] {message}"
     
+    agent_log = _agent_log.get()
+    if agent_log is not None:
+        log_file, echo = agent_log
+    else:
+        log_file, echo = _log_file, True
+
     # Print to stdout
-    original_print(message)
+    if echo:
+        _stdout.write(message + '\n')
     
     # Also write to log file if specified
-    if _log_file is not None:
-        _log_file.write(message + '\n')
-        _log_file.flush()  # Ensure immediate writing
+    if log_file is not None:
+        log_file.write(message + '\n')
 
 # Replace the built-in print function
 print = log_print
@@ -72,7 +103,7 @@ def set_log_file(log_file_path):
     global _log_file
     if log_file_path:
         try:
-            _log_file = open(log_file_path, 'w', encoding='utf-8')
+            _log_file = log_writer.open_log(log_file_path)
             return True
         except Exception as e:
             print(f"Error opening log file {log_file_path}: {e}")
@@ -86,6 +117,14 @@ def close_log_file():
         _log_file.close()
         _log_file = None
 
+def use_agent_log(log_file, echo=True):
+    """
+    Route log_print output of the current context (thread or asyncio task)
+    to log_file instead of the global log file. If echo is False, the
+    output is not printed to stdout.
+    """
+    _agent_log.set((log_file, echo))
+
 def save_memory(memory_file, problem_statement, other_prompts, current_iteration, max_runs, solution=None, verify=None):
     """
     Save the current state to a memory file.
@@ -239,6 +278,9 @@ def get_api_key():
     """
 
     api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and cassette.replaying():
+        # Replayed calls are served offline
+        return ""
     if not api_key:
         print("Error: GOOGLE_API_KEY environment variable not set.")
         print("Please set the variable, e.g., 'export GOOGLE_API_KEY=\"your_api_key\"'")
@@ -306,14 +348,55 @@ def send_api_request(api_key, payload):
     }
     
     #print("Sending request to Gemini API...")
-    try:
-        response = requests.post(API_URL, headers=headers, data=json.dumps(payload))
+    # Branches of a fan-out that has been decided make no more calls
+    check_cancelled()
+    # Past the downgrade point of the agent's budget, calls go to the cheaper model
+    model = budget.budget_model(MODEL_NAME)
+    call_metrics.start_call(PROVIDER, model)
+    api_url = API_URL.replace(f"/models/{MODEL_NAME}:", f"/models/{model}:")
+    started = time.time()
+    # Calls answered before the agent was restarted are served from its checkpoint journal
+    ticket, journaled = checkpoint.replay_call(PROVIDER, api_url, payload)
+    if journaled is not None:
+        record_usage(journaled, model)
+        events.api_call(PROVIDER, "journal", started, payload, journaled)
+        return journaled
+
+    # Serve repeated requests (re-runs, resumed sweeps) from the response cache
+    cache_key = response_cache.cache_key(PROVIDER, api_url, payload)
+    cached = response_cache.cache_get(cache_key)
+    if cached is not None:
+        events.api_call(PROVIDER, "cache", started, payload, cached)
+        return checkpoint.record_call(ticket, PROVIDER, payload, cached)
+    if cassette.replaying():
+        # A recorded cassette stands in for the API
+        response_data = cassette.replay(PROVIDER, api_url, payload)
+        record_usage(response_data, model)
+        events.api_call(PROVIDER, "cassette", started, payload, response_data)
+        return checkpoint.record_call(ticket, PROVIDER, payload, response_data)
+
+    budget.check_budget()
+
+    def attempt():
+        response = api_client.post(PROVIDER, api_url, headers, payload)
         response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
         return response.json()
+
+    try:
+        # Transient errors (429, 5xx, dropped connections) are retried instead of failing the run
+        response_data = retry.call_with_retry(PROVIDER, attempt, log=print)
+        record_usage(response_data, model)
+        response_cache.cache_put(cache_key, PROVIDER, response_data)
+        cassette.record(PROVIDER, api_url, payload, started, response_data)
+        events.api_call(PROVIDER, "api", started, payload, response_data)
+        return checkpoint.record_call(ticket, PROVIDER, payload, response_data)
     except requests.exceptions.RequestException as e:
+        cassette.record(PROVIDER, api_url, payload, started, error=e)
+        events.api_call(PROVIDER, "api", started, payload, error=e)
         print(f"Error during API request: {e}")
-        if response.status_code == 400:
-            print(f"Possible reason for 400: Model '{MODEL_NAME}' might not be available or URL is incorrect for your setup.")
+        response = getattr(e, "response", None)
+        if response is not None and response.status_code == 400:
+            print(f"Possible reason for 400: Model '{model}' might not be available or URL is incorrect for your setup.")
             print(f"Raw API Response (if available): {response.text}")
         #sys.exit(1)
         raise e
@@ -347,6 +430,7 @@ def extract_detailed_solution(solution, marker='Detailed Solution', after=True):
     else:
         return solution[:idx].strip()
 
+@tracing.traced("verify_solution")
 def verify_solution(problem_statement, solution, verbose=True):
 
     dsol = extract_detailed_solution(solution)
@@ -372,24 +456,32 @@ def verify_solution(problem_statement, solution, verbose=True):
     
     if(verbose):
         print(">>>>>>> Verification prompt:")
-        print(json.dumps(p2, indent=4))
+        print(events.dump(p2))
 
+    checkpoint.set_state(phase="verify")
     res = send_api_request(get_api_key(), p2)
     out = extract_text_from_response(res) 
 
     if(verbose):
         print(">>>>>>> Verification results:")
-        print(json.dumps(out, indent=4))
-
-    check_correctness = """Response in "yes" or "no". Is the following statement saying the solution is correct, or does not contain critical error or a major justification gap?""" \
-            + "\n\n" + out 
-    prompt = build_request_payload(system_prompt="", question_prompt=check_correctness)
-    r = send_api_request(get_api_key(), prompt)
-    o = extract_text_from_response(r) 
+        print(events.dump(out))
+
+    # The verifier already states its verdict; only ask the LLM when that is ambiguous
+    verdict = parse_verdict(out)
+    if(verdict is None):
+        check_correctness = """Response in "yes" or "no". Is the following statement saying the solution is correct, or does not contain critical error or a major justification gap?""" \
+                + "\n\n" + out 
+        prompt = build_request_payload(system_prompt="", question_prompt=check_correctness)
+        checkpoint.set_state(phase="check")
+        with tracing.span("check"):
+            r = send_api_request(get_api_key(), prompt)
+            o = extract_text_from_response(r)
+    else:
+        o = "yes" if verdict else "no"
 
     if(verbose):
-        print(">>>>>>> Is verification good?")
-        print(json.dumps(o, indent=4))
+        print(f">>>>>>> Is verification good? ({'parsed from verdict' if verdict is not None else 'LLM check'})")
+        print(events.dump(o))
         
     bug_report = ""
 
@@ -417,10 +509,101 @@ def verify_solution(problem_statement, solution, verbose=True):
 
     if(verbose):
         print(">>>>>>>Bug report:")
-        print(json.dumps(bug_report, indent=4))
+        print(events.dump(bug_report))
     
+    events.emit("verification", verdict="pass" if "yes" in o.lower() else "fail",
+                verdict_source="parsed" if verdict is not None else "llm",
+                solution=dsol, verification=out, bug_report=bug_report)
+    result_record.note_verification("pass" if "yes" in o.lower() else "fail",
+                                    "parsed" if verdict is not None else "llm", bug_report)
     return bug_report, o
 
+@tracing.traced("confirm_solution")
+def confirm_solution(problem_statement, solution, count):
+    """
+    Runs `count` confirmation verifications of the same solution at the same
+    time instead of one after another, and stops at the first one that does
+    not pass (the others are abandoned).
+    Returns (number of passes, verify, good_verify), where verify/good_verify
+    come from the failing verification, or from the last one if all passed.
+    The verifications bypass the response cache: they are meant as fresh,
+    independent samples, so a re-run does not replay cached verdicts.
+    """
+    print(f">>>>>>> Running {count} confirmation verifications in parallel ...")
+    passed = 0
+    verify, good_verify = "", "yes"
+    with response_cache.bypass_cache():
+        with FanOut([lambda: verify_solution(problem_statement, solution, False)] * count) as results:
+            for index, (verify, good_verify) in results:
+                print(f">>>>>>> Confirmation verification {index}: {good_verify}")
+                if("yes" not in good_verify.lower()):
+                    print(">>>>>>> Confirmation failed, cancelling the remaining verifications.")
+                    print(">>>>>>>Bug report:")
+                    print(events.dump(verify))
+                    break
+                passed += 1
+    return passed, verify, good_verify
+
+def build_correction_payload(problem_statement, other_prompts, solution, verify):
+    """
+    Builds the payload asking the model to correct `solution` according to the bug report `verify`.
+    """
+    p1 = build_request_payload(
+        system_prompt=step1_prompt,
+        question_prompt=problem_statement,
+        other_prompts=other_prompts
+    )
+
+    p1["contents"].append(
+        {"role": "model",
+        "parts": [{"text": solution}]
+        }
+    )
+
+    p1["contents"].append(
+        {"role": "user",
+        "parts": [{"text": correction_prompt},
+                  {"text": verify}]
+        }
+    )
+    return p1
+
+@tracing.traced("branch_corrections")
+def branch_corrections(problem_statement, other_prompts, solution, verify, branches):
+    """
+    Starts `branches` correction requests from the same bug report at once,
+    verifies each corrected solution as it arrives, and continues with the
+    first one that passes (the other branches are abandoned). If none passes,
+    the first corrected solution to finish is kept. The status, latency and
+    token usage of every branch are logged.
+    Returns (solution, verify, good_verify).
+    """
+    p1 = build_correction_payload(problem_statement, other_prompts, solution, verify)
+    print(f">>>>>>> Starting {branches} correction branches from the same bug report ...")
+    print(">>>>>>> New prompt:")
+    print(events.dump(p1))
+
+    def attempt(branch, stop):
+        checkpoint.set_state(phase="correction")
+        with tracing.span("correction"):
+            response = send_api_request(get_api_key(), p1)
+            new_solution = extract_text_from_response(response)
+        if stop.is_set():
+            return None
+        new_verify, new_good_verify = verify_solution(problem_statement, new_solution, False)
+        return new_solution, new_verify, new_good_verify
+
+    # Fresh samples, like the confirmations (see confirm_solution)
+    with response_cache.bypass_cache():
+        result, records = first_to_pass(attempt, branches, lambda r: "yes" in r[2].lower())
+    print(f">>>>>>> Correction branches: {json.dumps(records)}")
+
+    new_solution, new_verify, new_good_verify = result
+    print(">>>>>>> Corrected solution:")
+    print(events.dump(new_solution))
+    print(f">>>>>>> verify results: {new_good_verify}")
+    return new_solution, new_verify, new_good_verify
+
 def check_if_solution_claimed_complete(solution):
     check_complete_prompt = f"""
 Is the following text claiming that the solution is complete?
@@ -441,6 +624,7 @@ Response in exactly "yes" or "no". No other words.
     return "yes" in o.lower()
 
 
+@tracing.traced("init_explorations")
 def init_explorations(problem_statement, verbose=True, other_prompts=[]):
     p1  = build_request_payload(
             system_prompt=step1_prompt,
@@ -451,13 +635,14 @@ def init_explorations(problem_statement, verbose=True, other_prompts=[]):
         )
 
     print(f">>>>>> Initial prompt.")
-    print(json.dumps(p1, indent=4))
+    print(events.dump(p1))
 
+    checkpoint.set_state(phase="init")
     response1 = send_api_request(get_api_key(), p1)
     output1 = extract_text_from_response(response1)
 
     print(f">>>>>>> First solution: ") 
-    print(json.dumps(output1, indent=4))
+    print(events.dump(output1))
 
     print(f">>>>>>> Self improvement start:")
     p1["contents"].append(
@@ -471,10 +656,13 @@ def init_explorations(problem_statement, verbose=True, other_prompts=[]):
         }
     )
 
-    response2 = send_api_request(get_api_key(), p1)
-    solution = extract_text_from_response(response2)
+    checkpoint.set_state(phase="self_improve")
+
+    with tracing.span("self_improvement"):
+        response2 = send_api_request(get_api_key(), p1)
+        solution = extract_text_from_response(response2)
     print(f">>>>>>> Corrected solution: ")
-    print(json.dumps(solution, indent=4))
+    print(events.dump(solution))
     
     #print(f">>>>>>> Check if solution is complete:"  )
     #is_complete = check_if_solution_claimed_complete(output1)
@@ -486,12 +674,13 @@ def init_explorations(problem_statement, verbose=True, other_prompts=[]):
     verify, good_verify = verify_solution(problem_statement, solution, verbose)
 
     print(f">>>>>>> Initial verification: ")
-    print(json.dumps(verify, indent=4))
+    print(events.dump(verify))
     print(f">>>>>>> verify results: {good_verify}")
     
     return p1, solution, verify, good_verify
 
-def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_memory=False):
+@tracing.traced("agent")
+def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_memory=False, parallel_confirm=False, correction_branches=1):
     if resume_from_memory and memory_file:
         # Load memory and resume from previous state
         memory = load_memory(memory_file)
@@ -527,6 +716,9 @@ def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_mem
     success = False
     for i in range(current_iteration, 30):
         print(f"Number of iterations: {i}, number of corrects: {correct_count}, number of errors: {error_count}")
+        checkpoint.set_state(iteration=i, correct_count=correct_count, error_count=error_count)
+        events.emit("iteration")
+        verified = False
 
         if("yes" not in good_verify.lower()):
             # clear
@@ -535,35 +727,25 @@ def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_mem
 
             #self improvement
             print(">>>>>>> Verification does not pass, correcting ...")
-            # establish a new prompt that contains the solution and the verification
-
-            p1 = build_request_payload(
-                system_prompt=step1_prompt,
-                question_prompt=problem_statement,
-                #other_prompts=["You may use analytic geometry to solve the problem."]
-                other_prompts=other_prompts
-            )
-
-            p1["contents"].append(
-                {"role": "model",
-                "parts": [{"text": solution}]
-                }
-            )
-            
-            p1["contents"].append(
-                {"role": "user",
-                "parts": [{"text": correction_prompt},
-                          {"text": verify}]
-                }
-            )
-
-            print(">>>>>>> New prompt:")
-            print(json.dumps(p1, indent=4))
-            response2 = send_api_request(get_api_key(), p1)
-            solution = extract_text_from_response(response2)
-
-            print(">>>>>>> Corrected solution:")
-            print(json.dumps(solution, indent=4))
+
+            if(correction_branches > 1):
+                # Each branch verifies its own correction
+                solution, verify, good_verify = branch_corrections(
+                    problem_statement, other_prompts, solution, verify, correction_branches)
+                verified = True
+            else:
+                # establish a new prompt that contains the solution and the verification
+                p1 = build_correction_payload(problem_statement, other_prompts, solution, verify)
+
+                print(">>>>>>> New prompt:")
+                print(events.dump(p1))
+                checkpoint.set_state(phase="correction")
+                with tracing.span("correction"):
+                    response2 = send_api_request(get_api_key(), p1)
+                    solution = extract_text_from_response(response2)
+
+                print(">>>>>>> Corrected solution:")
+                print(events.dump(solution))
 
 
             #print(f">>>>>>> Check if solution is complete:"  )
@@ -572,13 +754,18 @@ def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_mem
             #    print(f">>>>>>> Solution is not complete. Failed.")
             #    return None
 
-        print(f">>>>>>> Verify the solution.")
-        verify, good_verify = verify_solution(problem_statement, solution)
+        if(not verified):
+            print(f">>>>>>> Verify the solution.")
+            verify, good_verify = verify_solution(problem_statement, solution)
 
         if("yes" in good_verify.lower()):
             print(">>>>>>> Solution is good, verifying again ...")
             correct_count += 1
             error_count = 0
+
+            if(parallel_confirm and correct_count < 5):
+                passed, verify, good_verify = confirm_solution(problem_statement, solution, 5 - correct_count)
+                correct_count += passed
  
 
         # Save memory every iteration
@@ -587,7 +774,7 @@ def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_mem
         
         if(correct_count >= 5):
             print(">>>>>>> Correct solution found.")
-            print(json.dumps(solution, indent=4))
+            print(events.dump(solution))
             return solution
 
         elif(error_count >= 10):
@@ -620,9 +807,60 @@ if __name__ == "__main__":
                        help='Filter benchmark by level (Basic, Advanced). Case-insensitive.')
     parser.add_argument('--benchmark-index', '-i', type=int, default=0,
                        help='Index of problem to load from filtered benchmark (default: 0)')
+    parser.add_argument('--parallel-confirm', action='store_true',
+                       help='Run the remaining confirmation verifications of a passing solution in parallel')
+    parser.add_argument('--correction-branches', type=int, default=1,
+                       help='Number of correction requests to race from each bug report (default: 1)')
+    parser.add_argument('--cache', type=str,
+                       help='SQLite file that caches API responses across runs (optional)')
+    parser.add_argument('--cache-max-mb', type=int, default=1024,
+                       help='Evict least recently used cache entries above this size (default: 1024)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                       help='Ignore cache entries older than this many seconds (default: no expiry)')
+    parser.add_argument('--cache-namespace', type=str, default='',
+                       help='Sample namespace, so parallel agents on one problem get distinct cached or recorded samples')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Sample every call fresh: neither read nor store cached responses, even with --cache')
+    parser.add_argument('--record', type=str,
+                       help='Record every API call into this cassette file (optional)')
+    parser.add_argument('--replay', type=str,
+                       help='Serve API calls offline from this cassette file (optional)')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                       help='Replay speed relative to the recorded latencies; 0 replays instantly (default: 1)')
+    parser.add_argument('--checkpoint', '-c', type=str,
+                       help='Checkpoint journal of every API call; an existing journal is resumed at the exact call it stopped at (optional)')
+    parser.add_argument('--events', type=str,
+                       help='Structured JSONL event log; large texts go to a blob store and the text log only references them (optional)')
+    parser.add_argument('--blob-dir', type=str,
+                       help='Blob store of the event log (default: blobs/ next to the event log)')
+    parser.add_argument('--trace', type=str,
+                       help='Write a Chrome trace (chrome://tracing, ui.perfetto.dev) of the agent phases and API calls to this file (optional)')
+    parser.add_argument('--result', type=str,
+                       help='Write a JSON result record (solved, solution, runs, iterations, calls, tokens, wall time, last verification) to this file (optional)')
+    parser.add_argument('--adaptive-concurrency', type=int, metavar='MAX',
+                       help='Limit the requests in flight per provider with an AIMD controller that grows the limit up to MAX while responses are healthy and halves it on 429s and latency spikes (optional)')
+    parser.add_argument('--budget-tokens', type=int,
+                       help='Stop the agent once its API calls have used this many tokens (optional)')
+    parser.add_argument('--budget-usd', type=float,
+                       help='Stop the agent once its API calls have cost this many US dollars at the IMO_PRICES rates (optional)')
+    parser.add_argument('--budget-downgrade-model', type=str,
+                       help='Send the calls made past --budget-downgrade-at of the budget to this cheaper model (optional)')
+    parser.add_argument('--budget-downgrade-at', type=float, default=None,
+                       help='Share of the budget after which calls go to --budget-downgrade-model (default: 0.8)')
 
     args = parser.parse_args()
 
+    response_cache.use_cache_namespace(args.cache_namespace)
+    if args.cache and not args.no_cache:
+        response_cache.configure_cache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024, ttl=args.cache_ttl)
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be used together")
+    if args.adaptive_concurrency:
+        concurrency.configure_concurrency(max_limit=args.adaptive_concurrency)
+    if args.record or args.replay:
+        cassette.configure_cassette(args.record or args.replay, "record" if args.record else "replay",
+                                    speed=args.replay_speed)
+
     max_runs = args.max_runs
     memory_file = args.memory
     resume_from_memory = args.resume
@@ -645,6 +883,23 @@ if __name__ == "__main__":
             sys.exit(1)
         print(f"Logging to file: {args.log}")
 
+    journal = None
+    if args.checkpoint:
+        journal = checkpoint.Journal(args.checkpoint)
+        checkpoint.use_journal(journal)
+        if journal.loaded:
+            print(f">>>>>>> Resuming from checkpoint {args.checkpoint}: {journal.loaded} calls journaled")
+
+    event_log = None
+    if args.events:
+        event_log = events.EventLog(args.events, args.blob_dir)
+        events.use_event_log(event_log)
+
+    tracer = None
+    if args.trace:
+        tracer = tracing.Tracer("agent")
+        tracing.use_tracer(tracer)
+
     # Load problem statement from benchmark or file
     if args.benchmark:
         # Load from benchmark
@@ -690,17 +945,61 @@ if __name__ == "__main__":
         parser.print_help()
         sys.exit(1)
 
-    for i in range(max_runs):
-        print(f"\n\n>>>>>>>>>>>>>>>>>>>>>>>>>> Run {i} of {max_runs} ...")
-        try:
-            sol = agent(problem_statement, other_prompts, memory_file, resume_from_memory)
-            if(sol is not None):
-                print(f">>>>>>> Found a correct solution in run {i}.")
-                print(json.dumps(sol, indent=4))
-                break
-        except Exception as e:
-            print(f">>>>>>> Error in run {i}: {e}")
-            continue
+    run_budget = budget.Budget(args.budget_tokens, args.budget_usd, args.budget_downgrade_at,
+                               args.budget_downgrade_model)
+    # An agent cancelled by run_parallel.py (SIGTERM) still writes its result record
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    result = result_record.ResultRecord()
+    try:
+        with result, run_budget:
+            for i in range(max_runs):
+                print(f"\n\n>>>>>>>>>>>>>>>>>>>>>>>>>> Run {i} of {max_runs} ...")
+                checkpoint.set_state(run=i, iteration=0, correct_count=0, error_count=0)
+                try:
+                    sol = agent(problem_statement, other_prompts, memory_file, resume_from_memory, parallel_confirm=args.parallel_confirm,
+                                correction_branches=args.correction_branches)
+                    result.finish_run(i, sol)
+                    events.emit("run_end", solved=sol is not None, solution=sol)
+                    if(sol is not None):
+                        print(f">>>>>>> Found a correct solution in run {i}.")
+                        print(json.dumps(sol, indent=4))
+                        break
+                except budget.BudgetExceeded as e:
+                    print(f">>>>>>> Stopping in run {i}: {e}")
+                    result.finish_run(i, None, error=e)
+                    events.emit("run_end", solved=False, error=str(e))
+                    break
+                except Exception as e:
+                    print(f">>>>>>> Error in run {i}: {e}")
+                    result.finish_run(i, None, error=e)
+                    events.emit("run_end", solved=False, error=str(e))
+                    continue
+    finally:
+        if args.result:
+            result.write(args.result)
+        if tracer is not None:
+            tracer.write(args.trace)
     
+    print(f"\n>>>>>>> HTTP connection stats: {json.dumps(api_client.pool_stats())}")
+    print(f">>>>>>> Retry stats: {json.dumps(retry.retry_stats())}")
+    if concurrency.concurrency_stats():
+        print(f">>>>>>> Concurrency stats: {json.dumps(concurrency.concurrency_stats())}")
+    if run_budget.limited():
+        print(f">>>>>>> Budget stats: {json.dumps(run_budget.as_dict())}")
+    if result.calls.records:
+        print(f">>>>>>> Phase stats: {json.dumps(result.calls.phases())}")
+    if args.cache and not args.no_cache:
+        print(f">>>>>>> Response cache stats: {json.dumps(response_cache.cache_stats())}")
+        response_cache.close_cache()
+    if args.record or args.replay:
+        print(f">>>>>>> Cassette stats: {json.dumps(cassette.cassette_stats())}")
+        cassette.close_cassette()
+    if journal is not None:
+        print(f">>>>>>> Checkpoint stats: {json.dumps(journal.stats())}")
+        journal.close()
+    if event_log is not None:
+        print(f">>>>>>> Event log stats: {json.dumps(event_log.stats())}")
+        event_log.close()
+
     # Close log file if it was opened
     close_log_file()
@@ -0,0 +1,707 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Asyncio version of the agent in agent.py (Gemini). The solve/verify/correct
+# loop is the same, but every API call is awaited on a non-blocking HTTP
+# client, so one process can drive many concurrent agents:
+#
+#   python agent_async.py problem.txt --log run.log --num-agents 200
+#
+# With more than one agent, agent i logs to run_agent_<i>.log and only a
+# one-line status per agent is printed to stdout.
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import requests
+from benchmark_loader import BenchmarkLoader
+import api_client
+import response_cache
+import cassette
+import retry
+import concurrency
+import budget
+import call_metrics
+import tracing
+import checkpoint
+import log_writer
+import events
+import result_record
+from fanout import AsyncFanOut, first_to_pass_async
+from usage import record_usage
+from verdict import parse_verdict
+import agent as base
+from agent import (
+    MODEL_NAME,
+    API_URL,
+    PROVIDER,
+    step1_prompt,
+    self_improvement_prompt,
+    verification_system_prompt,
+    verification_remider,
+    get_api_key,
+    read_file_content,
+    build_request_payload,
+    build_correction_payload,
+    extract_text_from_response,
+    extract_detailed_solution,
+    save_memory,
+    load_memory,
+)
+
+# Same timestamped, per-agent-routed print as agent.py
+print = base.log_print
+
+async def send_api_request(api_key, payload):
+    """
+    Sends the request to the Gemini API without blocking the event loop and returns the response.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "X-goog-api-key": api_key # API key now in header!
+    }
+
+    # Past the downgrade point of the agent's budget, calls go to the cheaper model
+    model = budget.budget_model(MODEL_NAME)
+    call_metrics.start_call(PROVIDER, model)
+    api_url = API_URL.replace(f"/models/{MODEL_NAME}:", f"/models/{model}:")
+    started = time.time()
+    # Calls answered before the agent was restarted are served from its checkpoint journal
+    ticket, journaled = checkpoint.replay_call(PROVIDER, api_url, payload)
+    if journaled is not None:
+        record_usage(journaled, model)
+        events.api_call(PROVIDER, "journal", started, payload, journaled)
+        return journaled
+
+    # Serve repeated requests (re-runs, resumed sweeps) from the response cache
+    cache_key = response_cache.cache_key(PROVIDER, api_url, payload)
+    cached = response_cache.cache_get(cache_key)
+    if cached is not None:
+        events.api_call(PROVIDER, "cache", started, payload, cached)
+        return checkpoint.record_call(ticket, PROVIDER, payload, cached)
+    if cassette.replaying():
+        # A recorded cassette stands in for the API
+        response_data = await cassette.replay_async(PROVIDER, api_url, payload)
+        record_usage(response_data, model)
+        events.api_call(PROVIDER, "cassette", started, payload, response_data)
+        return checkpoint.record_call(ticket, PROVIDER, payload, response_data)
+
+    budget.check_budget()
+
+    async def attempt():
+        response = await api_client.post_async(PROVIDER, api_url, headers, payload)
+        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
+        return response.json()
+
+    try:
+        # Transient errors (429, 5xx, dropped connections) are retried instead of failing the run
+        response_data = await retry.call_with_retry_async(PROVIDER, attempt, log=print)
+        record_usage(response_data, model)
+        response_cache.cache_put(cache_key, PROVIDER, response_data)
+        cassette.record(PROVIDER, api_url, payload, started, response_data)
+        events.api_call(PROVIDER, "api", started, payload, response_data)
+        return checkpoint.record_call(ticket, PROVIDER, payload, response_data)
+    except requests.exceptions.RequestException as e:
+        cassette.record(PROVIDER, api_url, payload, started, error=e)
+        events.api_call(PROVIDER, "api", started, payload, error=e)
+        print(f"Error during API request: {e}")
+        response = getattr(e, "response", None)
+        if response is not None and response.status_code == 400:
+            print(f"Possible reason for 400: Model '{model}' might not be available or URL is incorrect for your setup.")
+            print(f"Raw API Response (if available): {response.text}")
+        raise e
+
+@tracing.traced("verify_solution")
+async def verify_solution(problem_statement, solution, verbose=True):
+
+    dsol = extract_detailed_solution(solution)
+
+    newst = f"""
+======================================================================
+### Problem ###
+
+{problem_statement}
+
+======================================================================
+### Solution ###
+
+{dsol}
+
+{verification_remider}
+"""
+    if(verbose):
+        print(">>>>>>> Start verification.")
+    p2 = build_request_payload(system_prompt=verification_system_prompt,
+        question_prompt=newst
+        )
+
+    if(verbose):
+        print(">>>>>>> Verification prompt:")
+        print(events.dump(p2))
+
+    checkpoint.set_state(phase="verify")
+    res = await send_api_request(get_api_key(), p2)
+    out = extract_text_from_response(res)
+
+    if(verbose):
+        print(">>>>>>> Verification results:")
+        print(events.dump(out))
+
+    # The verifier already states its verdict; only ask the LLM when that is ambiguous
+    verdict = parse_verdict(out)
+    if(verdict is None):
+        check_correctness = """Response in "yes" or "no". Is the following statement saying the solution is correct, or does not contain critical error or a major justification gap?""" \
+                + "\n\n" + out
+        prompt = build_request_payload(system_prompt="", question_prompt=check_correctness)
+        checkpoint.set_state(phase="check")
+        with tracing.span("check"):
+            r = await send_api_request(get_api_key(), prompt)
+            o = extract_text_from_response(r)
+    else:
+        o = "yes" if verdict else "no"
+
+    if(verbose):
+        print(f">>>>>>> Is verification good? ({'parsed from verdict' if verdict is not None else 'LLM check'})")
+        print(events.dump(o))
+
+    bug_report = ""
+
+    if("yes" not in o.lower()):
+        bug_report = extract_detailed_solution(out, "Detailed Verification", False)
+
+    if(verbose):
+        print(">>>>>>>Bug report:")
+        print(events.dump(bug_report))
+
+    events.emit("verification", verdict="pass" if "yes" in o.lower() else "fail",
+                verdict_source="parsed" if verdict is not None else "llm",
+                solution=dsol, verification=out, bug_report=bug_report)
+    result_record.note_verification("pass" if "yes" in o.lower() else "fail",
+                                    "parsed" if verdict is not None else "llm", bug_report)
+    return bug_report, o
+
+@tracing.traced("confirm_solution")
+async def confirm_solution(problem_statement, solution, count):
+    """
+    Runs `count` confirmation verifications of the same solution at the same
+    time instead of one after another, and stops at the first one that does
+    not pass (the others are cancelled).
+    Returns (number of passes, verify, good_verify), where verify/good_verify
+    come from the failing verification, or from the last one if all passed.
+    The verifications bypass the response cache: they are meant as fresh,
+    independent samples, so a re-run does not replay cached verdicts.
+    """
+    print(f">>>>>>> Running {count} confirmation verifications in parallel ...")
+    passed = 0
+    verify, good_verify = "", "yes"
+    with response_cache.bypass_cache():
+        async with AsyncFanOut([lambda: verify_solution(problem_statement, solution, False)] * count) as results:
+            async for index, (verify, good_verify) in results:
+                print(f">>>>>>> Confirmation verification {index}: {good_verify}")
+                if("yes" not in good_verify.lower()):
+                    print(">>>>>>> Confirmation failed, cancelling the remaining verifications.")
+                    print(">>>>>>>Bug report:")
+                    print(events.dump(verify))
+                    break
+                passed += 1
+    return passed, verify, good_verify
+
+@tracing.traced("branch_corrections")
+async def branch_corrections(problem_statement, other_prompts, solution, verify, branches):
+    """
+    Starts `branches` correction requests from the same bug report at once,
+    verifies each corrected solution as it arrives, and continues with the
+    first one that passes (the other branches are cancelled). If none passes,
+    the first corrected solution to finish is kept. The status, latency and
+    token usage of every branch are logged.
+    Returns (solution, verify, good_verify).
+    """
+    p1 = build_correction_payload(problem_statement, other_prompts, solution, verify)
+    print(f">>>>>>> Starting {branches} correction branches from the same bug report ...")
+    print(">>>>>>> New prompt:")
+    print(events.dump(p1))
+
+    async def attempt(branch):
+        checkpoint.set_state(phase="correction")
+        with tracing.span("correction"):
+            response = await send_api_request(get_api_key(), p1)
+            new_solution = extract_text_from_response(response)
+        new_verify, new_good_verify = await verify_solution(problem_statement, new_solution, False)
+        return new_solution, new_verify, new_good_verify
+
+    # Fresh samples, like the confirmations (see confirm_solution)
+    with response_cache.bypass_cache():
+        result, records = await first_to_pass_async(attempt, branches, lambda r: "yes" in r[2].lower())
+    print(f">>>>>>> Correction branches: {json.dumps(records)}")
+
+    new_solution, new_verify, new_good_verify = result
+    print(">>>>>>> Corrected solution:")
+    print(events.dump(new_solution))
+    print(f">>>>>>> verify results: {new_good_verify}")
+    return new_solution, new_verify, new_good_verify
+
+@tracing.traced("init_explorations")
+async def init_explorations(problem_statement, verbose=True, other_prompts=[]):
+    p1  = build_request_payload(
+            system_prompt=step1_prompt,
+            question_prompt=problem_statement,
+            other_prompts = other_prompts
+        )
+
+    print(f">>>>>> Initial prompt.")
+    print(events.dump(p1))
+
+    checkpoint.set_state(phase="init")
+    response1 = await send_api_request(get_api_key(), p1)
+    output1 = extract_text_from_response(response1)
+
+    print(f">>>>>>> First solution: ")
+    print(events.dump(output1))
+
+    print(f">>>>>>> Self improvement start:")
+    p1["contents"].append(
+        {"role": "model",
+        "parts": [{"text": output1}]
+        }
+    )
+    p1["contents"].append(
+        {"role": "user",
+        "parts": [{"text": self_improvement_prompt}]
+        }
+    )
+
+    checkpoint.set_state(phase="self_improve")
+
+    with tracing.span("self_improvement"):
+        response2 = await send_api_request(get_api_key(), p1)
+        solution = extract_text_from_response(response2)
+    print(f">>>>>>> Corrected solution: ")
+    print(events.dump(solution))
+
+    print(f">>>>>>> Vefify the solution.")
+    verify, good_verify = await verify_solution(problem_statement, solution, verbose)
+
+    print(f">>>>>>> Initial verification: ")
+    print(events.dump(verify))
+    print(f">>>>>>> verify results: {good_verify}")
+
+    return p1, solution, verify, good_verify
+
+@tracing.traced("agent")
+async def agent(problem_statement, other_prompts=[], memory_file=None, resume_from_memory=False, parallel_confirm=False, correction_branches=1):
+    if resume_from_memory and memory_file:
+        # Load memory and resume from previous state
+        memory = load_memory(memory_file)
+        if memory:
+            problem_statement = memory.get("problem_statement", problem_statement)
+            other_prompts = memory.get("other_prompts", other_prompts)
+            current_iteration = memory.get("current_iteration", 0)
+            solution = memory.get("solution", None)
+            verify = memory.get("verify", None)
+            print(f"Resuming from iteration {current_iteration}")
+        else:
+            print("Failed to load memory, starting fresh")
+            current_iteration = 0
+            solution = None
+            verify = None
+    else:
+        # Start fresh
+        current_iteration = 0
+        solution = None
+        verify = None
+
+    if solution is None:
+        p1, solution, verify, good_verify = await init_explorations(problem_statement, True, other_prompts)
+        if(solution is None):
+            print(">>>>>>> Failed in finding a complete solution.")
+            return None
+    else:
+        # We have a solution from memory, need to get good_verify
+        _, good_verify = await verify_solution(problem_statement, solution)
+
+    error_count = 0
+    correct_count = 1
+    for i in range(current_iteration, 30):
+        print(f"Number of iterations: {i}, number of corrects: {correct_count}, number of errors: {error_count}")
+        checkpoint.set_state(iteration=i, correct_count=correct_count, error_count=error_count)
+        events.emit("iteration")
+        verified = False
+
+        if("yes" not in good_verify.lower()):
+            # clear
+            correct_count = 0
+            error_count += 1
+
+            #self improvement
+            print(">>>>>>> Verification does not pass, correcting ...")
+
+            if(correction_branches > 1):
+                # Each branch verifies its own correction
+                solution, verify, good_verify = await branch_corrections(
+                    problem_statement, other_prompts, solution, verify, correction_branches)
+                verified = True
+            else:
+                # establish a new prompt that contains the solution and the verification
+                p1 = build_correction_payload(problem_statement, other_prompts, solution, verify)
+
+                print(">>>>>>> New prompt:")
+                print(events.dump(p1))
+                checkpoint.set_state(phase="correction")
+                with tracing.span("correction"):
+                    response2 = await send_api_request(get_api_key(), p1)
+                    solution = extract_text_from_response(response2)
+
+                print(">>>>>>> Corrected solution:")
+                print(events.dump(solution))
+
+        if(not verified):
+            print(f">>>>>>> Verify the solution.")
+            verify, good_verify = await verify_solution(problem_statement, solution)
+
+        if("yes" in good_verify.lower()):
+            print(">>>>>>> Solution is good, verifying again ...")
+            correct_count += 1
+            error_count = 0
+
+            if(parallel_confirm and correct_count < 5):
+                passed, verify, good_verify = await confirm_solution(problem_statement, solution, 5 - correct_count)
+                correct_count += passed
+
+
+        # Save memory every iteration
+        if memory_file:
+            save_memory(memory_file, problem_statement, other_prompts, i, 30, solution, verify)
+
+        if(correct_count >= 5):
+            print(">>>>>>> Correct solution found.")
+            print(events.dump(solution))
+            return solution
+
+        elif(error_count >= 10):
+            print(">>>>>>> Failed in finding a correct solution.")
+            # Save final state before returning
+            if memory_file:
+                save_memory(memory_file, problem_statement, other_prompts, i, 30, solution, verify)
+            return None
+
+    print(">>>>>>> Failed in finding a correct solution.")
+    # Save final state before returning
+    if memory_file:
+        save_memory(memory_file, problem_statement, other_prompts, 30, 30, solution, verify)
+    return None
+
+def agent_path(path, agent_id, num_agents):
+    """
+    Returns the per-agent variant of a log/memory path: unchanged for a single
+    agent, otherwise 'run.log' becomes 'run_agent_03.log'.
+    """
+    if not path or num_agents == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_agent_{agent_id:02d}{ext}"
+
+async def run_agent(agent_id, num_agents, problem_statement, other_prompts, max_runs,
+                    log_path=None, memory_file=None, resume_from_memory=False, parallel_confirm=False,
+                    correction_branches=1, checkpoint_path=None, events_path=None, blob_store=None,
+                    result_path=None, budget_limits=None, tracer=None):
+    """
+    Runs the outer max_runs loop of one agent, the same way agent.py's __main__ does.
+    Returns the solution, or None if no correct solution was found. With
+    result_path, the agent's result record is written there when it stops.
+    budget_limits are the keyword arguments of the agent's budget.Budget.
+    With a tracer, the agent's phases and API calls are traced into it.
+    """
+    log_file = None
+    if log_path:
+        log_file = log_writer.open_log(log_path)
+    # Each asyncio task has its own context, so this only affects this agent
+    base.use_agent_log(log_file, echo=(num_agents == 1 or log_file is None))
+    if num_agents > 1:
+        # Same namespaces as run_parallel.py, so both modes share cached samples
+        response_cache.use_cache_namespace(f"agent_{agent_id:02d}")
+
+    journal = None
+    event_log = None
+    sol = None
+    result = result_record.ResultRecord(agent_id)
+    run_budget = budget.Budget(**(budget_limits or {}))
+    try:
+        if log_path:
+            print(f"Logging to file: {log_path}")
+        if checkpoint_path:
+            journal = checkpoint.Journal(checkpoint_path)
+            checkpoint.use_journal(journal)
+            if journal.loaded:
+                print(f">>>>>>> Resuming from checkpoint {checkpoint_path}: {journal.loaded} calls journaled")
+        if events_path:
+            event_log = events.EventLog(events_path, blob_store)
+            events.use_event_log(event_log)
+        tracing.use_tracer(tracer)
+        with result, run_budget:
+            for i in range(max_runs):
+                print(f"\n\n>>>>>>>>>>>>>>>>>>>>>>>>>> Run {i} of {max_runs} ...")
+                checkpoint.set_state(run=i, iteration=0, correct_count=0, error_count=0)
+                try:
+                    sol = await agent(problem_statement, other_prompts, memory_file, resume_from_memory, parallel_confirm=parallel_confirm,
+                                      correction_branches=correction_branches)
+                    result.finish_run(i, sol)
+                    events.emit("run_end", solved=sol is not None, solution=sol)
+                    if(sol is not None):
+                        print(f">>>>>>> Found a correct solution in run {i}.")
+                        print(json.dumps(sol, indent=4))
+                        break
+                except budget.BudgetExceeded as e:
+                    print(f">>>>>>> Stopping in run {i}: {e}")
+                    result.finish_run(i, None, error=e)
+                    events.emit("run_end", solved=False, error=str(e))
+                    break
+                except Exception as e:
+                    print(f">>>>>>> Error in run {i}: {e}")
+                    result.finish_run(i, None, error=e)
+                    events.emit("run_end", solved=False, error=str(e))
+                    continue
+    finally:
+        if run_budget.limited():
+            print(f">>>>>>> Budget stats: {json.dumps(run_budget.as_dict())}")
+        if result.calls.records:
+            print(f">>>>>>> Phase stats: {json.dumps(result.calls.phases())}")
+        if journal is not None:
+            print(f">>>>>>> Checkpoint stats: {json.dumps(journal.stats())}")
+            journal.close()
+        if event_log is not None:
+            print(f">>>>>>> Event log stats: {json.dumps(event_log.stats())}")
+            event_log.close()
+        if result_path:
+            result.write(result_path)
+        if log_file is not None:
+            log_file.close()
+    return sol
+
+async def run_agents(num_agents, problem_statement, other_prompts, max_runs,
+                     log_path=None, memory_file=None, resume_from_memory=False, parallel_confirm=False,
+                     correction_branches=1, checkpoint_path=None, events_path=None, blob_dir=None,
+                     result_path=None, budget_limits=None, trace_path=None):
+    """
+    Runs num_agents agents concurrently on one event loop and returns their results in order.
+    Every agent gets its own budget with budget_limits. With trace_path, the
+    traces of all agents are written to that one file, an agent per process row.
+    """
+    blob_store = None
+    if events_path:
+        # One blob store for all agents, so texts they have in common are stored once
+        if blob_dir is None:
+            blob_dir = os.path.join(os.path.dirname(os.path.abspath(events_path)), "blobs")
+        blob_store = events.BlobStore(blob_dir)
+    tracers = [tracing.Tracer(f"Agent {agent_id:02d}", pid=agent_id + 1) if trace_path else None
+               for agent_id in range(num_agents)]
+    tasks = [
+        asyncio.ensure_future(run_agent(
+            agent_id, num_agents, problem_statement, other_prompts, max_runs,
+            agent_path(log_path, agent_id, num_agents),
+            agent_path(memory_file, agent_id, num_agents),
+            resume_from_memory,
+            parallel_confirm,
+            correction_branches,
+            agent_path(checkpoint_path, agent_id, num_agents),
+            agent_path(events_path, agent_id, num_agents),
+            blob_store,
+            agent_path(result_path, agent_id, num_agents),
+            budget_limits,
+            tracers[agent_id],
+        ))
+        for agent_id in range(num_agents)
+    ]
+    # When run_parallel.py cancels the process (SIGTERM), the agents still write their result records
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: [task.cancel() for task in tasks])
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    if trace_path:
+        tracing.write_traces(trace_path, tracers)
+    if num_agents > 1:
+        for agent_id, result in enumerate(results):
+            if isinstance(result, BaseException):
+                status = f"FAILED ({result})"
+            elif result is not None:
+                status = "FOUND CORRECT SOLUTION!"
+            else:
+                status = "COMPLETED (no solution found)"
+            print(f"[Agent {agent_id:02d}] {status}")
+    api_client.close_async_pools()
+    return results
+
+if __name__ == "__main__":
+    # Set up argument parsing (same options as agent.py, plus --num-agents)
+    parser = argparse.ArgumentParser(description='IMO Problem Solver Agent (asyncio)')
+    parser.add_argument('problem_file', nargs='?', default=None,
+                       help='Path to the problem statement file (optional if using --benchmark)')
+    parser.add_argument('--log', '-l', type=str, help='Path to log file (optional)')
+    parser.add_argument('--other_prompts', '-o', type=str, help='Other prompts (optional)')
+    parser.add_argument("--max_runs", '-m', type=int, default=10, help='Maximum number of runs (default: 10)')
+    parser.add_argument('--memory', '-mem', type=str, help='Path to memory file for saving/loading state (optional)')
+    parser.add_argument('--resume', '-r', action='store_true', help='Resume from memory file if provided')
+    parser.add_argument('--benchmark', '-b', type=str, choices=['gradingbench', 'proofbench'],
+                       help='Load problem from benchmark (gradingbench or proofbench)')
+    parser.add_argument('--level', type=str,
+                       help='Filter benchmark by level (Basic, Advanced). Case-insensitive.')
+    parser.add_argument('--benchmark-index', '-i', type=int, default=0,
+                       help='Index of problem to load from filtered benchmark (default: 0)')
+    parser.add_argument('--parallel-confirm', action='store_true',
+                       help='Run the remaining confirmation verifications of a passing solution in parallel')
+    parser.add_argument('--correction-branches', type=int, default=1,
+                       help='Number of correction requests to race from each bug report (default: 1)')
+    parser.add_argument('--cache', type=str,
+                       help='SQLite file that caches API responses across runs (optional)')
+    parser.add_argument('--cache-max-mb', type=int, default=1024,
+                       help='Evict least recently used cache entries above this size (default: 1024)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                       help='Ignore cache entries older than this many seconds (default: no expiry)')
+    parser.add_argument('--cache-namespace', type=str, default='',
+                       help='Sample namespace, so parallel agents on one problem get distinct cached or recorded samples')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Sample every call fresh: neither read nor store cached responses, even with --cache')
+    parser.add_argument('--record', type=str,
+                       help='Record every API call into this cassette file (optional)')
+    parser.add_argument('--replay', type=str,
+                       help='Serve API calls offline from this cassette file (optional)')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                       help='Replay speed relative to the recorded latencies; 0 replays instantly (default: 1)')
+    parser.add_argument('--checkpoint', '-c', type=str,
+                       help='Checkpoint journal of every API call; an existing journal is resumed at the exact call it stopped at (optional)')
+    parser.add_argument('--events', type=str,
+                       help='Structured JSONL event log; large texts go to a blob store and the text log only references them (optional)')
+    parser.add_argument('--blob-dir', type=str,
+                       help='Blob store of the event log (default: blobs/ next to the event log)')
+    parser.add_argument('--trace', type=str,
+                       help='Write a Chrome trace (chrome://tracing, ui.perfetto.dev) of the agent phases and API calls of all agents to this file (optional)')
+    parser.add_argument('--result', type=str,
+                       help='Write a JSON result record (solved, solution, runs, iterations, calls, tokens, wall time, last verification) to this file (optional)')
+    parser.add_argument('--adaptive-concurrency', type=int, metavar='MAX',
+                       help='Limit the requests in flight per provider with an AIMD controller that grows the limit up to MAX while responses are healthy and halves it on 429s and latency spikes (optional)')
+    parser.add_argument('--num-agents', '-n', type=int, default=1,
+                       help='Number of agents to run concurrently in this process (default: 1)')
+    parser.add_argument('--budget-tokens', type=int,
+                       help='Stop each agent once its API calls have used this many tokens (optional)')
+    parser.add_argument('--budget-usd', type=float,
+                       help='Stop each agent once its API calls have cost this many US dollars at the IMO_PRICES rates (optional)')
+    parser.add_argument('--budget-downgrade-model', type=str,
+                       help='Send the calls made past --budget-downgrade-at of the budget to this cheaper model (optional)')
+    parser.add_argument('--budget-downgrade-at', type=float, default=None,
+                       help='Share of the budget after which calls go to --budget-downgrade-model (default: 0.8)')
+
+    args = parser.parse_args()
+
+    response_cache.use_cache_namespace(args.cache_namespace)
+    if args.cache and not args.no_cache:
+        response_cache.configure_cache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024, ttl=args.cache_ttl)
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be used together")
+    if args.adaptive_concurrency:
+        concurrency.configure_concurrency(max_limit=args.adaptive_concurrency)
+    if args.record or args.replay:
+        cassette.configure_cassette(args.record or args.replay, "record" if args.record else "replay",
+                                    speed=args.replay_speed)
+
+    max_runs = args.max_runs
+    memory_file = args.memory
+    resume_from_memory = args.resume
+
+    other_prompts = []
+    if args.other_prompts:
+        other_prompts = args.other_prompts.split(',')
+
+    print(">>>>>>> Other prompts:")
+    print(other_prompts)
+
+    if memory_file:
+        print(f"Memory file: {memory_file}")
+        if resume_from_memory:
+            print("Resume mode: Will attempt to load from memory file")
+
+    # Load problem statement from benchmark or file
+    if args.benchmark:
+        # Load from benchmark
+        print(f">>>>>>> Loading problem from benchmark: {args.benchmark}")
+        if args.level:
+            print(f">>>>>>> Filtering by level: {args.level}")
+        print(f">>>>>>> Benchmark index: {args.benchmark_index}")
+
+        try:
+            loader = BenchmarkLoader()
+
+            # Load the appropriate benchmark
+            if args.benchmark == 'gradingbench':
+                entries = loader.load_gradingbench(level=args.level)
+            else:  # proofbench
+                entries = loader.load_proofbench(level=args.level)
+
+            if not entries:
+                print(f">>>>>>> Error: No entries found in {args.benchmark} with the specified filters")
+                sys.exit(1)
+
+            if args.benchmark_index >= len(entries):
+                print(f">>>>>>> Error: Benchmark index {args.benchmark_index} is out of range (0-{len(entries)-1})")
+                sys.exit(1)
+
+            # Get the problem from the specified index
+            entry = entries[args.benchmark_index]
+            problem_statement = entry.get('Problem', '')
+            problem_id = entry.get('Problem ID', 'Unknown')
+
+            print(f">>>>>>> Loaded problem: {problem_id}")
+            print(f">>>>>>> Total entries in filtered benchmark: {len(entries)}")
+            print(f">>>>>>> Problem preview: {problem_statement[:200]}...")
+
+        except Exception as e:
+            print(f">>>>>>> Error loading from benchmark: {e}")
+            sys.exit(1)
+    elif args.problem_file:
+        # Load from file
+        problem_statement = read_file_content(args.problem_file)
+    else:
+        print(">>>>>>> Error: Either problem_file or --benchmark must be specified")
+        parser.print_help()
+        sys.exit(1)
+
+    results = asyncio.run(run_agents(args.num_agents, problem_statement, other_prompts, max_runs,
+                                     args.log, memory_file, resume_from_memory, args.parallel_confirm,
+                                     args.correction_branches, args.checkpoint, args.events, args.blob_dir,
+                                     args.result,
+                                     dict(max_tokens=args.budget_tokens, max_cost=args.budget_usd,
+                                          downgrade_at=args.budget_downgrade_at,
+                                          downgrade_model=args.budget_downgrade_model),
+                                     args.trace))
+
+    print(f"\n>>>>>>> HTTP connection stats: {json.dumps(api_client.pool_stats())}")
+    print(f">>>>>>> Retry stats: {json.dumps(retry.retry_stats())}")
+    if concurrency.concurrency_stats():
+        print(f">>>>>>> Concurrency stats: {json.dumps(concurrency.concurrency_stats())}")
+    if args.cache and not args.no_cache:
+        print(f">>>>>>> Response cache stats: {json.dumps(response_cache.cache_stats())}")
+        response_cache.close_cache()
+    if args.record or args.replay:
+        print(f">>>>>>> Cassette stats: {json.dumps(cassette.cassette_stats())}")
+        cassette.close_cassette()
@@ -0,0 +1,543 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import ssl
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from urllib.parse import urlsplit
+import requests
+import requests.certs
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import call_metrics
+
+# --- CONFIGURATION ---
+# Defaults for every provider. They can be overridden per provider with
+# configure_pool() or through environment variables, e.g.
+#   IMO_HTTP_POOL_MAXSIZE=32            (all providers)
+#   IMO_HTTP_POOL_MAXSIZE_GEMINI=64     (only the Gemini adapter)
+#   IMO_HTTP_KEEP_ALIVE=0               (disable keep-alive)
+DEFAULT_POOL_CONFIG = {
+    # Number of per-host connection pools kept by a session
+    "pool_connections": 4,
+    # Maximum number of connections kept open to a single host
+    "pool_maxsize": 16,
+    # Block instead of opening extra (non-pooled) connections when the pool is full
+    "pool_block": False,
+    # Reuse connections between requests
+    "keep_alive": True,
+}
+# Largest response body the asyncio pool reads; a provider answer is a few MB at most
+MAX_RESPONSE_BODY = 64 * 1024 * 1024
+
+_pool_config = {}
+_sessions = {}
+_adapters = {}
+_async_pools = {}
+_lock = threading.Lock()
+# Deadline of the agent running in the current context, see set_deadline()
+_deadline = contextvars.ContextVar("api_deadline", default=None)
+# Cancellation check of the agent running in the current context, see set_cancel_check()
+_cancel_check = contextvars.ContextVar("api_cancel_check", default=None)
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that counts the requests it sends and the sockets its pools
+    open, so the share of requests served on a reused connection can be reported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._counter_lock = threading.Lock()
+        self.num_requests = 0
+        self.num_connections = 0
+        super().__init__(*args, **kwargs)
+
+    def _count(self, requests_delta=0, connections_delta=0):
+        with self._counter_lock:
+            self.num_requests += requests_delta
+            self.num_connections += connections_delta
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        class _HTTPConnection(HTTPConnection):
+            def connect(self):
+                adapter._count(connections_delta=1)
+                super().connect()
+
+        class _HTTPSConnection(HTTPSConnection):
+            def connect(self):
+                adapter._count(connections_delta=1)
+                super().connect()
+
+        class _HTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = _HTTPConnection
+
+        class _HTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = _HTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPConnectionPool,
+            "https": _HTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        self._count(requests_delta=1)
+        return super().send(request, **kwargs)
+
+    def connection_counts(self):
+        """Returns (new_connections, requests) handled by this adapter so far."""
+        with self._counter_lock:
+            return self.num_connections, self.num_requests
+
+
+def _env_value(name, provider):
+    value = os.getenv(f"{name}_{provider.upper()}")
+    if value is None:
+        value = os.getenv(name)
+    return value
+
+
+def _env_pool_config(provider):
+    """
+    Reads pool settings for a provider from the environment.
+    """
+    config = {}
+    for key, env_name in (("pool_connections", "IMO_HTTP_POOL_CONNECTIONS"),
+                          ("pool_maxsize", "IMO_HTTP_POOL_MAXSIZE")):
+        value = _env_value(env_name, provider)
+        if value:
+            config[key] = int(value)
+    for key, env_name in (("pool_block", "IMO_HTTP_POOL_BLOCK"),
+                          ("keep_alive", "IMO_HTTP_KEEP_ALIVE")):
+        value = _env_value(env_name, provider)
+        if value:
+            config[key] = value.strip().lower() not in ("0", "false", "no", "off")
+    return config
+
+
+def get_pool_config(provider):
+    """Returns the effective pool configuration for a provider."""
+    config = dict(DEFAULT_POOL_CONFIG)
+    config.update(_env_pool_config(provider))
+    config.update(_pool_config.get(provider, {}))
+    return config
+
+
+def configure_pool(provider, **options):
+    """
+    Overrides the pool configuration of a provider. Any existing session of
+    that provider is closed so the next request picks up the new settings.
+    """
+    unknown = set(options) - set(DEFAULT_POOL_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown pool option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _pool_config.setdefault(provider, {}).update(options)
+        session = _sessions.pop(provider, None)
+        _adapters.pop(provider, None)
+    if session is not None:
+        session.close()
+
+
+def get_session(provider):
+    """
+    Returns the shared keep-alive session of a provider, creating it on first use.
+    """
+    session = _sessions.get(provider)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(provider)
+        if session is None:
+            config = get_pool_config(provider)
+            adapter = CountingHTTPAdapter(
+                pool_connections=config["pool_connections"],
+                pool_maxsize=config["pool_maxsize"],
+                pool_block=config["pool_block"],
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if not config["keep_alive"]:
+                session.headers["Connection"] = "close"
+            _adapters[provider] = adapter
+            _sessions[provider] = session
+    return session
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Raised by AsyncHTTPPool for a response body larger than its max_body."""
+
+
+class DeadlineExceeded(requests.exceptions.RequestException):
+    """Raised instead of sending a request once the agent's deadline has passed. Never retried."""
+
+
+class AgentCancelled(requests.exceptions.RequestException):
+    """Raised instead of sending a request once the agent has been cancelled. Never retried."""
+
+
+def set_deadline(deadline):
+    """
+    Sets a deadline (a time.time() value, or None for none) for the agent
+    running in the current thread or asyncio task. Requests after it raise
+    DeadlineExceeded, and the timeout of requests before it is capped to the
+    time left, so an agent that cannot be killed (e.g. a thread) still stops
+    within one call of its deadline.
+    """
+    _deadline.set(deadline)
+
+
+def deadline_remaining():
+    """Returns the seconds left until the current agent's deadline, or None if it has none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def set_cancel_check(check):
+    """
+    Sets a function (or None) that tells whether the agent running in the
+    current thread or asyncio task has been cancelled, e.g. whether its
+    sweep's cancel file exists. Requests once it returns true raise
+    AgentCancelled, so an agent thread stops at its next API call instead of
+    finishing its run.
+    """
+    _cancel_check.set(check)
+
+
+def _request_timeout(timeout):
+    """Checks the agent's cancellation and deadline; returns timeout capped to the time left."""
+    check = _cancel_check.get()
+    if check is not None and check():
+        raise AgentCancelled("Agent cancelled")
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise DeadlineExceeded("Agent deadline exceeded")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def post(provider, url, headers, payload, timeout=None, stream=False):
+    """
+    POSTs a JSON payload through the provider's pooled session and returns
+    the raw requests.Response.
+    """
+    timeout = _request_timeout(timeout)
+    session = get_session(provider)
+    response = session.post(url, headers=headers, data=json.dumps(payload), timeout=timeout, stream=stream)
+    # requests returns once the headers are read, also when streaming
+    call_metrics.note_first_byte()
+    return response
+
+
+def pool_stats():
+    """
+    Returns connection reuse counters for every provider used so far:
+    {provider: {"requests": n, "new_connections": n, "reused_connections": n}}
+    """
+    counts = {}
+    for pools in (_adapters, _async_pools):
+        for provider, pool in list(pools.items()):
+            connections, num_requests = pool.connection_counts()
+            total = counts.setdefault(provider, [0, 0])
+            total[0] += connections
+            total[1] += num_requests
+
+    stats = {}
+    for provider, (connections, num_requests) in counts.items():
+        stats[provider] = {
+            "requests": num_requests,
+            "new_connections": connections,
+            "reused_connections": max(num_requests - connections, 0),
+        }
+    return stats
+
+
+def close_sessions():
+    """Closes all pooled sessions."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+        _adapters.clear()
+    for session in sessions:
+        session.close()
+
+
+class AsyncResponse:
+    """
+    Response of AsyncHTTPPool, exposing the subset of the requests.Response
+    interface used by the agents.
+    """
+
+    def __init__(self, url, status_code, reason, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", response=self)
+
+
+class AsyncHTTPPool:
+    """
+    Minimal non-blocking HTTP/1.1 client on top of asyncio streams. Idle
+    keep-alive connections are kept per host (at most pool_maxsize of them)
+    so one event loop can drive many concurrent requests without a thread each.
+
+    Unlike urllib3, at most pool_maxsize connections per host are open at
+    once, whatever the pool_block setting: hundreds of agents in one event loop
+    would otherwise open a socket each. Requests beyond that wait for a
+    connection. Response bodies larger than max_body bytes are refused.
+    Proxies are not supported; post_async() sends requests that need one
+    through the requests session instead.
+    """
+
+    def __init__(self, pool_maxsize=16, keep_alive=True, max_body=MAX_RESPONSE_BODY):
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.max_body = max_body
+        self.num_requests = 0
+        self.num_connections = 0
+        self._idle = {}
+        self._slots = {}
+        self._ssl_context = None
+
+    def connection_counts(self):
+        """Returns (new_connections, requests) handled by this pool so far."""
+        return self.num_connections, self.num_requests
+
+    async def _open(self, scheme, host, port):
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context(cafile=requests.certs.where())
+            ssl_context = self._ssl_context
+        try:
+            reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+        except OSError as e:
+            raise requests.exceptions.ConnectionError(f"Could not connect to {host}:{port}: {e}")
+        self.num_connections += 1
+        return reader, writer
+
+    def _release(self, key, conn, reusable):
+        idle = self._idle.setdefault(key, [])
+        if reusable and self.keep_alive and len(idle) < self.pool_maxsize:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    def _check_size(self, size):
+        if size > self.max_body:
+            raise ResponseTooLarge(f"Response body exceeds {self.max_body} bytes")
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before a response was received")
+        call_metrics.note_first_byte()
+        parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            # The connection is closed by _request_once, not returned to the pool
+            raise requests.exceptions.ConnectionError(f"Malformed status line: {status_line[:100]!r}")
+        status_code = int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ""
+
+        headers = requests.structures.CaseInsensitiveDict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+
+        reusable = headers.get("Connection", "").lower() != "close"
+        if headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            received = 0
+            while True:
+                size_line = await reader.readline()
+                try:
+                    size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                except ValueError:
+                    raise requests.exceptions.ConnectionError(f"Malformed chunk size: {size_line[:100]!r}")
+                if size == 0:
+                    # Skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                received += size
+                self._check_size(received)
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b"".join(chunks)
+        elif "Content-Length" in headers:
+            self._check_size(int(headers["Content-Length"]))
+            content = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            # Body delimited by the end of the connection
+            chunks = []
+            received = 0
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                received += len(chunk)
+                self._check_size(received)
+                chunks.append(chunk)
+            content = b"".join(chunks)
+            reusable = False
+        return status_code, reason, headers, content, reusable
+
+    async def _request_once(self, key, url, request_bytes, reuse):
+        scheme, host, port = key
+        idle = self._idle.setdefault(key, [])
+        conn = idle.pop() if (reuse and idle) else None
+        reused = conn is not None
+        if conn is None:
+            conn = await self._open(scheme, host, port)
+        reader, writer = conn
+        try:
+            writer.write(request_bytes)
+            await writer.drain()
+            status_code, reason, headers, content, reusable = await self._read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            writer.close()
+            if reused:
+                # The server dropped an idle keep-alive connection; retry on a fresh one
+                return None
+            raise requests.exceptions.ConnectionError(f"Connection to {host}:{port} failed: {e}")
+        except BaseException:
+            writer.close()
+            raise
+        self._release(key, conn, reusable)
+        return AsyncResponse(url, status_code, reason, headers, content)
+
+    async def request(self, method, url, headers, body=b"", timeout=None):
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        all_headers = {
+            "Host": parts.netloc,
+            "Accept": "*/*",
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive" if self.keep_alive else "close",
+            "Content-Length": str(len(body)),
+        }
+        all_headers.update(headers)
+        head = f"{method} {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in all_headers.items())
+        request_bytes = head.encode("latin-1") + b"\r\n" + body
+
+        async def _send():
+            response = await self._request_once(key, url, request_bytes, reuse=True)
+            if response is None:
+                response = await self._request_once(key, url, request_bytes, reuse=False)
+            return response
+
+        async def _send_in_slot():
+            async with slot:
+                return await _send()
+
+        self.num_requests += 1
+        slot = self._slots.setdefault(key, asyncio.Semaphore(self.pool_maxsize))
+        try:
+            # The timeout covers the wait for a connection, like requests' pool_timeout
+            return await asyncio.wait_for(_send_in_slot(), timeout)
+        except asyncio.TimeoutError:
+            raise requests.exceptions.Timeout(f"Request to {url} timed out after {timeout} seconds")
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+        self._slots.clear()
+
+
+def get_async_pool(provider):
+    """
+    Returns the asyncio connection pool of a provider, creating it on first use.
+    Pools must only be used from the event loop that created them.
+    """
+    pool = _async_pools.get(provider)
+    if pool is None:
+        config = get_pool_config(provider)
+        pool = AsyncHTTPPool(
+            pool_maxsize=config["pool_maxsize"],
+            keep_alive=config["keep_alive"],
+        )
+        _async_pools[provider] = pool
+    return pool
+
+
+async def post_async(provider, url, headers, payload, timeout=None):
+    """
+    Non-blocking counterpart of post(): POSTs a JSON payload through the
+    provider's asyncio pool and returns an AsyncResponse.
+    """
+    if requests.utils.get_environ_proxies(url):
+        # HTTP(S)_PROXY applies to this URL; the asyncio pool cannot tunnel, requests can
+        return await asyncio.to_thread(post, provider, url, headers, payload, timeout)
+    timeout = _request_timeout(timeout)
+    pool = get_async_pool(provider)
+    body = json.dumps(payload).encode("utf-8")
+    return await pool.request("POST", url, headers, body, timeout=timeout)
+
+
+def close_async_pools():
+    """
+    Closes all idle asyncio connections. Call before the event loop that used
+    them goes away; the pools keep their counters for pool_stats().
+    """
+    for pool in list(_async_pools.values()):
+        pool.close()
@@ -0,0 +1,249 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+from usage import UsageMeter, active_meters
+
+# Default share of a budget after which agents switch to the downgrade model
+DEFAULT_DOWNGRADE_AT = 0.8
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of sending an API call once the agent's budget is spent."""
+
+
+class Budget(UsageMeter):
+    """
+    Token and USD ceiling of one agent. It meters the calls made while it
+    is active like a UsageMeter:
+
+        budget = Budget(max_tokens=2_000_000, max_cost=5.0, downgrade_model="gemini-2.5-flash")
+        with budget:
+            send_api_request(...)   # raises BudgetExceeded once a ceiling is reached
+
+    Past downgrade_at (a share of the ceiling) the agent's calls go to
+    downgrade_model instead of its own model, if one is given. Limits of
+    None are unlimited; a budget without limits only meters.
+    """
+
+    def __init__(self, max_tokens=None, max_cost=None, downgrade_at=None, downgrade_model=None):
+        super().__init__()
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.downgrade_model = downgrade_model
+        if downgrade_at is None:
+            downgrade_at = DEFAULT_DOWNGRADE_AT if downgrade_model else 1.0
+        self.downgrade_at = downgrade_at
+        self.downgraded_after = None
+
+    def limited(self):
+        return self.max_tokens is not None or self.max_cost is not None
+
+    def used(self):
+        """Returns the largest share of a ceiling spent so far (0 without limits)."""
+        shares = [0.0]
+        with self._lock:
+            if self.max_tokens is not None:
+                shares.append(self.total_tokens / self.max_tokens if self.max_tokens > 0 else 1.0)
+            if self.max_cost is not None:
+                shares.append(self.cost / self.max_cost if self.max_cost > 0 else 1.0)
+        return max(shares)
+
+    def exceeded(self):
+        return self.limited() and self.used() >= 1.0
+
+    def downgraded(self):
+        if not self.downgrade_model or not self.limited() or self.used() < self.downgrade_at:
+            return False
+        if self.downgraded_after is None:
+            self.downgraded_after = self.calls
+        return True
+
+    def as_dict(self):
+        data = super().as_dict()
+        data.update(max_tokens=self.max_tokens, max_cost=self.max_cost, used=round(self.used(), 4),
+                    downgrade_model=self.downgrade_model, downgraded_after=self.downgraded_after)
+        return data
+
+
+def _active_budgets():
+    return [meter for meter in active_meters() if isinstance(meter, Budget)]
+
+
+def check_budget():
+    """Raises BudgetExceeded if a budget active in the current context is spent."""
+    for budget in _active_budgets():
+        if budget.exceeded():
+            raise BudgetExceeded(f"budget exhausted: {budget.total_tokens} tokens, ${budget.cost:.4f} "
+                                 f"(limits: {budget.max_tokens} tokens, ${budget.max_cost})")
+
+
+def budget_model(model):
+    """Returns the model the next call should use: model, or the downgrade model of a budget past its threshold."""
+    for budget in _active_budgets():
+        if budget.downgraded():
+            return budget.downgrade_model
+    return model
+
+
+# allocate() result when only the budgets of running attempts hold what is left
+WAIT = "wait"
+
+_KEYS = (("tokens", "max_tokens"), ("cost", "max_cost"))
+
+
+class BudgetLedger:
+    """
+    Spend of a run or sweep per problem and in total, against agent,
+    problem and run ceilings. Every attempt reserves its agent budget when
+    it starts (allocate()), a share of what is left for the attempts that
+    may run alongside it, and is charged what its result record says it
+    spent when it finishes (charge()), which frees the unused rest. So
+    attempts running at the same time never hold more than is left; a
+    ceiling is overshot by at most one API call per agent.
+
+    Limits are dicts {"tokens": N or None, "cost": USD or None}. With a
+    downgrade_model, agents switch to it once a ceiling reaches downgrade_at.
+    """
+
+    def __init__(self, agent=None, problem=None, run=None, downgrade_at=None, downgrade_model=None):
+        self.limits = {scope: {key: value for key, value in (limits or {}).items() if value is not None}
+                       for scope, limits in (("agent", agent), ("problem", problem), ("run", run))}
+        self.downgrade_model = downgrade_model
+        if downgrade_model and downgrade_at is None:
+            downgrade_at = DEFAULT_DOWNGRADE_AT
+        self.downgrade_at = downgrade_at if downgrade_model else None
+        self._lock = threading.Lock()
+        self.spent = {}
+        self.total = {"tokens": 0, "cost": 0.0}
+        # agent_id -> (problem, budget held by the running attempt)
+        self.reserved = {}
+
+    def limited(self):
+        return any(self.limits.values())
+
+    def charge(self, problem, record, agent_id=None):
+        """
+        Adds the tokens and cost of a finished attempt's result record (None
+        if it wrote none) and frees the budget agent_id had reserved.
+        """
+        with self._lock:
+            self.reserved.pop(agent_id, None)
+            if record is None:
+                return
+            spent = self.spent.setdefault(problem, {"tokens": 0, "cost": 0.0})
+            for spend in (spent, self.total):
+                spend["tokens"] += record.get("total_tokens", 0)
+                spend["cost"] += record.get("cost", 0.0)
+
+    def release(self, agent_id):
+        """Frees the budget of an attempt that will be run again from the start."""
+        with self._lock:
+            self.reserved.pop(agent_id, None)
+
+    def _scopes(self, problem):
+        """Returns (limits, spent, reserved) of the agent, problem and run scopes."""
+        held = {"problem": {"tokens": 0, "cost": 0.0}, "run": {"tokens": 0, "cost": 0.0}}
+        for reserved_problem, budget in self.reserved.values():
+            for scope in (("problem", "run") if reserved_problem == problem else ("run",)):
+                for key in ("tokens", "cost"):
+                    held[scope][key] += budget[key]
+        none = {"tokens": 0, "cost": 0.0}
+        return {"agent": (self.limits["agent"], none, none),
+                "problem": (self.limits["problem"], self.spent.get(problem, none), held["problem"]),
+                "run": (self.limits["run"], self.total, held["run"])}
+
+    def exhausted(self, problem):
+        """Returns "run" or "problem" if that ceiling is spent for problem (the run's first), else None."""
+        with self._lock:
+            scopes = self._scopes(problem)
+        for scope in ("run", "problem"):
+            limits, spent, _ = scopes[scope]
+            if any(spent[key] >= limit for key, limit in limits.items()):
+                return scope
+        return None
+
+    def allocate(self, problem, agent_id=None, sharing=None):
+        """
+        Returns the budget of the next attempt on problem, the keyword
+        arguments of its Budget: its share of what is left of every ceiling
+        after what was spent, capped by what running attempts do not hold,
+        with the downgrade threshold placed where the first ceiling reaches
+        downgrade_at. sharing ({"run": N, "problem": M}, see sharing())
+        counts the attempts, this one included, that may hold a share of the
+        run and the problem ceiling at once; by default an attempt may take
+        everything that is left. With agent_id, the budget is reserved until
+        charge(). Returns None if a ceiling is spent, and WAIT if running
+        attempts hold the rest.
+        """
+        sharing = sharing or {}
+        with self._lock:
+            scopes = self._scopes(problem)
+            budget = {"downgrade_model": self.downgrade_model}
+            held = {"tokens": 0, "cost": 0.0}
+            downgrade_at = None
+            for key, name in _KEYS:
+                left = [(limits[key], spent[key], reserved[key], max(sharing.get(scope, 1), 1))
+                        for scope, (limits, spent, reserved) in scopes.items() if key in limits]
+                if not left:
+                    budget[name] = None
+                    continue
+                if any(limit - spent <= 0 for limit, spent, _, _ in left):
+                    return None
+                remaining = min(limit - spent - reserved for limit, spent, reserved, _ in left)
+                share = min(remaining, min((limit - spent) / parts for limit, spent, _, parts in left))
+                amount = int(share) if key == "tokens" else round(share, 6)
+                if amount <= 0:
+                    return WAIT
+                budget[name] = held[key] = amount
+                if self.downgrade_at is not None:
+                    # Distance to the nearest downgrade point, as a share of this attempt's budget
+                    point = min(limit * self.downgrade_at - spent - reserved for limit, spent, reserved, _ in left)
+                    point = max(0.0, point / amount)
+                    downgrade_at = point if downgrade_at is None else min(downgrade_at, point)
+            budget["downgrade_at"] = None if downgrade_at is None else round(min(downgrade_at, 1.0), 4)
+            if agent_id is not None:
+                self.reserved[agent_id] = (problem, held)
+            return budget
+
+    @staticmethod
+    def sharing(problem, others, slots):
+        """
+        Returns allocate()'s sharing for an attempt on problem, given the
+        problems of the other attempts that are running or not yet started
+        and the number of attempts that can run at once.
+        """
+        others = list(others)
+        return {"run": min(1 + len(others), slots),
+                "problem": min(1 + sum(1 for other in others if other == problem), slots)}
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "tokens": self.total["tokens"],
+                "cost": round(self.total["cost"], 6),
+                "limits": {scope: limits for scope, limits in self.limits.items() if limits},
+                "problems": {problem: {"tokens": spent["tokens"], "cost": round(spent["cost"], 6)}
+                             for problem, spent in sorted(self.spent.items())},
+            }
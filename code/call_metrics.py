@@ -0,0 +1,233 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+import threading
+import contextvars
+import checkpoint
+import live_metrics
+import tracing
+from usage import extract_usage, usage_cost
+
+# The API call in progress in the current context (thread or asyncio task),
+# and the collectors that are active in it
+_current = contextvars.ContextVar("current_call", default=None)
+_collectors = contextvars.ContextVar("call_collectors", default=())
+
+# Order of the agent phases in tables; phases not listed here come last
+PHASES = ("init", "self_improve", "verify", "check", "correction")
+
+_ROLLUP_SUMS = ("calls", "api_calls", "errors", "retries", "prompt_tokens", "output_tokens", "reasoning_tokens",
+                "cost", "latency", "retry_wait", "ttfb", "ttfb_calls")
+
+
+class _Call:
+    def __init__(self, provider, model):
+        self.provider = provider
+        self.model = model
+        self.started = time.time()
+        self.attempt_started = self.started
+        self.ttfb = None
+        self.retries = 0
+        self.retry_wait = 0.0
+
+
+def start_call(provider, model):
+    """Starts measuring an API call of the current context; send_api_request calls it first."""
+    _current.set(_Call(provider, model))
+
+
+def current_model():
+    """Returns the model of the current call, or None outside of a call."""
+    call = _current.get()
+    return call.model if call is not None else None
+
+
+def note_attempt():
+    """Notes that an attempt (the first or a retry) of the current call is being sent."""
+    call = _current.get()
+    if call is not None:
+        call.attempt_started = time.time()
+
+
+def note_first_byte():
+    """Notes that the status line of the response to the current attempt arrived."""
+    call = _current.get()
+    if call is not None:
+        call.ttfb = time.time() - call.attempt_started
+
+
+def note_retry(delay):
+    """Notes that the current call will be retried after delay seconds."""
+    call = _current.get()
+    if call is not None:
+        call.retries += 1
+        call.retry_wait += delay
+
+
+def finish_call(source, response_data=None, error=None):
+    """
+    Ends the current call and returns its metrics record: agent state
+    (run, iteration, phase), provider, model, where the response came from,
+    tokens and cost (none for cache hits, which cost nothing), time to first
+    byte of the answered attempt, total latency including retries, and the
+    retries. The record goes to every active collector. Returns None if no
+    call was started.
+    """
+    call = _current.get()
+    if call is None:
+        return None
+    _current.set(None)
+    state = checkpoint.get_state()
+    record = {
+        "time": round(call.started, 3),
+        "run": state.get("run"),
+        "iteration": state.get("iteration"),
+        "phase": state.get("phase", "unknown"),
+        "provider": call.provider,
+        "model": call.model,
+        "source": source,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "reasoning_tokens": 0,
+        "cost": 0.0,
+        "ttfb": round(call.ttfb, 3) if call.ttfb is not None else None,
+        "latency": round(time.time() - call.started, 3),
+        "retries": call.retries,
+        "retry_wait": round(call.retry_wait, 3),
+        "error": str(error) if error is not None else None,
+    }
+    if error is None and source != "cache":
+        usage = extract_usage(response_data)
+        for key in ("prompt_tokens", "output_tokens", "reasoning_tokens"):
+            record[key] = usage[key]
+        record["cost"] = round(usage_cost(usage, call.model), 6)
+    for collector in _collectors.get():
+        collector.add(record)
+    live_metrics.call_finished(record)
+    tracing.add_span("api_call", call.started, provider=call.provider, model=call.model, source=source,
+                     tokens=record["prompt_tokens"] + record["output_tokens"], ttfb=record["ttfb"],
+                     retries=record["retries"], retry_wait=record["retry_wait"], error=record["error"])
+    return record
+
+
+class CallLog:
+    """
+    Collects the metrics record of every API call made while it is active:
+
+        calls = CallLog()
+        with calls:
+            send_api_request(...)
+        print(calls.phases())
+
+    Like usage meters, call logs nest and see the calls of the threads and
+    asyncio tasks started inside the block.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = []
+        self.records = []
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def phases(self):
+        """Returns the records rolled up per phase (see rollup())."""
+        with self._lock:
+            return rollup(self.records)
+
+    def __enter__(self):
+        self._tokens.append(_collectors.set(_collectors.get() + (self,)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _collectors.reset(self._tokens.pop())
+        return False
+
+
+def _new_row():
+    row = dict.fromkeys(_ROLLUP_SUMS, 0)
+    row["cost"] = 0.0
+    row["max_latency"] = 0.0
+    return row
+
+
+def rollup(records):
+    """
+    Sums call records per phase: {phase: {"calls", "api_calls" (sent to the
+    provider), "errors", "retries", token counts, "cost", "latency" (sum),
+    "max_latency", "retry_wait", "ttfb" (sum over "ttfb_calls")}}. Rows of
+    several agents add up with merge().
+    """
+    table = {}
+    for record in records:
+        row = table.setdefault(record["phase"], _new_row())
+        row["calls"] += 1
+        row["api_calls"] += record["source"] == "api"
+        row["errors"] += record["error"] is not None
+        for key in ("retries", "prompt_tokens", "output_tokens", "reasoning_tokens", "cost", "latency", "retry_wait"):
+            row[key] += record[key]
+        row["max_latency"] = max(row["max_latency"], record["latency"])
+        if record["ttfb"] is not None:
+            row["ttfb"] += record["ttfb"]
+            row["ttfb_calls"] += 1
+    return _rounded(table)
+
+
+def merge(tables):
+    """Adds up per-phase tables, e.g. of all agents of a run; None entries are skipped."""
+    total = {}
+    for table in tables:
+        for phase, row in (table or {}).items():
+            merged = total.setdefault(phase, _new_row())
+            for key in _ROLLUP_SUMS:
+                merged[key] += row.get(key, 0)
+            merged["max_latency"] = max(merged["max_latency"], row.get("max_latency", 0.0))
+    return _rounded(total)
+
+
+def _rounded(table):
+    for row in table.values():
+        for key in ("cost", "latency", "retry_wait", "ttfb", "max_latency"):
+            row[key] = round(row[key], 6 if key == "cost" else 3)
+    order = {phase: n for n, phase in enumerate(PHASES)}
+    return dict(sorted(table.items(), key=lambda item: (order.get(item[0], len(PHASES)), item[0])))
+
+
+def format_table(table):
+    """Returns the lines of a text table of a per-phase rollup, with each phase's share of the call time and cost."""
+    total_latency = sum(row["latency"] for row in table.values()) or 1.0
+    total_cost = sum(row["cost"] for row in table.values()) or 1.0
+    lines = [f"{'phase':<13}{'calls':>7}{'api':>6}{'errors':>7}{'retries':>8}{'prompt':>10}{'output':>10}"
+             f"{'reasoning':>10}{'cost $':>10}{'time s':>10}{'time %':>7}{'cost %':>7}{'mean s':>8}{'ttfb s':>8}"]
+    for phase, row in table.items():
+        mean = row["latency"] / row["calls"] if row["calls"] else 0.0
+        ttfb = f"{row['ttfb'] / row['ttfb_calls']:.2f}" if row["ttfb_calls"] else "-"
+        lines.append(f"{phase:<13}{row['calls']:>7}{row['api_calls']:>6}{row['errors']:>7}{row['retries']:>8}"
+                     f"{row['prompt_tokens']:>10}{row['output_tokens']:>10}{row['reasoning_tokens']:>10}"
+                     f"{row['cost']:>10.4f}{row['latency']:>10.1f}{100 * row['latency'] / total_latency:>7.1f}"
+                     f"{100 * row['cost'] / total_cost:>7.1f}{mean:>8.2f}{ttfb:>8}")
+    return lines
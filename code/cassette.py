@@ -0,0 +1,187 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import threading
+import requests
+from response_cache import request_digest, next_sample_slot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    provider TEXT NOT NULL,
+    started REAL NOT NULL,
+    latency REAL NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS interactions_request ON interactions (digest, namespace, slot);
+"""
+
+_cassette = None
+
+
+class CassetteMiss(requests.exceptions.RequestException):
+    """Raised in replay mode for a request that the cassette has no recording of."""
+
+
+class Cassette:
+    """
+    Records request/response pairs into a cassette file and serves them back
+    offline. A cassette is an SQLite file with one zlib-compressed row per
+    call, indexed by request digest, namespace and sample slot (see
+    response_cache.next_sample_slot()), so several agent processes can record
+    into one cassette and each replays its own calls in order.
+
+    mode is "record" or "replay". In replay mode `speed` scales the recorded
+    latencies: 1 reproduces the original timing, 2 replays twice as fast and
+    0 serves every response instantly.
+    """
+
+    def __init__(self, path, mode, speed=1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    def record(self, provider, url, payload, outcome, started):
+        """Stores one call; outcome is the response JSON or {"error": ...}."""
+        digest = request_digest(provider, url, payload)
+        namespace, slot = next_sample_slot("cassette", digest)
+        body = zlib.compress(json.dumps(outcome).encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO interactions (namespace, digest, slot, provider, started, latency, body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, digest, slot, provider, started, time.time() - started, body))
+            self.recorded += 1
+
+    def lookup(self, provider, url, payload):
+        """
+        Returns (outcome, latency) of the recording that matches the next call
+        with this payload. A call that the recording never made at this slot
+        (changed control logic, more agents) falls back to the recordings of
+        the same request in any namespace, in turn. Raises CassetteMiss if the
+        request was never recorded.
+        """
+        digest = request_digest(provider, url, payload)
+        namespace, slot = next_sample_slot("cassette", digest)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT latency, body FROM interactions WHERE digest = ? AND namespace = ? AND slot = ? ORDER BY id LIMIT 1",
+                (digest, namespace, slot)).fetchone()
+            if row is None:
+                rows = self._db.execute(
+                    "SELECT latency, body FROM interactions WHERE digest = ? ORDER BY id", (digest,)).fetchall()
+                if rows:
+                    row = rows[slot % len(rows)]
+            if row is None:
+                self.misses += 1
+                raise CassetteMiss(f"No recording of this {provider} request in cassette {self.path}")
+            self.replayed += 1
+        return json.loads(zlib.decompress(row[1])), row[0]
+
+    def delay(self, latency):
+        return latency / self.speed if self.speed > 0 else 0
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode, "recorded": self.recorded, "replayed": self.replayed, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _outcome(outcome):
+    """Returns the recorded response, or raises the recorded error again."""
+    if "error" not in outcome:
+        return outcome["response"]
+    error = outcome["error"]
+    error_class = getattr(requests.exceptions, error["type"], None)
+    if not (isinstance(error_class, type) and issubclass(error_class, requests.exceptions.RequestException)):
+        error_class = requests.exceptions.RequestException
+    raise error_class(error["message"])
+
+
+def configure_cassette(path, mode, speed=1.0):
+    """Starts recording into, or replaying from, the cassette at path."""
+    global _cassette
+    close_cassette()
+    _cassette = Cassette(path, mode, speed=speed)
+    return _cassette
+
+
+def close_cassette():
+    global _cassette
+    if _cassette is not None:
+        _cassette.close()
+        _cassette = None
+
+
+def cassette_stats():
+    return _cassette.stats() if _cassette is not None else None
+
+
+def replaying():
+    return _cassette is not None and _cassette.mode == "replay"
+
+
+def replay(provider, url, payload):
+    """Serves the recorded response of this call, sleeping for its (scaled) original latency."""
+    outcome, latency = _cassette.lookup(provider, url, payload)
+    time.sleep(_cassette.delay(latency))
+    return _outcome(outcome)
+
+
+async def replay_async(provider, url, payload):
+    """Asyncio counterpart of replay()."""
+    outcome, latency = _cassette.lookup(provider, url, payload)
+    await asyncio.sleep(_cassette.delay(latency))
+    return _outcome(outcome)
+
+
+def record(provider, url, payload, started, response_data=None, error=None):
+    """Records a successful response, or the error a call failed with, when recording."""
+    if _cassette is None or _cassette.mode != "record":
+        return
+    if error is None:
+        outcome = {"response": response_data}
+    else:
+        outcome = {"error": {"type": type(error).__name__, "message": str(error)}}
+    _cassette.record(provider, url, payload, outcome, started)
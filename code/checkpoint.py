@@ -0,0 +1,158 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import json
+import time
+import threading
+import contextvars
+from response_cache import request_digest, next_sample_slot
+
+# Journal of the current agent, and what the agent is doing in the current context
+_journal = contextvars.ContextVar("checkpoint_journal", default=None)
+_state = contextvars.ContextVar("checkpoint_state", default={})
+
+
+class Journal:
+    """
+    Append-only checkpoint journal of one agent: one JSON line per API call
+    with the request payload, the response and the agent state at that point
+    (run, iteration, correct/error counters and phase).
+
+    Each line is appended with a single write and fsync'ed, so a killed agent
+    leaves at most one torn line at the end, which is dropped on load. When an
+    agent restarts with the same journal, its calls are served from the
+    journal in order until it reaches the first call that was never answered;
+    from there on it continues live. The agent therefore resumes at the exact
+    call it was on, without paying again for the calls before it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.loaded = 0
+        self.replayed = 0
+        self.recorded = 0
+        self._load()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+                # Concurrent calls (fan-out) may be journaled out of slot order
+                self._entries[(entry["digest"], entry["slot"])] = entry["response"]
+                self.loaded += 1
+        if valid_size < os.path.getsize(self.path):
+            # Drop the line that was being written when the agent was killed
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+
+    def replay(self, digest, slot):
+        """Returns the journaled response of the slot-th call with this digest, or None."""
+        with self._lock:
+            response_data = self._entries.get((digest, slot))
+            if response_data is not None:
+                self.replayed += 1
+            return response_data
+
+    def append(self, digest, slot, provider, payload, response_data):
+        entry = {
+            "seq": None,
+            "time": time.time(),
+            "provider": provider,
+            "digest": digest,
+            "slot": slot,
+            "state": get_state(),
+            "payload": payload,
+            "response": response_data,
+        }
+        with self._lock:
+            entry["seq"] = self.loaded + self.recorded
+            os.write(self._fd, (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+            os.fsync(self._fd)
+            self.recorded += 1
+
+    def stats(self):
+        with self._lock:
+            return {"loaded": self.loaded, "replayed": self.replayed, "recorded": self.recorded}
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def use_journal(journal):
+    """Makes journal the checkpoint journal of the current context (thread or asyncio task)."""
+    _journal.set(journal)
+
+
+def set_state(**fields):
+    """
+    Updates the agent state that is saved with the next journaled call, e.g.
+    set_state(phase="verify") or set_state(iteration=i, correct_count=c).
+    Updates are local to the current thread or asyncio task.
+    """
+    state = dict(_state.get())
+    state.update(fields)
+    _state.set(state)
+
+
+def get_state():
+    return dict(_state.get())
+
+
+def replay_call(provider, url, payload):
+    """
+    Returns (ticket, response): response is what this call got before the
+    agent was restarted, or None if the call must be sent. Pass the ticket to
+    record_call() once the response arrives.
+    """
+    journal = _journal.get()
+    if journal is None:
+        return None, None
+    digest = request_digest(provider, url, payload)
+    _, slot = next_sample_slot("journal", digest)
+    return (journal, digest, slot), journal.replay(digest, slot)
+
+
+def record_call(ticket, provider, payload, response_data):
+    """Journals the response of a call that was not replayed; returns response_data."""
+    if ticket is not None:
+        journal, digest, slot = ticket
+        journal.append(digest, slot, provider, payload, response_data)
+    return response_data
@@ -0,0 +1,236 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import time
+import asyncio
+import threading
+import events
+import checkpoint
+import call_metrics
+from api_client import deadline_remaining, DeadlineExceeded
+
+# --- CONFIGURATION ---
+# Adaptive concurrency is off unless a maximum is set, with
+# configure_concurrency(max_limit=N) or IMO_CONCURRENCY_MAX=N (optionally per
+# provider, e.g. IMO_CONCURRENCY_MAX_GEMINI=32). It is a per-process limit:
+# it gates the requests of all agents that share the process.
+DEFAULT_CONCURRENCY_CONFIG = {
+    "max_limit": 0,          # upper bound of the limit; 0 disables the controller
+    "min_limit": 1,
+    "initial_limit": 4,
+    # Additive increase: +increase per limit's worth of healthy responses (about +1 per round trip)
+    "increase": 1.0,
+    # Multiplicative decrease on a 429 or a latency spike
+    "decrease_factor": 0.5,
+    # A response slower than spike_factor times the latency average of its phase and model counts as a spike
+    "spike_factor": 3.0,
+    # Weight of the newest response in a latency average
+    "latency_alpha": 0.2,
+}
+
+_config = {}
+_controllers = {}
+_lock = threading.Lock()
+
+
+def _env_value(name, provider):
+    value = os.getenv(f"{name}_{provider.upper()}")
+    if value is None:
+        value = os.getenv(name)
+    return value
+
+
+def get_concurrency_config(provider):
+    """Returns the effective concurrency configuration for a provider."""
+    config = dict(DEFAULT_CONCURRENCY_CONFIG)
+    for key in DEFAULT_CONCURRENCY_CONFIG:
+        value = _env_value(f"IMO_CONCURRENCY_{key.upper().replace('_LIMIT', '')}", provider)
+        if value:
+            config[key] = type(DEFAULT_CONCURRENCY_CONFIG[key])(value)
+    config.update(_config.get(None, {}))
+    config.update(_config.get(provider, {}))
+    return config
+
+
+def configure_concurrency(provider=None, **options):
+    """Overrides the concurrency configuration of a provider, or of all providers when provider is None."""
+    unknown = set(options) - set(DEFAULT_CONCURRENCY_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown concurrency option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _config.setdefault(provider, {}).update(options)
+        _controllers.clear()
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease limit on the number of
+    requests in flight to one provider.
+
+    Every healthy response while the limit is in use raises the limit by
+    increase/limit, i.e. by about `increase` per round trip. A 429 or a
+    response slower than spike_factor times the latency average multiplies
+    the limit by decrease_factor. Latency averages are kept per agent phase
+    and model, so a long generation is not compared with a short yes/no
+    check. Only requests sent after the last decrease
+    can trigger the next one, so a burst of 429s from one overloaded moment
+    halves the limit once rather than collapsing it to the minimum.
+    """
+
+    def __init__(self, provider, config):
+        self.provider = provider
+        self.config = config
+        self.limit = float(min(max(config["initial_limit"], config["min_limit"]), config["max_limit"]))
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # (phase, model) -> latency average
+        self.latencies = {}
+        self.last_decrease = 0.0
+        self.stats = {"requests": 0, "queued": 0, "queue_wait": 0.0, "increases": 0,
+                      "decreases": {"rate_limit": 0, "latency": 0}, "errors": 0}
+        self._condition = threading.Condition()
+
+    def _try_acquire(self):
+        if self.in_flight < max(int(self.limit), 1):
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.stats["requests"] += 1
+            return True
+        return False
+
+    def acquire(self):
+        """Waits for a free slot and returns the time the request was let through."""
+        with self._condition:
+            if not self._try_acquire():
+                queued = time.time()
+                self.stats["queued"] += 1
+                while not self._try_acquire():
+                    remaining = deadline_remaining()
+                    if remaining is not None and remaining <= 0:
+                        raise DeadlineExceeded("Agent deadline exceeded while waiting for a request slot")
+                    self._condition.wait(timeout=remaining)
+                self.stats["queue_wait"] += time.time() - queued
+        return time.time()
+
+    async def acquire_async(self):
+        """Asyncio counterpart of acquire(); tasks of one event loop poll for a free slot."""
+        with self._condition:
+            if self._try_acquire():
+                return time.time()
+            self.stats["queued"] += 1
+        queued = time.time()
+        while True:
+            await asyncio.sleep(0.05)
+            with self._condition:
+                if self._try_acquire():
+                    self.stats["queue_wait"] += time.time() - queued
+                    return time.time()
+            remaining = deadline_remaining()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded("Agent deadline exceeded while waiting for a request slot")
+
+    def release(self, started, outcome, key=None):
+        """
+        Frees the slot of a request sent at `started` and adjusts the limit:
+        outcome is None for a response, "rate_limit" for a 429, "cancelled"
+        for a request that was abandoned, or another error class. key picks
+        the latency average; it defaults to the current phase and model.
+        """
+        now = time.time()
+        decision = None
+        if key is None:
+            key = (checkpoint.get_state().get("phase"), call_metrics.current_model())
+        with self._condition:
+            self.in_flight -= 1
+            config = self.config
+            old_limit = self.limit
+            if outcome is None:
+                latency = now - started
+                average = self.latencies.get(key)
+                spike = average is not None and latency > config["spike_factor"] * average
+                if average is None:
+                    self.latencies[key] = latency
+                else:
+                    self.latencies[key] = average + config["latency_alpha"] * (latency - average)
+                if spike:
+                    decision = self._decrease("latency", started, now)
+                elif self.in_flight + 1 >= int(self.limit):
+                    # Only grow a limit that is actually in use
+                    self.limit = min(self.limit + config["increase"] / self.limit, config["max_limit"])
+                    if int(self.limit) > int(old_limit):
+                        self.stats["increases"] += 1
+                        decision = "increase"
+            elif outcome == "rate_limit":
+                decision = self._decrease("rate_limit", started, now)
+            elif outcome != "cancelled":
+                self.stats["errors"] += 1
+            new_limit = self.limit
+            average = self.latencies.get(key)
+            self._condition.notify_all()
+        if decision is not None:
+            events.emit("concurrency", provider=self.provider, decision=decision,
+                        limit=round(new_limit, 2), previous_limit=round(old_limit, 2),
+                        latency_avg=round(average, 3) if average is not None else None)
+
+    def _decrease(self, reason, started, now):
+        if started < self.last_decrease:
+            # Sent before the last decrease; that one already covered this overload
+            return None
+        self.limit = max(self.limit * self.config["decrease_factor"], self.config["min_limit"])
+        self.last_decrease = now
+        self.stats["decreases"][reason] += 1
+        return f"decrease ({reason})"
+
+    def as_dict(self):
+        with self._condition:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight,
+                    "latency_avg": {" ".join(str(part) for part in key): round(average, 3)
+                                    for key, average in self.latencies.items()},
+                    "requests": self.stats["requests"], "queued": self.stats["queued"],
+                    "queue_wait": round(self.stats["queue_wait"], 3), "increases": self.stats["increases"],
+                    "decreases": dict(self.stats["decreases"]), "errors": self.stats["errors"]}
+
+
+def get_controller(provider):
+    """Returns the provider's controller, or None if adaptive concurrency is off for it."""
+    controller = _controllers.get(provider)
+    if controller is None:
+        with _lock:
+            if provider not in _controllers:
+                config = get_concurrency_config(provider)
+                _controllers[provider] = AIMDController(provider, config) if config["max_limit"] > 0 else False
+            controller = _controllers[provider]
+    return controller or None
+
+
+def concurrency_stats():
+    """
+    Returns {provider: {"limit", "in_flight", "peak_in_flight", "latency_avg", "requests", "queued", ...}}
+    for the providers with adaptive concurrency; empty when it is off.
+    """
+    with _lock:
+        controllers = [controller for controller in _controllers.values() if controller]
+    return {controller.provider: controller.as_dict() for controller in controllers}
@@ -0,0 +1,217 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+import contextvars
+import checkpoint
+import log_writer
+import call_metrics
+from usage import extract_usage
+
+# Strings at least this long are stored in the blob store instead of inline
+BLOB_MIN_CHARS = 256
+
+# Event log of the current agent (thread or asyncio task)
+_event_log = contextvars.ContextVar("event_log", default=None)
+
+
+class BlobStore:
+    """
+    Content-addressed store for large texts (prompts, solutions, bug reports).
+    Each distinct text is written once, gzip-compressed, to
+    <root>/<hash[:2]>/<hash>.gz, where hash is the SHA-256 of the text; events
+    refer to it as {"blob": hash, "chars": length, "bytes": size}, where size
+    is what the text takes as a JSON string (see dump()). Several agents,
+    including separate processes, can share one store.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._known = set()
+        self.stored = 0
+        self.reused = 0
+        self.bytes_written = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest + ".gz")
+
+    def put(self, text):
+        """Stores text unless it is already there; returns its hash."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if digest in self._known:
+                self.reused += 1
+                return digest
+            self._known.add(digest)
+        path = self._path(digest)
+        if os.path.exists(path):
+            with self._lock:
+                self.reused += 1
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = gzip.compress(text.encode("utf-8"))
+        # Write under a private name and rename, so readers never see a partial blob
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stored += 1
+            self.bytes_written += len(data)
+        return digest
+
+    def get(self, digest):
+        with open(self._path(digest), "rb") as f:
+            return gzip.decompress(f.read()).decode("utf-8")
+
+    def stats(self):
+        with self._lock:
+            return {"stored": self.stored, "reused": self.reused, "bytes_written": self.bytes_written}
+
+
+class EventLog:
+    """
+    Structured log of one agent: one JSON line per event (API call,
+    verification, iteration, run result) with the time, the agent state
+    (run, iteration, phase, correct/error counters) and the event's fields.
+    Strings of BLOB_MIN_CHARS or more are replaced by references into a
+    BlobStore, so a prompt that is sent twenty times is stored once.
+    """
+
+    def __init__(self, path, blob_dir=None):
+        self.path = path
+        if blob_dir is None:
+            blob_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "blobs")
+        self.blobs = blob_dir if isinstance(blob_dir, BlobStore) else BlobStore(blob_dir)
+        self._lock = threading.Lock()
+        self._writer = log_writer.open_log(path, "a")
+        self.events = 0
+
+    def blobify(self, value):
+        """Returns value with every large string replaced by a blob reference."""
+        if isinstance(value, str):
+            if len(value) < BLOB_MIN_CHARS:
+                return value
+            return {"blob": self.blobs.put(value), "chars": len(value), "bytes": len(json.dumps(value))}
+        if isinstance(value, dict):
+            return {key: self.blobify(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.blobify(item) for item in value]
+        return value
+
+    def emit(self, event, **fields):
+        record = {"time": round(time.time(), 3), "event": event}
+        record.update(checkpoint.get_state())
+        record.update(self.blobify(fields))
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._writer.write(line)
+        with self._lock:
+            self.events += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {"events": self.events}
+        stats.update(self.blobs.stats())
+        return stats
+
+    def close(self):
+        self._writer.close()
+
+
+def use_event_log(event_log):
+    """Makes event_log the event log of the current context (thread or asyncio task)."""
+    _event_log.set(event_log)
+
+
+def get_event_log():
+    return _event_log.get()
+
+
+def emit(event, **fields):
+    """Writes an event to the current event log; does nothing if there is none."""
+    event_log = _event_log.get()
+    if event_log is not None:
+        event_log.emit(event, **fields)
+
+
+def api_call(provider, source, started, payload, response_data=None, error=None):
+    """
+    Logs one API call. source tells where the response came from: "api",
+    "cache", "cassette" or "journal". This also ends the call's metrics
+    record (see call_metrics.py).
+    """
+    metrics = call_metrics.finish_call(source, response_data, error)
+    event_log = _event_log.get()
+    if event_log is None:
+        return
+    fields = {
+        "provider": provider,
+        "source": source,
+        "latency": round(time.time() - started, 3),
+        "request": payload,
+    }
+    if metrics is not None:
+        fields.update(model=metrics["model"], ttfb=metrics["ttfb"], retries=metrics["retries"])
+    if error is not None:
+        fields["error"] = str(error)
+    else:
+        fields["usage"] = extract_usage(response_data)
+        fields["response"] = response_data
+    event_log.emit("api_call", **fields)
+
+
+def dump(value):
+    """
+    Formats a prompt, solution or bug report for the text log. Without an
+    event log this is the full JSON dump; with one, large texts are written to
+    the blob store and the text log only shows their references, in the same
+    layout. log_analyzer.py adds back the "bytes" of each reference to get
+    the size of the full dump.
+    """
+    event_log = _event_log.get()
+    if event_log is None:
+        return json.dumps(value, indent=4)
+    return json.dumps(event_log.blobify(value), indent=4)
+
+
+def load_blob(blob_dir, digest):
+    """Returns the text stored under digest in blob_dir."""
+    return BlobStore(blob_dir).get(digest)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print a text stored in an event log blob store')
+    parser.add_argument('blob', help='Blob hash, as referenced by {"blob": ...} in the event log')
+    parser.add_argument('--blob-dir', type=str, default='blobs', help='Blob store directory (default: blobs)')
+    args = parser.parse_args()
+    print(load_blob(args.blob_dir, args.blob))
@@ -0,0 +1,244 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+from usage import UsageMeter
+
+# Cancellation flags of the FanOut calls the current thread runs inside (innermost last)
+_cancel_events = contextvars.ContextVar("fanout_cancel_events", default=())
+
+
+class BranchCancelled(Exception):
+    """Raised in an abandoned FanOut call instead of making another API call."""
+
+
+def check_cancelled():
+    """
+    Raises BranchCancelled if the FanOut call running in the current thread,
+    or one it runs inside, has been abandoned. send_api_request and the retry
+    loop call it before every request, so abandoned branches stop spending.
+    """
+    if any(event.is_set() for event in _cancel_events.get()):
+        raise BranchCancelled("Abandoned fan-out call")
+
+
+class FanOut:
+    """
+    Runs several blocking calls at the same time and yields their results in
+    completion order:
+
+        with FanOut([lambda: verify(s), lambda: verify(s)]) as results:
+            for index, result in results:
+                if failed(result):
+                    break
+
+    Leaving the block cancels the calls that are still running. A blocking
+    HTTP request cannot be interrupted, so a request in flight runs to
+    completion on its daemon thread (they never delay process exit), but the
+    call makes no further API calls: check_cancelled() raises BranchCancelled
+    in it. Results of cancelled calls are dropped. If a call raises, the
+    exception is re-raised from the iteration.
+    """
+
+    def __init__(self, calls):
+        self.calls = list(calls)
+        self.cancelled = threading.Event()
+        self._results = queue.Queue()
+
+    def _run(self, index, call):
+        _cancel_events.set(_cancel_events.get() + (self.cancelled,))
+        try:
+            outcome = (index, call(), None)
+        except BaseException as e:
+            outcome = (index, None, e)
+        if not self.cancelled.is_set():
+            self._results.put(outcome)
+
+    def __enter__(self):
+        for index, call in enumerate(self.calls):
+            # Copy the caller's context so per-agent logging follows the call
+            context = contextvars.copy_context()
+            thread = threading.Thread(target=context.run, args=(self._run, index, call), daemon=True)
+            thread.start()
+        return self
+
+    def __iter__(self):
+        for _ in range(len(self.calls)):
+            index, result, error = self._results.get()
+            if error is not None:
+                raise error
+            yield index, result
+
+    def cancel(self):
+        """Stops the calls that have not finished yet from making further API calls and drops their results."""
+        self.cancelled.set()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cancel()
+        return False
+
+
+class AsyncFanOut:
+    """
+    Asyncio counterpart of FanOut. Calls are coroutine functions; leaving the
+    block cancels the tasks that are still running, which also aborts their
+    in-flight requests.
+    """
+
+    def __init__(self, calls):
+        self.calls = list(calls)
+        self.tasks = []
+
+    async def __aenter__(self):
+        self.tasks = [asyncio.ensure_future(self._run(index, call)) for index, call in enumerate(self.calls)]
+        return self
+
+    @staticmethod
+    async def _run(index, call):
+        return index, await call()
+
+    async def __aiter__(self):
+        for next_done in asyncio.as_completed(self.tasks):
+            yield await next_done
+
+    async def cancel(self):
+        """Cancels all calls that have not finished yet and waits for them to stop."""
+        pending = [task for task in self.tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.cancel()
+        return False
+
+
+def _branch_records(count):
+    return [{"branch": branch, "status": "cancelled", "latency": None} for branch in range(count)]
+
+
+def _finish_records(records, meters, start):
+    elapsed = time.time() - start
+    for record, meter in zip(records, meters):
+        if record["latency"] is None:
+            # Cancelled branches are charged for the time until the race ended
+            record["latency"] = round(elapsed, 3)
+        record.update(meter.as_dict())
+    return records
+
+
+def first_to_pass(attempt, count, passed):
+    """
+    Races `count` branches of attempt(branch, stop) and returns (result, records).
+
+    result is the first result, in completion order, for which passed(result)
+    is true; if no branch passes it is the first result to arrive. Once a
+    winner is found, `stop` (a threading.Event) is set and the other branches
+    are cancelled (see FanOut). records lists the status ("passed", "failed", "error" or
+    "cancelled"), latency in seconds, number of calls and token usage of each
+    branch. A branch that raises counts as "error"; if all of them raise, the
+    last exception is re-raised.
+    """
+    stop = threading.Event()
+    meters = [UsageMeter() for _ in range(count)]
+    records = _branch_records(count)
+    start = time.time()
+
+    def run(branch):
+        with meters[branch]:
+            try:
+                return attempt(branch, stop), None
+            except Exception as e:
+                return None, e
+
+    winner = None
+    first = None
+    last_error = None
+    with FanOut([lambda branch=branch: run(branch) for branch in range(count)]) as results:
+        for branch, (result, error) in results:
+            records[branch]["latency"] = round(time.time() - start, 3)
+            if error is not None:
+                records[branch]["status"] = "error"
+                records[branch]["error"] = str(error)
+                last_error = error
+                continue
+            if passed(result):
+                records[branch]["status"] = "passed"
+                winner = result
+                break
+            records[branch]["status"] = "failed"
+            if first is None:
+                first = result
+        stop.set()
+
+    _finish_records(records, meters, start)
+    if winner is None and first is None:
+        raise last_error
+    return (winner if winner is not None else first), records
+
+
+async def first_to_pass_async(attempt, count, passed):
+    """
+    Asyncio counterpart of first_to_pass(): attempt(branch) is a coroutine
+    function, and the losing branches are cancelled.
+    """
+    meters = [UsageMeter() for _ in range(count)]
+    records = _branch_records(count)
+    start = time.time()
+
+    async def run(branch):
+        with meters[branch]:
+            try:
+                return await attempt(branch), None
+            except Exception as e:
+                return None, e
+
+    winner = None
+    first = None
+    last_error = None
+    async with AsyncFanOut([lambda branch=branch: run(branch) for branch in range(count)]) as results:
+        async for branch, (result, error) in results:
+            records[branch]["latency"] = round(time.time() - start, 3)
+            if error is not None:
+                records[branch]["status"] = "error"
+                records[branch]["error"] = str(error)
+                last_error = error
+                continue
+            if passed(result):
+                records[branch]["status"] = "passed"
+                winner = result
+                break
+            records[branch]["status"] = "failed"
+            if first is None:
+                first = result
+
+    _finish_records(records, meters, start)
+    if winner is None and first is None:
+        raise last_error
+    return (winner if winner is not None else first), records
@@ -0,0 +1,544 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+# Multi-host sweeps: one coordinator owns the job queue and the results of a
+# benchmark sweep (the same jobs as run_parallel.py --attempts-per-problem),
+# and workers on any number of hosts pull jobs from it over TCP and run them
+# as local agent subprocesses.
+#
+#     python fleet.py coordinator -b proofbench --num-problems 30 --attempts-per-problem 4 --port 8765
+#     python fleet.py worker coordinator-host:8765 --slots 16        # on every worker host
+#
+# The protocol is one JSON object per line in each direction; every request
+# gets exactly one reply:
+#   {"op": "hello", "worker": NAME, "slots": N}           -> {"ok": true}
+#   {"op": "pull"}                                        -> {"job": JOB} or {"job": null, "finished": BOOL}
+#   {"op": "heartbeat", "jobs": [AGENT_ID, ...]}          -> {"cancel": [AGENT_ID, ...]}
+#   {"op": "result", "agent_id": ID, "return_code": RC,
+#    "error": TEXT, "record": RESULT_RECORD}              -> {"ok": true}
+#
+# A worker that disconnects, or sends nothing for --heartbeat-timeout
+# seconds, is dropped and its jobs are queued again. A dropped worker that
+# is still connected gets {"error": TEXT, "dropped": true} for its next
+# pull, heartbeat or result and is disconnected; it stops its agents, whose
+# jobs already belong to someone else. When a job solves a
+# problem, the other running attempts of that problem are cancelled through
+# the heartbeat replies, and so are all attempts of a problem (or of the
+# sweep) that reached its budget. Agent logs stay on the worker hosts; the
+# coordinator keeps the manifest and result records in its --log-dir.
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import budget
+import result_record
+import sweep_manifest
+import run_parallel
+
+DEFAULT_PORT = 8765
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 30.0
+
+
+def send_message(stream, message):
+    stream.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def read_message(stream):
+    """Returns the next message, or None once the other side has closed the connection."""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class Coordinator:
+    """
+    Job queue and results of a fleet sweep, shared by the connection
+    handlers of all workers. Every state change goes through the sweep
+    manifest, so a coordinator restarted with --resume continues where the
+    previous one stopped. The budget ledger gives every job its agent budget
+    and is charged with the result records.
+    """
+
+    def __init__(self, manifest, log_dir, job_options, heartbeat_timeout=HEARTBEAT_TIMEOUT, ledger=None):
+        self.manifest = manifest
+        self.log_dir = log_dir
+        self.job_options = job_options
+        self.heartbeat_timeout = heartbeat_timeout
+        self._lock = threading.Lock()
+        self.queue = deque(manifest.unfinished())
+        self.solved_by = manifest.solved_by()
+        self.ledger = ledger or budget.BudgetLedger()
+        for job in manifest.jobs.values():
+            if job["result"]:
+                self.ledger.charge(job["problem"], result_record.read_result(os.path.join(log_dir, job["result"])))
+        # Problems whose attempts were stopped by the budget
+        self.out_of_budget = set()
+        # agent_id -> worker running it, and worker -> last time it was heard from
+        self.assigned = {}
+        self.workers = {}
+        # worker -> number of agents it runs at once
+        self.slots = {}
+        self.requeued = 0
+
+    def register(self, worker, slots=1):
+        with self._lock:
+            self.workers[worker] = time.time()
+            self.slots[worker] = slots
+        print(f"[fleet] Worker {worker} connected")
+
+    def registered(self, worker):
+        with self._lock:
+            return worker in self.workers
+
+    def _touch(self, worker):
+        if worker in self.workers:
+            self.workers[worker] = time.time()
+
+    def pull(self, worker):
+        """Returns the next job for worker, or None if there is none right now."""
+        with self._lock:
+            if worker not in self.workers:
+                # Dropped: anything handed out now would never be queued again
+                return None
+            self._touch(worker)
+            # Jobs whose budget is held by running attempts wait for them, in order
+            waiting = []
+            try:
+                while self.queue:
+                    agent_id, problem, attempt = self.queue.popleft()
+                    if problem in self.solved_by:
+                        self.manifest.update(agent_id, sweep_manifest.SKIPPED)
+                        continue
+                    # Every attempt that may run alongside this one gets its share
+                    others = [job[1] for job in self.queue] + [job[1] for job in waiting] + \
+                             [self.manifest.jobs[running]["problem"] for running in self.assigned]
+                    slots = sum(self.slots[w] for w in self.workers)
+                    budget_limits = self.ledger.allocate(problem, agent_id, self.ledger.sharing(problem, others, slots))
+                    if budget_limits is None:
+                        self.manifest.update(agent_id, sweep_manifest.SKIPPED, error="budget exhausted")
+                        continue
+                    if budget_limits == budget.WAIT:
+                        waiting.append((agent_id, problem, attempt))
+                        continue
+                    self.assigned[agent_id] = worker
+                    self.manifest.update(agent_id, sweep_manifest.RUNNING, error=f"worker {worker}")
+                    job = {"agent_id": agent_id, "problem": problem, "attempt": attempt, "budget": budget_limits}
+                    job.update(self.job_options)
+                    return job
+                return None
+            finally:
+                self.queue.extendleft(reversed(waiting))
+
+    def heartbeat(self, worker, agent_ids):
+        """Returns the jobs of worker that should stop because their problem is solved or out of budget."""
+        with self._lock:
+            if worker not in self.workers:
+                # Dropped: its jobs were queued again, so all of its agents stop
+                return list(agent_ids)
+            self._touch(worker)
+            stopped = set(self.solved_by) | self.out_of_budget
+            return [agent_id for agent_id in agent_ids
+                    if self.assigned.get(agent_id) == worker
+                    and self.manifest.jobs[agent_id]["problem"] in stopped]
+
+    def report(self, worker, agent_id, return_code, error, record):
+        """Records the outcome of a job and returns its status line and error, or None if it was ignored."""
+        with self._lock:
+            self._touch(worker)
+            if self.assigned.get(agent_id) != worker:
+                # The worker was dropped and the job handed to someone else
+                return None
+            del self.assigned[agent_id]
+            job = self.manifest.jobs[agent_id]
+            problem = job["problem"]
+            label = f"problem {problem}, attempt {job['attempt']}, worker {worker}"
+            result = None
+            if record is not None:
+                result = f"agent_{agent_id:02d}.result.json"
+                result_record.write_result(os.path.join(self.log_dir, result), record)
+            self.ledger.charge(problem, record, agent_id)
+            scope = self.ledger.exhausted(problem)
+            if scope == "run":
+                self.out_of_budget.update(job["problem"] for job in self.manifest.jobs.values())
+            elif scope == "problem":
+                self.out_of_budget.add(problem)
+            if record is not None and record["solved"]:
+                self.solved_by.setdefault(problem, agent_id)
+                state, status = sweep_manifest.SOLVED, f"SOLVED {label}"
+            elif problem in self.solved_by and return_code != 0:
+                state, status = sweep_manifest.CANCELLED, f"CANCELLED {label}"
+                error = ""
+            elif problem in self.out_of_budget and return_code != 0:
+                state, status = sweep_manifest.CANCELLED, f"CANCELLED {label} (budget exhausted)"
+                error = "budget exhausted"
+            elif return_code == 0:
+                state, status = sweep_manifest.UNSOLVED, f"COMPLETED {label} (no solution found)"
+            elif " timed out after " in error:
+                state, status = sweep_manifest.TIMED_OUT, f"TIMED OUT {label}"
+            else:
+                state, status = sweep_manifest.FAILED, f"FAILED {label} (return code: {return_code})"
+            self.manifest.update(agent_id, state, return_code, error, result)
+            return status, error
+
+    def drop_worker(self, worker, reason):
+        """Forgets worker and queues its jobs again, ahead of the jobs that never ran."""
+        with self._lock:
+            known = self.workers.pop(worker, None) is not None
+            self.slots.pop(worker, None)
+            # Requeue by owner, even if the worker was already forgotten
+            lost = [agent_id for agent_id, owner in self.assigned.items() if owner == worker]
+            if not known and not lost:
+                return
+            for agent_id in reversed(sorted(lost, key=self.manifest.order.index)):
+                del self.assigned[agent_id]
+                self.ledger.release(agent_id)
+                job = self.manifest.jobs[agent_id]
+                self.queue.appendleft((agent_id, job["problem"], job["attempt"]))
+                self.manifest.update(agent_id, sweep_manifest.PENDING)
+            self.requeued += len(lost)
+        if lost:
+            print(f"[fleet] Worker {worker} dropped ({reason}); {len(lost)} jobs queued again")
+        else:
+            print(f"[fleet] Worker {worker} {reason}")
+
+    def reap(self):
+        """Drops the workers that have not been heard from within the heartbeat timeout."""
+        now = time.time()
+        with self._lock:
+            silent = [worker for worker, seen in self.workers.items() if now - seen > self.heartbeat_timeout]
+        for worker in silent:
+            self.drop_worker(worker, f"no heartbeat for {self.heartbeat_timeout:.0f}s")
+
+    def finished(self):
+        with self._lock:
+            return not self.queue and not self.assigned
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """Serves one worker connection until the worker hangs up."""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = None
+        reason = "disconnected"
+        try:
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+                op = message.get("op")
+                if op == "hello":
+                    worker = message["worker"]
+                    coordinator.register(worker, message.get("slots", 1))
+                    reply = {"ok": True}
+                elif op in ("pull", "heartbeat", "result") and not coordinator.registered(worker):
+                    # Reaped while still connected: its jobs were queued again
+                    send_message(self.wfile, {"error": f"worker {worker} was dropped", "dropped": True})
+                    reason = "disconnected after it was dropped"
+                    break
+                elif op == "pull":
+                    job = coordinator.pull(worker)
+                    reply = {"job": job, "finished": job is None and coordinator.finished()}
+                elif op == "heartbeat":
+                    reply = {"cancel": coordinator.heartbeat(worker, message.get("jobs", []))}
+                elif op == "result":
+                    reported = coordinator.report(worker, message["agent_id"], message["return_code"],
+                                                  message.get("error", ""), message.get("record"))
+                    if reported is not None:
+                        status, error = reported
+                        run_parallel.print_status(message["agent_id"], status, error=error)
+                    reply = {"ok": True}
+                else:
+                    reply = {"error": f"unknown op {op!r}"}
+                send_message(self.wfile, reply)
+        except (OSError, ValueError) as e:
+            reason = f"connection error: {e}"
+        finally:
+            if worker is not None:
+                coordinator.drop_worker(worker, reason)
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, coordinator):
+        self.coordinator = coordinator
+        super().__init__(address, CoordinatorHandler)
+
+
+def start_coordinator(coordinator, host="127.0.0.1", port=0):
+    """Starts serving coordinator on a background thread and returns the server; server.server_address[1] is the bound port."""
+    server = CoordinatorServer((host, port), coordinator)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_coordinator(args):
+    attempts = args.attempts_per_problem
+    problems = list(range(args.benchmark_start_index, args.benchmark_start_index + args.num_problems))
+    os.makedirs(args.log_dir, exist_ok=True)
+    settings = {"benchmark": args.benchmark, "level": args.level, "agent_file": args.agent_file,
+                "benchmark_start_index": args.benchmark_start_index, "num_problems": args.num_problems,
+                "attempts_per_problem": attempts}
+    manifest_path = os.path.join(args.log_dir, "sweep_manifest.json")
+    if args.resume and os.path.exists(manifest_path):
+        manifest = sweep_manifest.SweepManifest.load(manifest_path, settings)
+        print(f"Resuming sweep from {manifest_path}")
+    else:
+        jobs = [(slot * attempts + attempt, problem, attempt)
+                for attempt in range(attempts)
+                for slot, problem in enumerate(problems)]
+        manifest = sweep_manifest.SweepManifest(manifest_path, settings, jobs)
+        manifest.write()
+
+    job_options = {"benchmark": args.benchmark, "level": args.level, "agent_file": args.agent_file,
+                   "timeout": args.timeout, "other_prompts": args.other_prompts.split(',') if args.other_prompts else [],
+                   "parallel_confirm": args.parallel_confirm, "correction_branches": args.correction_branches,
+                   "max_output_mb": args.max_output_mb}
+    coordinator = Coordinator(manifest, args.log_dir, job_options, args.heartbeat_timeout,
+                              run_parallel.budget_ledger(args))
+    server = start_coordinator(coordinator, args.host, args.port)
+    print(f"Coordinator listening on {args.host}:{server.server_address[1]}: "
+          f"{len(coordinator.queue)} jobs for {len(problems)} problems")
+
+    start_time = time.time()
+    try:
+        while not coordinator.finished():
+            time.sleep(1.0)
+            coordinator.reap()
+        # Give the workers a chance to hear that the sweep is over
+        deadline = time.time() + 2 * HEARTBEAT_INTERVAL
+        while coordinator.workers and time.time() < deadline:
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print("\nReceived interrupt signal. Shutting down...")
+    server.shutdown()
+    server.server_close()
+
+    counts = manifest.counts()
+    records = [result_record.read_result(os.path.join(args.log_dir, job["result"]))
+               for job in manifest.jobs.values() if job["result"]]
+    summary = result_record.summarize(records)
+    print("\n" + "=" * 50)
+    print("FLEET SUMMARY")
+    print("=" * 50)
+    print(f"Total execution time: {time.time() - start_time:.2f} seconds")
+    print(f"Problems solved: {len(coordinator.solved_by)}/{len(problems)}")
+    print(f"Jobs: {json.dumps(counts)}, queued again after a worker was lost: {coordinator.requeued}")
+    print(f"Runs: {summary['runs']}, iterations: {summary['iterations']}, API calls: {summary['calls']}, "
+          f"tokens: {summary['total_tokens']}")
+    run_parallel.print_budget(coordinator.ledger, summary)
+    run_parallel.print_phases(summary)
+    spent = coordinator.ledger.as_dict()["problems"]
+    for problem in problems:
+        if problem in coordinator.solved_by:
+            outcome = f"solved by Agent {coordinator.solved_by[problem]:02d}"
+        elif problem in coordinator.out_of_budget:
+            outcome = "unsolved, out of budget"
+        else:
+            outcome = "unsolved"
+        cost = spent.get(problem, {"tokens": 0, "cost": 0.0})
+        print(f"  Problem {problem}: {outcome} ({cost['tokens']} tokens, ${cost['cost']:.4f})")
+    print(f"Sweep manifest: {os.path.abspath(manifest_path)}")
+    return 0 if len(coordinator.solved_by) == len(problems) else 1
+
+
+class CoordinatorClient:
+    """A worker's connection to the coordinator."""
+
+    def __init__(self, address, worker, slots):
+        host, _, port = address.rpartition(":")
+        self.sock = socket.create_connection((host or "127.0.0.1", int(port)))
+        self.stream = self.sock.makefile("rwb")
+        self.request({"op": "hello", "worker": worker, "slots": slots})
+
+    def request(self, message):
+        send_message(self.stream, message)
+        reply = read_message(self.stream)
+        if reply is None:
+            raise ConnectionError("coordinator closed the connection")
+        if reply.get("dropped"):
+            raise ConnectionError(reply["error"])
+        return reply
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+def run_worker(args):
+    worker = args.name or f"{socket.gethostname()}:{os.getpid()}"
+    os.makedirs(args.log_dir, exist_ok=True)
+    cancel_dir = os.path.join(args.log_dir, "cancel")
+    os.makedirs(cancel_dir, exist_ok=True)
+    for directory in (args.checkpoint_dir, args.events_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    client = CoordinatorClient(args.coordinator, worker, args.slots)
+    print(f"Worker {worker} connected to {args.coordinator} with {args.slots} slots")
+    executor = ProcessPoolExecutor(max_workers=args.slots)
+    running = {}
+    finished = False
+    last_heartbeat = time.time()
+    try:
+        while True:
+            while not finished and len(running) < args.slots:
+                reply = client.request({"op": "pull"})
+                job = reply["job"]
+                if job is None:
+                    finished = reply["finished"]
+                    break
+                agent_id = job["agent_id"]
+                cancel_file = os.path.join(cancel_dir, f"agent_{agent_id:02d}")
+                if os.path.exists(cancel_file):
+                    os.remove(cancel_file)
+                future = executor.submit(
+                    run_parallel.run_agent, agent_id, None, args.log_dir, job["timeout"], job["other_prompts"],
+                    job["agent_file"], job["benchmark"], job["level"], job["problem"],
+                    job["parallel_confirm"], job["correction_branches"],
+                    checkpoint_dir=args.checkpoint_dir, events_dir=args.events_dir,
+                    max_output_mb=job["max_output_mb"], cancel_file=cancel_file,
+                    budget_limits=job.get("budget"))
+                running[future] = agent_id
+                print(f"[Agent {agent_id:02d}] started: problem {job['problem']}, attempt {job['attempt']}")
+            if finished and not running:
+                break
+
+            if running:
+                done, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+            else:
+                # Nothing to do until the other workers finish or drop out
+                done = ()
+                time.sleep(1.0)
+            for future in done:
+                agent_id = running.pop(future)
+                _, return_code, output, error, record = future.result()
+                client.request({"op": "result", "agent_id": agent_id, "return_code": return_code,
+                                "error": error, "record": record})
+                run_parallel.print_status(agent_id, f"FINISHED (return code: {return_code})", output, error)
+
+            if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                reply = client.request({"op": "heartbeat", "jobs": list(running.values())})
+                for agent_id in reply["cancel"]:
+                    with open(os.path.join(cancel_dir, f"agent_{agent_id:02d}"), "w"):
+                        pass
+                last_heartbeat = time.time()
+    except (OSError, ValueError) as e:
+        print(f"Lost the coordinator: {e}")
+        # Stop the agents; the coordinator queues their jobs again
+        for process in list(getattr(executor, "_processes", {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 1
+    except KeyboardInterrupt:
+        print("\nReceived interrupt signal. Shutting down...")
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 1
+    executor.shutdown()
+    client.close()
+    print(f"Worker {worker} done")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a benchmark sweep on agents spread over several hosts')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = subparsers.add_parser('coordinator', help='Own the job queue and collect the results')
+    coordinator.add_argument('--host', type=str, default='0.0.0.0', help='Address to listen on (default: 0.0.0.0)')
+    coordinator.add_argument('--port', '-p', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    coordinator.add_argument('--benchmark', '-b', type=str, choices=['gradingbench', 'proofbench'], required=True,
+                             help='Benchmark to sweep')
+    coordinator.add_argument('--level', type=str, help='Filter benchmark by level (Basic, Advanced). Case-insensitive.')
+    coordinator.add_argument('--benchmark-start-index', type=int, default=0,
+                             help='Index of the first problem (default: 0)')
+    coordinator.add_argument('--num-problems', type=int, default=1, help='Number of problems (default: 1)')
+    coordinator.add_argument('--attempts-per-problem', type=int, default=1,
+                             help='Attempts per problem; the others are cancelled once one solves it (default: 1)')
+    coordinator.add_argument('--log-dir', '-d', default='logs',
+                             help='Directory for the sweep manifest and result records (default: logs)')
+    coordinator.add_argument('--resume', action='store_true',
+                             help='Continue the sweep recorded in the log directory')
+    coordinator.add_argument('--timeout', '-t', type=int, default=None,
+                             help='Timeout in seconds for each attempt (default: no timeout)')
+    coordinator.add_argument('--agent-file', '-a', type=str, default='agent.py',
+                             help='Agent file the workers run (default: agent.py)')
+    coordinator.add_argument('--other_prompts', '-o', type=str, help='Other prompts (optional)')
+    coordinator.add_argument('--parallel-confirm', action='store_true',
+                             help='Let each agent run its confirmation verifications in parallel')
+    coordinator.add_argument('--correction-branches', type=int, default=1,
+                             help='Number of correction branches each agent races after a failed verification (default: 1)')
+    coordinator.add_argument('--max-output-mb', type=float, default=50,
+                             help="Cap on each agent's stdout/stderr file, in MB (default: 50)")
+    coordinator.add_argument('--budget-tokens', type=int, help='Token ceiling of the whole sweep (optional)')
+    coordinator.add_argument('--budget-usd', type=float,
+                             help='USD ceiling of the whole sweep at the IMO_PRICES rates (optional)')
+    coordinator.add_argument('--problem-budget-tokens', type=int,
+                             help='Token ceiling per problem, over all of its attempts (optional)')
+    coordinator.add_argument('--problem-budget-usd', type=float,
+                             help='USD ceiling per problem, over all of its attempts (optional)')
+    coordinator.add_argument('--agent-budget-tokens', type=int, help='Token ceiling of each attempt (optional)')
+    coordinator.add_argument('--agent-budget-usd', type=float, help='USD ceiling of each attempt (optional)')
+    coordinator.add_argument('--budget-downgrade-model', type=str,
+                             help='Send the calls an agent makes past --budget-downgrade-at of its budget to this cheaper model (optional)')
+    coordinator.add_argument('--budget-downgrade-at', type=float, default=None,
+                             help='Share of a ceiling after which agents switch to --budget-downgrade-model (default: 0.8)')
+    coordinator.add_argument('--heartbeat-timeout', type=float, default=HEARTBEAT_TIMEOUT,
+                             help=f'Drop a worker that is silent for this many seconds and queue its jobs again (default: {HEARTBEAT_TIMEOUT:.0f})')
+
+    worker = subparsers.add_parser('worker', help='Pull jobs from a coordinator and run them locally')
+    worker.add_argument('coordinator', type=str, help='Coordinator address, HOST:PORT')
+    worker.add_argument('--slots', '-n', type=int, default=10, help='Number of agents to run at once (default: 10)')
+    worker.add_argument('--name', type=str, help='Worker name shown by the coordinator (default: HOST:PID)')
+    worker.add_argument('--log-dir', '-d', default='logs', help='Directory for the agent logs on this host (default: logs)')
+    worker.add_argument('--checkpoint-dir', type=str,
+                        help='Directory for per-agent checkpoint journals on this host (optional)')
+    worker.add_argument('--events-dir', type=str,
+                        help='Directory for per-agent event logs on this host (optional)')
+
+    args = parser.parse_args()
+    if args.role == 'coordinator':
+        return run_coordinator(args)
+    return run_worker(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import atexit
+import socket
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- CONFIGURATION ---
+# Agent processes push their counters to the address in IMO_METRICS_PUSH
+# (set by run_parallel.py --metrics-port/--metrics-file) every
+# IMO_METRICS_PUSH_INTERVAL seconds, as one UDP datagram on localhost.
+PUSH_ENV = "IMO_METRICS_PUSH"
+DEFAULT_PUSH_INTERVAL = 2.0
+# Rates and latency quantiles are taken over the last WINDOW seconds
+DEFAULT_WINDOW = 60.0
+# Upper bounds of the call latency histogram, in seconds
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300, 600, math.inf)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_PROVIDER_COUNTERS = ("in_flight", "attempts", "rate_limited", "calls", "errors", "tokens", "latency_sum")
+_lock = threading.Lock()
+_providers = {}
+_verifications = {"pass": 0, "fail": 0}
+_pusher = None
+
+
+def _provider(provider):
+    counters = _providers.get(provider)
+    if counters is None:
+        counters = _providers[provider] = dict.fromkeys(_PROVIDER_COUNTERS, 0)
+        counters["latency_sum"] = 0.0
+        counters["latency_buckets"] = [0] * len(LATENCY_BUCKETS)
+    return counters
+
+
+def attempt_started(provider):
+    """Counts a request sent to the provider; retry.call_with_retry calls it before every attempt."""
+    _start_pusher()
+    with _lock:
+        _provider(provider)["in_flight"] += 1
+
+
+def attempt_finished(provider, outcome):
+    """Counts the end of an attempt: outcome is None, an error class of retry.classify(), "error" or "cancelled"."""
+    with _lock:
+        counters = _provider(provider)
+        counters["in_flight"] -= 1
+        if outcome != "cancelled":
+            counters["attempts"] += 1
+        if outcome == "rate_limit":
+            counters["rate_limited"] += 1
+
+
+def call_finished(record):
+    """Counts a finished send_api_request call from its call_metrics record; only calls that reached the provider count."""
+    if record["source"] != "api":
+        return
+    with _lock:
+        counters = _provider(record["provider"])
+        counters["calls"] += 1
+        counters["errors"] += record["error"] is not None
+        counters["tokens"] += record["prompt_tokens"] + record["output_tokens"]
+        counters["latency_sum"] += record["latency"]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if record["latency"] <= bound:
+                counters["latency_buckets"][i] += 1
+                break
+
+
+def verification(verdict):
+    """Counts a verification verdict, "pass" or "fail"."""
+    with _lock:
+        _verifications[verdict] = _verifications.get(verdict, 0) + 1
+
+
+def snapshot():
+    """Returns the counters of this process: {"pid", "providers": {provider: counters}, "verifications"}."""
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "providers": {provider: dict(counters, latency_buckets=list(counters["latency_buckets"]))
+                          for provider, counters in _providers.items()},
+            "verifications": dict(_verifications),
+        }
+
+
+class _Pusher:
+    """Sends the process's snapshot to the collector every interval and once more at exit."""
+
+    def __init__(self, address, interval):
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.interval = interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        thread = threading.Thread(target=self._run, name="metrics-push", daemon=True)
+        thread.start()
+        atexit.register(self.push)
+
+    def push(self):
+        try:
+            self.sock.sendto(json.dumps(snapshot()).encode("utf-8"), self.address)
+        except OSError:
+            # Metrics must never stop an agent
+            pass
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.push()
+
+
+def _start_pusher():
+    global _pusher
+    if _pusher is not None:
+        return
+    with _lock:
+        if _pusher is None:
+            address = os.getenv(PUSH_ENV)
+            interval = float(os.getenv("IMO_METRICS_PUSH_INTERVAL") or DEFAULT_PUSH_INTERVAL)
+            _pusher = _Pusher(address, interval) if address else False
+
+
+def flush():
+    """Pushes the counters of this process now, e.g. before a worker process hands back its result."""
+    if _pusher:
+        _pusher.push()
+
+
+def _quantile(q, buckets):
+    """Estimates quantile q from histogram bucket counts, interpolating inside the bucket like histogram_quantile()."""
+    total = sum(buckets)
+    if total == 0:
+        return math.nan
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(buckets):
+        if count and seen + count >= rank:
+            lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+            upper = LATENCY_BUCKETS[i]
+            if math.isinf(upper):
+                return lower
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return LATENCY_BUCKETS[-2]
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        return repr(round(value, 6))
+    return str(value)
+
+
+class MetricsCollector:
+    """
+    Receives the snapshots pushed by the agent processes on a localhost UDP
+    port and renders the fleet's metrics in the Prometheus text format:
+
+        collector = MetricsCollector(status=lambda: (running, queued))
+        collector.start(port=9464, textfile="metrics.prom")
+        ...
+        collector.stop()
+
+    start() sets IMO_METRICS_PUSH, so agent processes started afterwards
+    push to it. Counters are the sums of every process's last snapshot;
+    requests in flight only count processes heard from recently, so an
+    agent that was killed does not stay in flight. status() returns the
+    agents running and queued.
+    """
+
+    def __init__(self, status=None, interval=DEFAULT_PUSH_INTERVAL, window=DEFAULT_WINDOW):
+        self.status = status
+        self.interval = interval
+        self.window = window
+        self._lock = threading.Lock()
+        self._sources = {}
+        self._history = deque()
+        self._stop = threading.Event()
+        self._threads = []
+        self.sock = None
+        self.http_server = None
+        self.textfile = None
+        self.address = None
+
+    def receive(self, message):
+        """Keeps a snapshot pushed by an agent process."""
+        with self._lock:
+            self._sources[message["pid"]] = (time.time(), message)
+
+    def merged(self):
+        """Adds up the last snapshots of all processes, and this process's own counters."""
+        now = time.time()
+        with self._lock:
+            # Pushes of our own would count this process twice
+            sources = [source for pid, source in self._sources.items() if pid != os.getpid()]
+        sources.append((now, snapshot()))
+        providers = {}
+        verifications = {"pass": 0, "fail": 0}
+        for received, message in sources:
+            fresh = now - received <= 3 * self.interval
+            for provider, counters in message["providers"].items():
+                total = providers.setdefault(provider, dict(dict.fromkeys(_PROVIDER_COUNTERS, 0), latency_sum=0.0,
+                                                            latency_buckets=[0] * len(LATENCY_BUCKETS)))
+                for key in _PROVIDER_COUNTERS:
+                    if key != "in_flight" or fresh:
+                        total[key] += counters[key]
+                total["latency_buckets"] = [a + b for a, b in zip(total["latency_buckets"], counters["latency_buckets"])]
+            for verdict, count in message["verifications"].items():
+                verifications[verdict] = verifications.get(verdict, 0) + count
+        return {"time": now, "providers": providers, "verifications": verifications}
+
+    def tick(self):
+        """Samples the counters for the windowed rates; returns the sample."""
+        sample = self.merged()
+        with self._lock:
+            self._history.append(sample)
+            # Keep one sample at or before the start of the window
+            while len(self._history) > 2 and self._history[1]["time"] <= sample["time"] - self.window:
+                self._history.popleft()
+        return sample
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        current = self.merged()
+        with self._lock:
+            oldest = self._history[0] if self._history else None
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {_number(value)}" if label_text else f"{name} {_number(value)}")
+
+        if self.status is not None:
+            running, queued = self.status()
+            metric("imo_agents_running", "gauge", "Agents running.", [((), running)])
+            metric("imo_agents_queued", "gauge", "Agents waiting for a worker.", [((), queued)])
+
+        providers = sorted(current["providers"].items())
+        elapsed = current["time"] - oldest["time"] if oldest is not None else 0.0
+
+        def delta(provider, key):
+            before = oldest["providers"].get(provider) if oldest is not None else None
+            return current["providers"][provider][key] - (before[key] if before else 0)
+
+        metric("imo_api_requests_in_flight", "gauge", "API requests in flight.",
+               [((("provider", p),), c["in_flight"]) for p, c in providers])
+        metric("imo_api_attempts_total", "counter", "API requests sent, retries included.",
+               [((("provider", p),), c["attempts"]) for p, c in providers])
+        metric("imo_api_rate_limited_total", "counter", "API requests answered with 429.",
+               [((("provider", p),), c["rate_limited"]) for p, c in providers])
+        metric("imo_api_rate_limited_ratio", "gauge", f"Share of the API requests of the last {self.window:g}s answered with 429.",
+               [((("provider", p),), delta(p, "rate_limited") / delta(p, "attempts") if delta(p, "attempts") else 0.0)
+                for p, c in providers])
+        metric("imo_api_calls_total", "counter", "API calls made, each with its retries.",
+               [((("provider", p),), c["calls"]) for p, c in providers])
+        metric("imo_api_call_errors_total", "counter", "API calls that failed after their retries.",
+               [((("provider", p),), c["errors"]) for p, c in providers])
+        metric("imo_tokens_total", "counter", "Prompt and output tokens.",
+               [((("provider", p),), c["tokens"]) for p, c in providers])
+        metric("imo_tokens_per_second", "gauge", f"Prompt and output tokens per second over the last {self.window:g}s.",
+               [((("provider", p),), delta(p, "tokens") / elapsed if elapsed > 0 else 0.0) for p, c in providers])
+
+        lines.append("# HELP imo_api_call_latency_seconds Latency of the API calls, retries included.")
+        lines.append("# TYPE imo_api_call_latency_seconds histogram")
+        for p, c in providers:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, c["latency_buckets"]):
+                cumulative += count
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f'imo_api_call_latency_seconds_bucket{{provider="{p}",le="{le}"}} {cumulative}')
+            lines.append(f'imo_api_call_latency_seconds_sum{{provider="{p}"}} {_number(c["latency_sum"])}')
+            lines.append(f'imo_api_call_latency_seconds_count{{provider="{p}"}} {c["calls"]}')
+
+        samples = []
+        for p, c in providers:
+            before = oldest["providers"].get(p) if oldest is not None else None
+            buckets = [a - b for a, b in zip(c["latency_buckets"], before["latency_buckets"])] if before else c["latency_buckets"]
+            samples.extend(((("provider", p), ("quantile", f"{q:g}")), _quantile(q, buckets)) for q in QUANTILES)
+        metric("imo_api_call_latency_quantile_seconds", "gauge",
+               f"Latency quantiles of the API calls of the last {self.window:g}s, estimated from the histogram.", samples)
+
+        verdicts = current["verifications"]
+        checked = verdicts.get("pass", 0) + verdicts.get("fail", 0)
+        metric("imo_verifications_total", "counter", "Verification verdicts.",
+               [((("verdict", v),), n) for v, n in sorted(verdicts.items())])
+        metric("imo_verification_pass_ratio", "gauge", "Share of the verifications that passed.",
+               [((), verdicts.get("pass", 0) / checked if checked else 0.0)])
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self):
+        """Writes the metrics to the textfile atomically, for the node_exporter textfile collector."""
+        tmp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.textfile)
+
+    def start(self, port=None, textfile=None):
+        """Starts receiving pushes and, with port, serves /metrics on 127.0.0.1:port; with textfile, keeps it up to date."""
+        self.textfile = textfile
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.5)
+        self.address = f"127.0.0.1:{self.sock.getsockname()[1]}"
+        # Inherited by the agent subprocesses and the worker processes
+        os.environ[PUSH_ENV] = self.address
+        os.environ["IMO_METRICS_PUSH_INTERVAL"] = str(self.interval)
+        self.tick()
+        self._threads = [threading.Thread(target=self._receive_loop, name="metrics-receive", daemon=True),
+                         threading.Thread(target=self._tick_loop, name="metrics-tick", daemon=True)]
+        if port is not None:
+            self.http_server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+            self.http_server.daemon_threads = True
+            self._threads.append(threading.Thread(target=self.http_server.serve_forever, name="metrics-http", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _receive_loop(self):
+        while not self._stop.is_set():
+            try:
+                data, _ = self.sock.recvfrom(65536)
+                self.receive(json.loads(data))
+            except socket.timeout:
+                continue
+            except (OSError, ValueError, KeyError) as e:
+                if self._stop.is_set():
+                    break
+                print(f"Ignoring a metrics push: {e}", file=sys.stderr)
+
+    def _tick_loop(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
+            if self.textfile:
+                try:
+                    self.write_textfile()
+                except OSError as e:
+                    print(f"Cannot write the metrics textfile: {e}", file=sys.stderr)
+
+    def stop(self):
+        """Stops the collector after a last textfile update."""
+        self._stop.set()
+        for thread in self._threads:
+            if thread.name != "metrics-http":
+                thread.join()
+        # Take in the last pushes of the agents that just exited
+        self.sock.setblocking(False)
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(65536)
+                self.receive(json.loads(data))
+            except (OSError, ValueError, KeyError):
+                break
+        self.tick()
+        if self.textfile:
+            self.write_textfile()
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+        self.sock.close()
+        os.environ.pop(PUSH_ENV, None)
+
+
+def _handler(collector):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = collector.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
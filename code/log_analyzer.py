@@ -0,0 +1,470 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import time
+import calendar
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONFIGURATION ---
+# Adapters are told apart by how they log responses: agent_oai.py prints
+# ">>>>>> Response:", agent_xai.py ">>>>>>> Response:", agent_gpt_oss.py
+# ">>>>>>> Streaming Response:" and agent.py/agent_async.py nothing.
+ADAPTERS = ("gemini", "openai", "xai", "gpt_oss")
+PHASES = ("init", "self_improve", "verify", "check", "correction")
+# Prompts whose JSON dump follows their marker line
+PROMPTS = ("init", "correction", "verify")
+# Verdict sources: old logs, Final Verdict parsed by verdict.py, LLM yes/no check, parallel confirmation
+VERDICT_SOURCES = ("unknown", "parsed", "llm", "confirmation")
+
+# Marker lines: ">>>>>" lines (timestamped by log_print since the API
+# adapters, not in the Gemini run logs) and the per-iteration counter line.
+# Starting the pattern with a literal newline lets re skip ahead with a fast
+# byte search instead of trying every position, several times faster than
+# "^" in MULTILINE mode; a log's first line is its "Logging to file" header.
+_MARKER = re.compile(
+    rb"\n(?:(?:\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\] )?(>{5,}) ?([^\r\n]*)|Number of iterations: (\d+))"
+)
+
+# A blob reference in a prompt dump written with an event log (see events.dump())
+_BLOB_REF = re.compile(rb'\{\s*"blob": "[0-9a-f]{64}",\s*"chars": \d+,\s*"bytes": (\d+)\s*\}')
+
+_NEUTRAL, _VERDICT, _CONFIRM, _SOLVED, _RUN, _STATS = range(-6, 0)
+# What a marker means, by the start of its text; the first match wins. A
+# phase marker starts a phase that lasts until the next marker that is not
+# neutral (responses and prompt dumps happen inside a phase).
+_RULES = (
+    (b"Initial prompt.", PHASES.index("init")),
+    (b"Self improvement start:", PHASES.index("self_improve")),
+    (b"Start verification.", PHASES.index("verify")),
+    (b"Running ", PHASES.index("verify")),  # "Running N confirmation verifications in parallel ..."
+    (b"Verification results:", PHASES.index("check")),
+    (b"Starting ", PHASES.index("correction")),  # "Starting N correction branches ..."
+    (b"New prompt:", PHASES.index("correction")),
+    (b"Response:", _NEUTRAL),
+    (b"Streaming Response:", _NEUTRAL),
+    (b"Verification prompt:", _NEUTRAL),
+    (b"Review bug report prompt:", _NEUTRAL),
+    (b"[DEBUG]", _NEUTRAL),
+    (b"Confirmation verification ", _CONFIRM),
+    (b"Is verification good?", _VERDICT),
+    (b"Correct solution found.", _SOLVED),
+    (b"Found a correct solution in run", _SOLVED),
+    (b"Run ", _RUN),
+    (b"Phase stats:", _STATS),
+)
+_RUN_NUMBER = re.compile(rb"Run (\d+)")
+_PROMPT_MARKERS = {
+    b"Initial prompt.": PROMPTS.index("init"),
+    b"New prompt:": PROMPTS.index("correction"),
+    b"Verification prompt:": PROMPTS.index("verify"),
+}
+
+# Columns of the per-log table, in the order parse_log() returns them
+LOG_COLUMNS = (
+    ("adapter", "b"), ("bytes", "q"), ("runs", "i"), ("iterations", "i"), ("solved", "b"),
+    ("solved_run", "i"), ("iterations_to_success", "i"), ("verifications", "i"), ("passes", "i"),
+    ("wall_time", "d"),
+) + tuple((f"{phase}_seconds", "d") for phase in PHASES)
+# Columns of the per-segment, per-verdict and per-prompt tables; "log" is the row of the log
+PHASE_COLUMNS = (("log", "i"), ("phase", "b"), ("seconds", "d"))
+VERIFICATION_COLUMNS = (("log", "i"), ("run", "i"), ("iteration", "i"), ("passed", "b"), ("source", "b"), ("seconds", "d"))
+PROMPT_COLUMNS = (("log", "i"), ("kind", "b"), ("bytes", "q"))
+# Per-phase call totals from the "Phase stats" line agents print at exit (see call_metrics.py)
+CALL_COLUMNS = (("log", "i"), ("phase", "b"), ("calls", "i"), ("prompt_tokens", "q"), ("output_tokens", "q"), ("cost", "d"))
+
+
+class Table:
+    """
+    Equal-length columns in typed arrays. Arrays pickle cheaply between
+    processes and expose their buffers, so numpy.frombuffer(table["col"],
+    dtype=...) gives a numpy view without copying where numpy is installed.
+    """
+
+    def __init__(self, columns):
+        self.columns = {name: array(typecode) for name, typecode in columns}
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def append(self, *values):
+        for column, value in zip(self.columns.values(), values):
+            column.append(value)
+
+    def extend(self, other, **constants):
+        """Appends the rows of other; columns other does not have are filled with constants[name]."""
+        rows = len(other)
+        for name, column in self.columns.items():
+            if name in other.columns:
+                column.extend(other.columns[name])
+            else:
+                column.extend(array(column.typecode, [constants[name]]) * rows)
+
+    def rows(self):
+        return zip(*self.columns.values())
+
+
+def _classify(text):
+    for prefix, kind in _RULES:
+        if text.startswith(prefix):
+            return kind
+    return None
+
+
+def _add_call_stats(calls, text):
+    try:
+        table = json.loads(text)
+    except ValueError:
+        return
+    for phase, row in table.items():
+        if phase in PHASES:
+            calls.append(PHASES.index(phase), row.get("calls", 0), row.get("prompt_tokens", 0),
+                         row.get("output_tokens", 0), row.get("cost", 0.0))
+
+
+def _dump_size(data, start, end):
+    """Bytes of the prompt dump in data[start:end], counting blob references at the size of their text."""
+    size = end - start
+    if data.find(b'"blob": "', start, end) >= 0:
+        for ref in _BLOB_REF.finditer(data, start, end):
+            size += int(ref.group(1)) - (ref.end() - ref.start())
+    return size
+
+
+def _timestamp(stamp, cache):
+    seconds = cache.get(stamp)
+    if seconds is None:
+        seconds = cache[stamp] = calendar.timegm(time.strptime(stamp.decode(), "%Y-%m-%d %H:%M:%S"))
+    return seconds
+
+
+def parse_log(path):
+    """
+    Scans one agent log through mmap without decoding it: only marker lines
+    are looked at, prompt sizes are the byte spans of their dumps (blob
+    references count at the size of their text). Returns
+    (row of LOG_COLUMNS, phase segments, verifications, prompts, calls);
+    seconds are NaN where the log has no timestamps.
+    """
+    phases, verifications, prompts = Table(PHASE_COLUMNS[1:]), Table(VERIFICATION_COLUMNS[1:]), Table(PROMPT_COLUMNS[1:])
+    calls = Table(CALL_COLUMNS[1:])
+    phase_seconds = [0.0] * len(PHASES)
+    adapter = runs = iterations = 0
+    solved_run, iterations_to_success, run, iteration = -1, -1, -1, -1
+    stamps = {}
+    # The open phase segment, and the prompt dump or verdict answer that runs up to the next marker
+    open_phase, open_ts, verify_ts = None, math.nan, math.nan
+    pending = None
+
+    def close_phase(ts):
+        nonlocal open_phase
+        if open_phase is not None:
+            phases.append(open_phase, ts - open_ts)
+            if not math.isnan(ts - open_ts):
+                phase_seconds[open_phase] += ts - open_ts
+            open_phase = None
+
+    def close_pending(data, end):
+        kind, value, start, seconds = pending
+        if kind == "prompt":
+            prompts.append(value, _dump_size(data, start, end))
+        else:
+            verifications.append(run, iteration, b"yes" in data[start:end].lower(), value, seconds)
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            for match in _MARKER.finditer(data):
+                if pending is not None:
+                    close_pending(data, match.start())
+                    pending = None
+                if match.group(4) is not None:
+                    iteration = int(match.group(4))
+                    iterations += 1
+                    continue
+
+                stamp, arrows, text = match.group(1, 2, 3)
+                ts = _timestamp(stamp, stamps) if stamp is not None else math.nan
+                if text.startswith(b"Streaming Response:"):
+                    adapter = ADAPTERS.index("gpt_oss")
+                elif text.startswith(b"Response:") and ADAPTERS[adapter] != "gpt_oss":
+                    adapter = ADAPTERS.index("openai" if len(arrows) == 6 else "xai")
+
+                kind = _classify(text)
+                if kind is None or (kind < 0 and kind not in (_NEUTRAL, _CONFIRM)):
+                    close_phase(ts)
+                elif kind >= 0 and kind != open_phase:
+                    close_phase(ts)
+                    open_phase, open_ts = kind, ts
+                    if PHASES[kind] == "verify":
+                        verify_ts = ts
+
+                if text.rstrip() in _PROMPT_MARKERS:
+                    pending = ("prompt", _PROMPT_MARKERS[text.rstrip()], match.end(), None)
+                elif kind == _VERDICT:
+                    source = VERDICT_SOURCES.index("parsed" if b"parsed" in text else "llm" if b"LLM" in text else "unknown")
+                    pending = ("verdict", source, match.end(), ts - verify_ts)
+                elif kind == _CONFIRM:
+                    verifications.append(run, iteration, b"yes" in text.partition(b":")[2].lower(),
+                                         VERDICT_SOURCES.index("confirmation"), math.nan)
+                elif kind == _SOLVED and solved_run < 0:
+                    solved_run, iterations_to_success = max(run, 0), iterations
+                elif kind == _STATS:
+                    _add_call_stats(calls, text.partition(b":")[2])
+                elif kind == _RUN and len(arrows) > 10:
+                    runs += 1
+                    number = _RUN_NUMBER.match(text)
+                    run = int(number.group(1)) if number else runs - 1
+                    iteration = -1
+            if pending is not None:
+                close_pending(data, len(data))
+        finally:
+            if size:
+                data.close()
+    close_phase(math.nan)
+
+    timed = bool(stamps)
+    wall_time = max(stamps.values()) - min(stamps.values()) if timed else math.nan
+    row = (adapter, size, runs, iterations, solved_run >= 0, solved_run, iterations_to_success,
+           len(verifications), sum(verifications["passed"]), wall_time,
+           *(phase_seconds if timed else [math.nan] * len(PHASES)))
+    return row, phases, verifications, prompts, calls
+
+
+class Archive:
+    """
+    Columnar tables of a set of logs: logs (LOG_COLUMNS, one row per log),
+    phases (one row per phase segment), verifications (one row per verdict,
+    in log order), prompts (one row per prompt dump) and calls (per-phase
+    call totals of logs that have them). Rows of all but logs carry the row
+    number of their log in "log".
+    """
+
+    def __init__(self):
+        self.paths = []
+        self.logs = Table(LOG_COLUMNS)
+        self.phases = Table(PHASE_COLUMNS)
+        self.verifications = Table(VERIFICATION_COLUMNS)
+        self.prompts = Table(PROMPT_COLUMNS)
+        self.calls = Table(CALL_COLUMNS)
+
+    def add(self, path, scan):
+        row, phases, verifications, prompts, calls = scan
+        log = len(self.paths)
+        self.paths.append(path)
+        self.logs.append(*row)
+        self.phases.extend(phases, log=log)
+        self.verifications.extend(verifications, log=log)
+        self.prompts.extend(prompts, log=log)
+        self.calls.extend(calls, log=log)
+
+
+def find_logs(paths):
+    """Expands directories into the *.log files below them, sorted; files are kept as given."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".log"))
+        else:
+            found.append(path)
+    return found
+
+
+def analyze(paths, jobs=None):
+    """Parses the logs in paths (files or directories) with jobs worker processes (default: one per CPU) into an Archive."""
+    files = find_logs(paths)
+    archive = Archive()
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(files) < 2:
+        scans = map(parse_log, files)
+        for path, scan in zip(files, scans):
+            archive.add(path, scan)
+        return archive
+    with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as executor:
+        chunksize = max(1, len(files) // (jobs * 8))
+        for path, scan in zip(files, executor.map(parse_log, files, chunksize=chunksize)):
+            archive.add(path, scan)
+    return archive
+
+
+def _percentile(ordered, q):
+    """Linearly interpolated quantile q of a sorted sequence; NaN when it is empty."""
+    if not ordered:
+        return math.nan
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _spread(values):
+    ordered = sorted(value for value in values if not math.isnan(value))
+    if not ordered:
+        return {"count": 0, "total": 0.0, "mean": math.nan, "p50": math.nan, "p90": math.nan, "max": math.nan}
+    return {"count": len(ordered), "total": sum(ordered), "mean": sum(ordered) / len(ordered),
+            "p50": _percentile(ordered, 0.5), "p90": _percentile(ordered, 0.9), "max": ordered[-1]}
+
+
+def _rate(hits, total):
+    return hits / total if total else math.nan
+
+
+def _group_stats(archive, logs):
+    """Aggregates of the log rows in the set logs."""
+    table = archive.logs
+    rows = sorted(logs)
+    column = lambda name: [table[name][i] for i in rows]
+    solved = column("solved")
+    stats = {
+        "logs": len(rows),
+        "bytes": sum(column("bytes")),
+        "runs": sum(column("runs")),
+        "iterations": sum(column("iterations")),
+        "solved": sum(solved),
+        "solve_rate": _rate(sum(solved), len(rows)),
+        "iterations_to_success": _spread(n for n, ok in zip(column("iterations_to_success"), solved) if ok),
+        "timed_logs": sum(not math.isnan(seconds) for seconds in column("wall_time")),
+        "wall_time": _spread(column("wall_time")),
+    }
+
+    # Verdicts and how the next verdict of the same run depends on them
+    v = archive.verifications
+    picked = [i for i, log in enumerate(v["log"]) if log in logs]
+    passed = [v["passed"][i] for i in picked]
+    after = {True: [0, 0], False: [0, 0]}
+    for previous, current in zip(picked, picked[1:]):
+        if v["log"][previous] == v["log"][current] and v["run"][previous] == v["run"][current]:
+            counts = after[bool(v["passed"][previous])]
+            counts[0] += v["passed"][current]
+            counts[1] += 1
+    stats.update({
+        "verifications": len(picked),
+        "passes": sum(passed),
+        "pass_rate": _rate(sum(passed), len(picked)),
+        "pass_after_pass": _rate(*after[True]),
+        "pass_after_fail": _rate(*after[False]),
+        "verification_seconds": _spread(v["seconds"][i] for i in picked),
+    })
+
+    p = archive.phases
+    segments = [[] for _ in PHASES]
+    for log, phase, seconds in p.rows():
+        if log in logs:
+            segments[phase].append(seconds)
+    stats["phases"] = {PHASES[n]: dict(_spread(values), segments=len(values)) for n, values in enumerate(segments) if values}
+
+    sizes = [[] for _ in PROMPTS]
+    for log, kind, size in archive.prompts.rows():
+        if log in logs:
+            sizes[kind].append(size)
+    stats["prompts"] = {PROMPTS[n]: _spread(values) for n, values in enumerate(sizes) if values}
+    return stats
+
+
+def aggregate(archive):
+    """Returns {adapter: aggregates} for every adapter found in the archive, and "all" over every log."""
+    groups = {}
+    for log, adapter in enumerate(archive.logs["adapter"]):
+        groups.setdefault(ADAPTERS[adapter], set()).add(log)
+    result = {name: _group_stats(archive, groups[name]) for name in ADAPTERS if name in groups}
+    result["all"] = _group_stats(archive, set(range(len(archive.paths))))
+    return result
+
+
+def _number(value, digits=1):
+    return "-" if math.isnan(value) else f"{value:.{digits}f}"
+
+
+def _percent(value):
+    return "-" if math.isnan(value) else f"{100 * value:.1f}%"
+
+
+def _finite(value):
+    """Replaces NaN (no data) by None, for strict JSON."""
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def format_report(aggregates):
+    """Returns the lines of a text report of aggregate()'s result."""
+    lines = []
+    for name, stats in aggregates.items():
+        steps = stats["iterations_to_success"]
+        lines.append(f"{name}: {stats['logs']} logs ({stats['bytes'] / 1e6:.1f} MB), {stats['runs']} runs, "
+                     f"{stats['iterations']} iterations, solved {stats['solved']}/{stats['logs']} ({_percent(stats['solve_rate'])})")
+        lines.append(f"  iterations to success: mean {_number(steps['mean'])}, p50 {_number(steps['p50'])}, "
+                     f"p90 {_number(steps['p90'])}, max {_number(steps['max'], 0)}")
+        lines.append(f"  verifications: {stats['verifications']}, pass rate {_percent(stats['pass_rate'])}, "
+                     f"pass after pass {_percent(stats['pass_after_pass'])}, pass after fail {_percent(stats['pass_after_fail'])}")
+        if stats["timed_logs"]:
+            total = sum(row["total"] for row in stats["phases"].values()) or 1.0
+            lines.append(f"  {'phase':<13}{'segments':>9}{'time s':>10}{'time %':>8}{'mean s':>9}{'p50 s':>9}{'p90 s':>9}")
+            for phase, row in stats["phases"].items():
+                lines.append(f"  {phase:<13}{row['segments']:>9}{row['total']:>10.0f}{100 * row['total'] / total:>8.1f}"
+                             f"{_number(row['mean']):>9}{_number(row['p50']):>9}{_number(row['p90']):>9}")
+        if stats["prompts"]:
+            lines.append(f"  {'prompt':<13}{'count':>9}{'mean KB':>10}{'p90 KB':>8}{'max KB':>9}")
+            for kind, row in stats["prompts"].items():
+                lines.append(f"  {kind:<13}{row['count']:>9}{row['mean'] / 1e3:>10.1f}{row['p90'] / 1e3:>8.1f}{row['max'] / 1e3:>9.1f}")
+    return lines
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Aggregate phase durations, iterations, verdicts and prompt sizes of agent logs')
+    parser.add_argument('paths', nargs='+', help='Log files, or directories to search for *.log files')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes parsing logs (default: number of CPUs)')
+    parser.add_argument('--json', type=str, default=None, help='Also write the aggregates to this JSON file')
+    args = parser.parse_args()
+
+    started = time.time()
+    archive = analyze(args.paths, args.jobs)
+    if not archive.paths:
+        print("No logs found")
+        sys.exit(1)
+    aggregates = aggregate(archive)
+    print(f"Parsed {len(archive.paths)} logs ({sum(archive.logs['bytes']) / 1e6:.1f} MB) in {time.time() - started:.2f}s")
+    print("\n".join(format_report(aggregates)))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(_finite(aggregates), f, indent=2)
+        print(f"Aggregates written to {args.json}")
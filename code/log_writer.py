@@ -0,0 +1,194 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import atexit
+import signal
+import weakref
+import collections
+import threading
+
+# --- CONFIGURATION ---
+# Buffered text is written out at least this often (seconds)
+FLUSH_INTERVAL = float(os.getenv("IMO_LOG_FLUSH_INTERVAL", "0.5"))
+# The background thread is woken early once a buffer holds this much text
+BATCH_CHARS = 64 * 1024
+# A writer never buffers more than this; past it the caller writes the batch itself
+MAX_BUFFER_CHARS = int(float(os.getenv("IMO_LOG_BUFFER_MB", "4")) * 1024 * 1024)
+
+# Every open writer, drained by one background thread
+_writers = weakref.WeakSet()
+_writers_lock = threading.Lock()
+_wake = threading.Event()
+_flusher = None
+_stdout_writer = None
+_stdout_lock = threading.Lock()
+_signals_installed = False
+
+
+class LogWriter:
+    """
+    Buffered text sink for log_print. write() only appends to an in-memory
+    buffer; a background thread shared by all writers writes the buffer to
+    the stream in one batch every FLUSH_INTERVAL seconds, or sooner once
+    BATCH_CHARS have accumulated. Memory is bounded: when a buffer reaches
+    MAX_BUFFER_CHARS because the disk or pipe cannot keep up, the writing
+    thread drains it itself.
+
+    Buffers are flushed on close(), at interpreter exit and when the process
+    receives SIGTERM or SIGHUP (see install_signal_handlers()).
+    """
+
+    def __init__(self, stream, close_stream=True):
+        self.stream = stream
+        self.close_stream = close_stream
+        # deque.append is atomic, so write() needs no lock: threads and signal
+        # handlers can log at any time without waiting on each other
+        self._chunks = collections.deque()
+        # Approximate buffered size, reset on every flush
+        self._size = 0
+        self._io_lock = threading.RLock()
+        self._closed = False
+        self.writes = 0
+        self.batches = 0
+        self.overflows = 0
+        self.error = None
+        with _writers_lock:
+            _writers.add(self)
+        _start_flusher()
+
+    def write(self, text):
+        if self._closed:
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= MAX_BUFFER_CHARS:
+            self.overflows += 1
+            self.flush()
+        elif self._size >= BATCH_CHARS and not _wake.is_set():
+            _wake.set()
+
+    def flush(self):
+        """Writes out everything buffered so far."""
+        with self._io_lock:
+            self._size = 0
+            chunks = []
+            while True:
+                try:
+                    chunks.append(self._chunks.popleft())
+                except IndexError:
+                    break
+            if not chunks:
+                return
+            self.writes += len(chunks)
+            try:
+                self.stream.write("".join(chunks))
+                self.stream.flush()
+                self.batches += 1
+            except (OSError, ValueError) as e:
+                # A full disk or closed pipe must not take the agent down with it
+                self.error = e
+
+    def stats(self):
+        with self._io_lock:
+            return {"writes": self.writes, "batches": self.batches, "overflows": self.overflows}
+
+    def close(self):
+        with self._io_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.flush()
+        with _writers_lock:
+            _writers.discard(self)
+        if self.close_stream:
+            with self._io_lock:
+                self.stream.close()
+
+
+def _flush_loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush_all()
+
+
+def _start_flusher():
+    global _flusher
+    with _writers_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="log-writer", daemon=True)
+            _flusher.start()
+
+
+def flush_all():
+    """Writes out the buffers of all open writers."""
+    with _writers_lock:
+        writers = list(_writers)
+    for writer in writers:
+        writer.flush()
+
+
+def open_log(path, mode="w"):
+    """Opens path for writing (or appending, with mode "a") and returns a LogWriter on it."""
+    return LogWriter(open(path, mode, encoding="utf-8"))
+
+
+def stdout_writer():
+    """Returns the process-wide LogWriter on stdout."""
+    global _stdout_writer
+    with _stdout_lock:
+        if _stdout_writer is None:
+            _stdout_writer = LogWriter(sys.stdout, close_stream=False)
+            install_signal_handlers()
+    return _stdout_writer
+
+
+def install_signal_handlers(signums=(signal.SIGTERM, signal.SIGHUP)):
+    """
+    Flushes all writers when one of signums arrives, then lets the signal take
+    its previous course (by default, terminating the process). SIGINT needs no
+    handler: KeyboardInterrupt unwinds normally and the buffers are flushed
+    at exit. Only possible from the main thread; elsewhere this does nothing.
+    """
+    global _signals_installed
+    if _signals_installed or threading.current_thread() is not threading.main_thread():
+        return
+    _signals_installed = True
+    for signum in signums:
+        previous = signal.getsignal(signum)
+
+        def handler(signum, frame, previous=previous):
+            flush_all()
+            if callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                signal.signal(signum, signal.SIG_DFL)
+                os.kill(os.getpid(), signum)
+
+        signal.signal(signum, handler)
+
+
+atexit.register(flush_all)
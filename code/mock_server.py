@@ -0,0 +1,437 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Local mock LLM server for load-testing the agents without API spend.
+#
+# It speaks the four wire formats the adapters use:
+#   - Gemini generateContent       POST /v1beta/models/<model>:generateContent  (agent.py, agent_async.py)
+#   - OpenAI Responses             POST /v1/responses                           (agent_oai.py)
+#   - xAI chat completions         POST /v1/chat/completions                    (agent_xai.py)
+#   - sglang SSE chat completions  POST /v1/chat/completions with "stream": true (agent_gpt_oss.py)
+#
+# Point an adapter at it with GEMINI_API_URL, OPENAI_API_URL, XAI_API_URL or
+# GPT_OSS_API_URL, e.g.
+#
+#     python mock_server.py --port 8000 --latency lognormal:2,0.5 --verdicts fail,fail,pass
+#     GEMINI_API_URL=http://127.0.0.1:8000/v1beta/models/gemini-2.5-pro:generateContent \
+#         GOOGLE_API_KEY=x python run_parallel.py problem.txt -n 500
+#
+# GET /stats returns the request counters as JSON.
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONFIG = {
+    # Time to first token: "0.5", "uniform:0.2,2", "lognormal:MEDIAN,SIGMA" or "exp:MEAN" (seconds)
+    "latency": "0.5",
+    # Generation speed; adds output_tokens / tokens_per_sec to every response (0 for no delay)
+    "tokens_per_sec": 0.0,
+    # Size of every generated answer
+    "output_tokens": 200,
+    "reasoning_tokens": 0,
+    # Share of requests that fail with 429 (with Retry-After) or a 5xx
+    "rate_429": 0.0,
+    "rate_5xx": 0.0,
+    "retry_after": 1,
+    # Requests in flight beyond this many get an immediate 429, like a provider's concurrency quota (0: no quota)
+    "capacity": 0,
+    # Verification outcomes, consumed in order and repeated: pass, fail (Critical Error) or gap (Justification Gap)
+    "verdicts": None,
+    # Pass probability of a verification when no verdict script is given
+    "pass_rate": 0.5,
+    "seed": None,
+}
+
+SOLUTION = """### Summary ###
+
+**a. Verdict:** I have successfully solved the problem.
+
+**b. Method Sketch:** A mock argument.
+
+### Detailed Solution ###
+
+"""
+
+VERIFICATIONS = {
+    "pass": """### Summary ###
+
+**Final Verdict:** The solution is correct.
+
+**List of Findings:**
+*   None.
+
+### Detailed Verification Log ###
+
+""",
+    "fail": """### Summary ###
+
+**Final Verdict:** The solution is **invalid** because it contains a Critical Error.
+
+**List of Findings:**
+*   **Location:** "Step 2"
+    *   **Issue:** Critical Error - The inequality does not follow from the previous step.
+
+### Detailed Verification Log ###
+
+""",
+    "gap": """### Summary ###
+
+**Final Verdict:** The solution's approach is viable but contains a Justification Gap.
+
+**List of Findings:**
+*   **Location:** "Step 3"
+    *   **Issue:** Justification Gap - A limit and an integral are interchanged without proof.
+
+### Detailed Verification Log ###
+
+""",
+}
+
+
+def parse_latency(spec):
+    """Returns a function that samples a latency in seconds from a spec such as "lognormal:2,0.5"."""
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        value = float(kind)
+        return lambda rng: value
+    params = [float(x) for x in args.split(",")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "lognormal":
+        # Parameterized by the median and the sigma of the underlying normal
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / params[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _strings(value):
+    """Yields every string inside a JSON payload."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+class MockLLM:
+    """Decides what each request gets: the text, its token counts, its delay and injected errors."""
+
+    def __init__(self, **config):
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown mock server options: {sorted(unknown)}")
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.sample_latency = parse_latency(self.config["latency"])
+        self.verdicts = [v.strip() for v in self.config["verdicts"].split(",")] if self.config["verdicts"] else None
+        for verdict in self.verdicts or []:
+            if verdict not in VERIFICATIONS:
+                raise ValueError(f"Unknown verdict in script: {verdict}")
+        self._rng = random.Random(self.config["seed"])
+        self._lock = threading.Lock()
+        self._next_verdict = 0
+        self.stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "by_format": {}, "by_kind": {}, "by_status": {}}
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def count(self, wire_format, kind, status):
+        with self._lock:
+            self.stats["requests"] += 1
+            for key, value in (("by_format", wire_format), ("by_kind", kind), ("by_status", str(status))):
+                self.stats[key][value] = self.stats[key].get(value, 0) + 1
+
+    def enter(self):
+        """Counts a request in; returns False if it is over capacity and must get a 429."""
+        with self._lock:
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            return not self.config["capacity"] or self.stats["in_flight"] <= self.config["capacity"]
+
+    def leave(self):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+    def injected_error(self):
+        """Returns the status code of an injected error, or None."""
+        roll = self._random()
+        if roll < self.config["rate_429"]:
+            return 429
+        if roll < self.config["rate_429"] + self.config["rate_5xx"]:
+            with self._lock:
+                return self._rng.choice([500, 502, 503])
+        return None
+
+    def _verdict(self):
+        with self._lock:
+            if self.verdicts:
+                verdict = self.verdicts[self._next_verdict % len(self.verdicts)]
+                self._next_verdict += 1
+                return verdict
+            return "pass" if self._rng.random() < self.config["pass_rate"] else "fail"
+
+    def answer(self, payload):
+        """Returns (kind, text) for a request payload."""
+        prompt = "\n".join(_strings(payload))
+        if 'Response in "yes" or "no"' in prompt:
+            return "check", ("no" if "Critical Error -" in prompt else "yes")
+        if "Verification Task Reminder" in prompt:
+            verdict = self._verdict()
+            return "verify_" + verdict, self._pad(VERIFICATIONS[verdict])
+        return "generate", self._pad(SOLUTION)
+
+    def _pad(self, text):
+        # One word is one mock token
+        words = max(self.config["output_tokens"] - len(text.split()), 0)
+        return text + " ".join("step" for _ in range(words)) + "\n"
+
+    def usage(self, payload, text):
+        prompt_tokens = sum(len(s.split()) for s in _strings(payload))
+        return prompt_tokens, len(text.split()), self.config["reasoning_tokens"]
+
+    def delay(self):
+        """Time to first token."""
+        with self._lock:
+            return max(self.sample_latency(self._rng), 0.0)
+
+    def generation_time(self, output_tokens):
+        tps = self.config["tokens_per_sec"]
+        return output_tokens / tps if tps > 0 else 0.0
+
+
+def gemini_body(text, prompt_tokens, output_tokens, reasoning_tokens):
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "thoughtsTokenCount": reasoning_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens + reasoning_tokens,
+        },
+    }
+
+
+def responses_body(text, prompt_tokens, output_tokens, reasoning_tokens):
+    return {
+        "id": "resp_mock",
+        "object": "response",
+        "status": "completed",
+        "output": [{"type": "message", "role": "assistant",
+                    "content": [{"type": "output_text", "text": text}]}],
+        "usage": {
+            "input_tokens": prompt_tokens,
+            "output_tokens": output_tokens + reasoning_tokens,
+            "output_tokens_details": {"reasoning_tokens": reasoning_tokens},
+            "total_tokens": prompt_tokens + output_tokens + reasoning_tokens,
+        },
+    }
+
+
+def chat_usage(prompt_tokens, output_tokens, reasoning_tokens):
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": output_tokens + reasoning_tokens,
+        "completion_tokens_details": {"reasoning_tokens": reasoning_tokens},
+        "total_tokens": prompt_tokens + output_tokens + reasoning_tokens,
+    }
+
+
+def chat_body(text, prompt_tokens, output_tokens, reasoning_tokens):
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "mock",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": chat_usage(prompt_tokens, output_tokens, reasoning_tokens),
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.llm.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        llm = self.server.llm
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        if self.path.endswith(":generateContent"):
+            wire_format, build = "gemini", gemini_body
+        elif self.path.rstrip("/").endswith("/responses"):
+            wire_format, build = "openai", responses_body
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            wire_format, build = ("sglang_stream", None) if payload.get("stream") else ("chat", chat_body)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        within_capacity = llm.enter()
+        try:
+            if within_capacity:
+                time.sleep(llm.delay())
+                status = llm.injected_error()
+            else:
+                status = 429
+            if status is not None:
+                llm.count(wire_format, "error", status)
+                headers = {"Retry-After": str(llm.config["retry_after"])} if status in (429, 503) else {}
+                self._send_json(status, {"error": {"code": status, "message": "Injected error from mock server"}}, headers)
+                return
+
+            kind, text = llm.answer(payload)
+            prompt_tokens, output_tokens, reasoning_tokens = llm.usage(payload, text)
+            llm.count(wire_format, kind, 200)
+            if build is None:
+                self._stream(text, prompt_tokens, output_tokens, reasoning_tokens)
+            else:
+                time.sleep(llm.generation_time(output_tokens + reasoning_tokens))
+                self._send_json(200, build(text, prompt_tokens, output_tokens, reasoning_tokens))
+        finally:
+            llm.leave()
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream(self, text, prompt_tokens, output_tokens, reasoning_tokens):
+        """Sends an sglang-style SSE stream, paced at tokens_per_sec."""
+        llm = self.server.llm
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(llm.generation_time(reasoning_tokens))
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": "mock"}
+        words = text.split(" ")
+        step = 16
+        for start in range(0, len(words), step):
+            piece = " ".join(words[start:start + step]) + (" " if start + step < len(words) else "")
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(llm.generation_time(len(piece.split())))
+        chunk = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        chunk = dict(base, choices=[], usage=chat_usage(prompt_tokens, output_tokens, reasoning_tokens))
+        self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        # Send the end of the stream in one write, so clients that stop reading at [DONE] can still reuse the connection
+        self.wfile.write(b"e\r\ndata: [DONE]\n\n\r\n0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of connections from hundreds of agents
+    request_queue_size = 1024
+
+    def __init__(self, address, llm):
+        self.llm = llm
+        super().__init__(address, MockHandler)
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-stream (e.g. on repetition detection) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(host="127.0.0.1", port=0, **config):
+    """Starts a mock server on a background thread and returns it; server.server_port is the bound port."""
+    server = MockServer((host, port), MockLLM(**config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mock LLM server for load-testing the IMO agents')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', '-p', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--latency', type=str, default=DEFAULT_CONFIG["latency"],
+                       help='Time to first token: SECONDS, uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA or exp:MEAN (default: 0.5)')
+    parser.add_argument('--tokens-per-sec', type=float, default=0.0,
+                       help='Generation speed in tokens per second (default: 0, no generation delay)')
+    parser.add_argument('--output-tokens', type=int, default=DEFAULT_CONFIG["output_tokens"],
+                       help='Length of every answer in tokens (default: 200)')
+    parser.add_argument('--reasoning-tokens', type=int, default=0,
+                       help='Reasoning tokens reported (and generated) for every answer (default: 0)')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Share of requests answered with 429 (default: 0)')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='Share of requests answered with 500/502/503 (default: 0)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429/503 (default: 1)')
+    parser.add_argument('--capacity', type=int, default=0,
+                       help='Answer requests beyond this many in flight with an immediate 429 (default: 0, no limit)')
+    parser.add_argument('--verdicts', type=str,
+                       help='Verification outcomes in order, repeated: comma-separated pass, fail or gap')
+    parser.add_argument('--pass-rate', type=float, default=0.5,
+                       help='Pass probability of a verification without --verdicts (default: 0.5)')
+    parser.add_argument('--seed', type=int, help='Random seed (optional)')
+    args = parser.parse_args()
+
+    server = MockServer((args.host, args.port), MockLLM(
+        latency=args.latency, tokens_per_sec=args.tokens_per_sec, output_tokens=args.output_tokens,
+        reasoning_tokens=args.reasoning_tokens, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after, capacity=args.capacity, verdicts=args.verdicts, pass_rate=args.pass_rate, seed=args.seed))
+    print(f"Mock LLM server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.llm.snapshot()))
+        server.server_close()
@@ -0,0 +1,308 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import sys
+import json
+import math
+import time
+import random
+import itertools
+import log_analyzer
+from log_analyzer import ADAPTERS, PHASES, VERDICT_SOURCES
+
+# --- CONFIGURATION ---
+# The stopping policy of agent(): accept a solution after 5 passing verdicts
+# in a row, give a run up after 10 failed verdicts in a row or 30
+# iterations, and start up to max_runs (default 10) fresh runs.
+BASELINE = {"confirmations": 5, "max_errors": 10, "max_iterations": 30, "max_runs": 10}
+DEFAULT_TRIALS = 2000
+
+
+def policy_label(policy):
+    return "c{confirmations} e{max_errors} i{max_iterations} r{max_runs}".format(**policy)
+
+
+def policy_grid(confirmations, max_errors, max_iterations, max_runs):
+    """Returns every combination of the given values as policy dicts."""
+    return [{"confirmations": c, "max_errors": e, "max_iterations": i, "max_runs": r}
+            for c, e, i, r in itertools.product(confirmations, max_errors, max_iterations, max_runs)]
+
+
+class Profile:
+    """
+    What the simulator replays, taken from the logs in logs of an Archive.
+
+    Verdicts of one solution are passes until the first fail, after which
+    agent() corrects it into a new solution. Each solution is kept as
+    (passes, failed), where failed is False when the log ends its verdicts
+    without a fail (accepted, or the run was over). Initial solutions and
+    corrected ones are kept apart, as they pass at different rates. A
+    policy that asks a solution for more verdicts than were logged gets
+    further passes with the logged chance that a pass follows a pass.
+
+    Step durations are drawn from the logged ones: "init" (initial
+    generation plus self improvement), "verdict" (verification plus the
+    yes/no check) and "correction". Tokens and cost per call come from the
+    agents' Phase stats lines and are NaN when no log has them.
+    """
+
+    def __init__(self, archive, logs):
+        self.logs = len(logs)
+        table = archive.logs
+        self.recorded_solve_rate = sum(table["solved"][i] for i in logs) / len(logs) if logs else math.nan
+        self.recorded_wall_time = _mean([table["wall_time"][i] for i in logs])
+
+        runs = {}
+        checks = verdicts = 0
+        for log, run, _, passed, source, seconds in archive.verifications.rows():
+            if log in logs:
+                runs.setdefault((log, run), []).append(passed)
+                if VERDICT_SOURCES[source] != "confirmation":
+                    verdicts += 1
+                    checks += VERDICT_SOURCES[source] in ("unknown", "llm")
+        self.init_candidates, self.corrected_candidates = [], []
+        for sequence in runs.values():
+            pool, passes = self.init_candidates, 0
+            for passed in sequence:
+                if passed:
+                    passes += 1
+                else:
+                    pool.append((passes, True))
+                    pool, passes = self.corrected_candidates, 0
+            if passes:
+                pool.append((passes, False))
+        candidates = self.init_candidates + self.corrected_candidates
+        repeats = sum(passes - 1 for passes, _ in candidates if passes)
+        breaks = sum(1 for passes, failed in candidates if passes and failed)
+        self.pass_after_pass = repeats / (repeats + breaks) if repeats + breaks else 0.0
+        self.check_share = checks / verdicts if verdicts else 0.0
+
+        self.seconds = {step: [] for step in ("init", "self_improve", "verdict", "correction")}
+        for log, phase, seconds in archive.phases.rows():
+            if log in logs and PHASES[phase] in self.seconds and not math.isnan(seconds):
+                self.seconds[PHASES[phase]].append(seconds)
+        self.seconds["verdict"] = [seconds for log, source, seconds in zip(
+            archive.verifications["log"], archive.verifications["source"], archive.verifications["seconds"])
+            if log in logs and VERDICT_SOURCES[source] != "confirmation" and not math.isnan(seconds)]
+
+        totals = {phase: [0, 0, 0.0] for phase in PHASES}
+        for log, phase, calls, prompt_tokens, output_tokens, cost in archive.calls.rows():
+            if log in logs:
+                row = totals[PHASES[phase]]
+                row[0] += calls
+                row[1] += prompt_tokens + output_tokens
+                row[2] += cost
+        # A phase no logged agent called (e.g. the yes/no check when every verdict was parsed) costs the mean call
+        calls = sum(row[0] for row in totals.values())
+        mean_tokens = sum(row[1] for row in totals.values()) / calls if calls else math.nan
+        mean_cost = sum(row[2] for row in totals.values()) / calls if calls else math.nan
+        self.tokens = {phase: row[1] / row[0] if row[0] else mean_tokens for phase, row in totals.items()}
+        self.cost = {phase: row[2] / row[0] if row[0] else mean_cost for phase, row in totals.items()}
+
+
+def _mean(values):
+    values = [value for value in values if not math.isnan(value)]
+    return sum(values) / len(values) if values else math.nan
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return math.nan
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Trial:
+    """One simulated agent: the calls, seconds, tokens and cost it spends."""
+
+    def __init__(self, profile, rng):
+        self.profile, self.rng = profile, rng
+        self.calls = self.seconds = self.tokens = self.cost = 0.0
+
+    def call(self, phase, seconds=None):
+        self.calls += 1
+        self.tokens += self.profile.tokens[phase]
+        self.cost += self.profile.cost[phase]
+        if seconds is not None:
+            samples = self.profile.seconds[seconds]
+            self.seconds += self.rng.choice(samples) if samples else math.nan
+
+    def verdict(self, candidate, index):
+        """Verdict number index on candidate, with its verification and (sometimes) yes/no check calls."""
+        self.call("verify", "verdict")
+        if self.rng.random() < self.profile.check_share:
+            self.call("check")
+        passes, failed = candidate
+        if index < passes:
+            return True
+        if index == passes and failed:
+            return False
+        return self.rng.random() < self.profile.pass_after_pass
+
+    def run(self, policy):
+        """Follows agent() under policy; returns the run it solved the problem in, or None."""
+        for run in range(policy["max_runs"]):
+            self.call("init", "init")
+            self.call("self_improve", "self_improve")
+            candidate, index = self.rng.choice(self.profile.init_candidates), 0
+            passed = self.verdict(candidate, index)
+            correct, errors = 1, 0
+            for _ in range(policy["max_iterations"]):
+                if not passed:
+                    correct, errors = 0, errors + 1
+                    self.call("correction", "correction")
+                    candidate, index = self.rng.choice(self.profile.corrected_candidates or self.profile.init_candidates), -1
+                index += 1
+                passed = self.verdict(candidate, index)
+                if passed:
+                    correct, errors = correct + 1, 0
+                if correct >= policy["confirmations"]:
+                    return run
+                if errors >= policy["max_errors"]:
+                    break
+        return None
+
+
+def simulate(profile, policy, trials=DEFAULT_TRIALS, seed=0):
+    """
+    Replays trials agents under policy. Every policy run with the same seed
+    draws the same random numbers, so differences between policies are not
+    just noise. Returns the solve rate and the mean calls, seconds, tokens
+    and cost per agent, with percentiles of the seconds.
+    """
+    rng = random.Random(seed)
+    solved, runs, calls, seconds, tokens, cost = 0, 0, 0.0, [], 0.0, 0.0
+    for _ in range(trials):
+        trial = _Trial(profile, rng)
+        solved_run = trial.run(policy)
+        solved += solved_run is not None
+        runs += policy["max_runs"] if solved_run is None else solved_run + 1
+        calls += trial.calls
+        seconds.append(trial.seconds)
+        tokens += trial.tokens
+        cost += trial.cost
+    seconds = sorted(seconds) if not any(math.isnan(s) for s in seconds) else []
+    return {
+        "policy": dict(policy),
+        "solve_rate": solved / trials,
+        "runs": runs / trials,
+        "calls": calls / trials,
+        "seconds": sum(seconds) / trials if seconds else math.nan,
+        "seconds_p50": _percentile(seconds, 0.5),
+        "seconds_p90": _percentile(seconds, 0.9),
+        "tokens": tokens / trials,
+        "cost": cost / trials,
+        "cost_per_solve": cost / solved if solved else math.nan,
+    }
+
+
+def simulate_archive(archive, policies, trials=DEFAULT_TRIALS, seed=0, adapters=None):
+    """Simulates each policy on the profile of each adapter's logs (or only those in adapters): {adapter: (profile, [results])}."""
+    groups = {}
+    for log, adapter in enumerate(archive.logs["adapter"]):
+        groups.setdefault(ADAPTERS[adapter], set()).add(log)
+    results = {}
+    for name in ADAPTERS:
+        if name not in groups or (adapters and name not in adapters):
+            continue
+        profile = Profile(archive, groups[name])
+        if not profile.init_candidates:
+            continue
+        results[name] = (profile, [simulate(profile, policy, trials, seed) for policy in policies])
+    return results
+
+
+def _number(value, digits=0):
+    return "-" if math.isnan(value) else f"{value:.{digits}f}"
+
+
+def format_report(results):
+    """Returns the lines of a text report of simulate_archive()'s result; the hand-tuned policy is marked with *."""
+    lines = []
+    for name, (profile, rows) in results.items():
+        lines.append(f"{name}: {profile.logs} logs, {len(profile.init_candidates)} initial and "
+                     f"{len(profile.corrected_candidates)} corrected solutions, pass after pass "
+                     f"{100 * profile.pass_after_pass:.1f}%, yes/no checks {100 * profile.check_share:.1f}%")
+        lines.append(f"  logged: solve rate {100 * profile.recorded_solve_rate:.1f}%, "
+                     f"mean time {_number(profile.recorded_wall_time)} s")
+        lines.append(f"  {'policy':<20}{'solve %':>8}{'runs':>6}{'calls':>8}{'time s':>9}{'p90 s':>9}"
+                     f"{'tokens':>10}{'cost $':>9}{'$/solve':>9}")
+        for row in rows:
+            label = policy_label(row["policy"]) + ("*" if row["policy"] == BASELINE else "")
+            lines.append(f"  {label:<20}{100 * row['solve_rate']:>8.1f}{row['runs']:>6.2f}{row['calls']:>8.1f}"
+                         f"{_number(row['seconds']):>9}{_number(row['seconds_p90']):>9}{_number(row['tokens']):>10}"
+                         f"{_number(row['cost'], 3):>9}{_number(row['cost_per_solve'], 3):>9}")
+    return lines
+
+
+def _finite(value):
+    """Replaces NaN (no data) by None, for strict JSON."""
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _values(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay logged verdicts, latencies and costs under other stopping policies')
+    parser.add_argument('paths', nargs='+', help='Log files, or directories to search for *.log files')
+    parser.add_argument('--confirmations', type=_values, default=[BASELINE["confirmations"]],
+                        help='Passing verdicts in a row that accept a solution, comma-separated values (default: 5)')
+    parser.add_argument('--max-errors', type=_values, default=[BASELINE["max_errors"]],
+                        help='Failed verdicts in a row that end a run, comma-separated values (default: 10)')
+    parser.add_argument('--max-iterations', type=_values, default=[BASELINE["max_iterations"]],
+                        help='Iterations per run, comma-separated values (default: 30)')
+    parser.add_argument('--max-runs', type=_values, default=[BASELINE["max_runs"]],
+                        help='Runs per agent, comma-separated values (default: 10)')
+    parser.add_argument('--trials', type=int, default=DEFAULT_TRIALS,
+                        help=f'Simulated agents per policy and adapter (default: {DEFAULT_TRIALS})')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--adapter', choices=ADAPTERS, action='append',
+                        help='Only simulate logs of this adapter (repeatable; default: every adapter found)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes parsing logs (default: number of CPUs)')
+    parser.add_argument('--json', type=str, default=None, help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    started = time.time()
+    archive = log_analyzer.analyze(args.paths, args.jobs)
+    policies = policy_grid(args.confirmations, args.max_errors, args.max_iterations, args.max_runs)
+    results = simulate_archive(archive, policies, args.trials, args.seed, args.adapter)
+    if not results:
+        print("No verdicts found in the logs")
+        sys.exit(1)
+    print(f"Simulated {len(policies)} policies x {args.trials} agents on {len(archive.paths)} logs "
+          f"in {time.time() - started:.2f}s")
+    print("\n".join(format_report(results)))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({name: [_finite(row) for row in rows] for name, (_, rows) in results.items()}, f, indent=2)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,240 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from usage import extract_usage
+
+# --- CONFIGURATION ---
+# Bump when the meaning of cached entries changes so old entries stop matching
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+_cache = None
+_bypass = contextvars.ContextVar("cache_bypass", default=False)
+_scope = contextvars.ContextVar("cache_scope", default=None)
+
+
+class _SlotScope:
+    """Counts how often each payload has been requested within one namespace."""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def next_slot(self, kind, digest):
+        with self._lock:
+            slot = self._slots.get((kind, digest), 0)
+            self._slots[(kind, digest)] = slot + 1
+            return slot
+
+
+_default_scope = _SlotScope("")
+
+
+class ResponseCache:
+    """
+    SQLite-backed, content-addressed store of API responses with size-based
+    LRU eviction and an optional TTL. Several agent processes may share one
+    file. Responses are stored as zlib-compressed JSON.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+        # Estimated file size: counted once, then grown by each put. Only when
+        # it crosses max_bytes is the real size (which includes the entries of
+        # other processes) counted again, so a put does not scan the table.
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached response for key, or None (counted as a miss)."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT created, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[0] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            body = zlib.decompress(row[1])
+            response_data = json.loads(body)
+            self.hits += 1
+            self.bytes_saved += len(body)
+            self.tokens_saved += extract_usage(response_data)["total_tokens"]
+            return response_data
+
+    def put(self, key, provider, response_data):
+        """Stores a response and evicts the least recently used entries above max_bytes."""
+        body = zlib.compress(json.dumps(response_data).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, created, accessed, size, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, now, now, len(body), body))
+            self.stores += 1
+            self._size += len(body)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            for key, size in oldest:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+            if not oldest:
+                break
+        self._size = total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+                "tokens_saved": self.tokens_saved,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def configure_cache(path, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+    """Enables the response cache for this process, stored in the SQLite file at path."""
+    global _cache
+    close_cache()
+    _cache = ResponseCache(path, max_bytes=max_bytes, ttl=ttl)
+    return _cache
+
+
+def close_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+
+def cache_stats():
+    """Returns hit/miss/bytes-saved counters, or None when the cache is disabled."""
+    return _cache.stats() if _cache is not None else None
+
+
+def use_cache_namespace(namespace):
+    """
+    Gives the calls of the current context (thread, asyncio task and the calls
+    they fan out) their own sample slots, for both the cache and cassettes. Agents that run the same problem side
+    by side use different namespaces so they do not all replay the same samples.
+    """
+    _scope.set(_SlotScope(namespace))
+
+
+@contextmanager
+def bypass_cache():
+    """Calls made inside the block are always sampled fresh and not stored."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def request_digest(provider, url, payload):
+    """Hashes the normalized payload (prompts and, for most providers, the model) and the endpoint URL."""
+    normalized = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{provider}\n{url}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def next_sample_slot(kind, digest):
+    """
+    Returns (namespace, slot) for the next request with this digest: the n-th
+    identical request of a namespace gets slot n, so repeated samples of the
+    same prompt stay distinct while a re-run sees them in the same order.
+    `kind` keeps separate counters for the cache and the cassette.
+    """
+    scope = _scope.get() or _default_scope
+    return scope.namespace, scope.next_slot(kind, digest)
+
+
+def cache_key(provider, url, payload):
+    """
+    Returns the cache key of the next call with this payload, or None when the
+    cache is disabled or bypassed. The key hashes the request digest, the
+    namespace and the sample slot (see next_sample_slot()).
+    """
+    if _cache is None or _bypass.get():
+        return None
+    digest = request_digest(provider, url, payload)
+    namespace, slot = next_sample_slot("cache", digest)
+    return hashlib.sha256(f"{CACHE_VERSION}\n{namespace}\n{slot}\n{digest}".encode("utf-8")).hexdigest()
+
+
+def cache_get(key):
+    if key is None or _cache is None:
+        return None
+    return _cache.get(key)
+
+
+def cache_put(key, provider, response_data):
+    if key is not None and _cache is not None:
+        _cache.put(key, provider, response_data)
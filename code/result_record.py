@@ -0,0 +1,167 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import json
+import time
+import contextvars
+import checkpoint
+import call_metrics
+import live_metrics
+from usage import UsageMeter
+
+# Record of the agent running in the current context (thread or asyncio task)
+_current = contextvars.ContextVar("result_record", default=None)
+
+
+class ResultRecord:
+    """
+    Structured result of one agent, collected while it runs:
+
+        record = ResultRecord(agent_id=3)
+        with record:
+            for i in range(max_runs):
+                sol = agent(...)
+                record.finish_run(i, sol)
+        record.write("agent_03.result.json")
+
+    Counts the API calls and tokens of everything inside the block, the wall
+    time, the runs and correction-loop iterations used, and keeps the last
+    verification reported with note_verification(). The metrics record of
+    every API call (see call_metrics.py) is kept too, with a per-phase
+    rollup. The parent of an agent reads the written file instead of
+    scraping the agent's log.
+    """
+
+    def __init__(self, agent_id=None):
+        self.agent_id = agent_id
+        self.meter = UsageMeter()
+        self.calls = call_metrics.CallLog()
+        self.started = None
+        self.wall_time = 0.0
+        self.solved = False
+        self.solution = None
+        self.solved_in_run = None
+        self.runs = 0
+        self.iterations = 0
+        self.errors = []
+        self.last_verification = None
+        self._tokens = []
+
+    def __enter__(self):
+        self.started = time.time()
+        self._tokens.append(_current.set(self))
+        self.meter.__enter__()
+        self.calls.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.calls.__exit__(exc_type, exc, tb)
+        self.meter.__exit__(exc_type, exc, tb)
+        _current.reset(self._tokens.pop())
+        self.wall_time = time.time() - self.started
+        return False
+
+    def finish_run(self, run, solution, error=None):
+        """Notes the end of run number `run`, with its solution (None if it found none) or error."""
+        self.runs = run + 1
+        # The agent loop reports its iteration through the checkpoint state
+        self.iterations += checkpoint.get_state().get("iteration", 0) + 1
+        if error is not None:
+            self.errors.append(f"run {run}: {error}")
+        if solution is not None and not self.solved:
+            self.solved = True
+            self.solution = solution
+            self.solved_in_run = run
+
+    def as_dict(self):
+        wall_time = self.wall_time
+        if self._tokens:
+            # Still running
+            wall_time = time.time() - self.started
+        record = {
+            "agent_id": self.agent_id,
+            "solved": self.solved,
+            "solution": self.solution,
+            "solved_in_run": self.solved_in_run,
+            "runs": self.runs,
+            "iterations": self.iterations,
+            "wall_time": round(wall_time, 3),
+            "last_verification": self.last_verification,
+            "errors": self.errors[-5:],
+        }
+        record.update(self.meter.as_dict())
+        record["phases"] = self.calls.phases()
+        record["call_metrics"] = list(self.calls.records)
+        return record
+
+    def write(self, path):
+        """Writes the record to path atomically, so a reader never sees half of it."""
+        write_result(path, self.as_dict())
+
+
+def note_verification(verdict, source, bug_report):
+    """Keeps the latest verification of the current agent: "pass"/"fail", how it was decided and the bug report."""
+    live_metrics.verification(verdict)
+    record = _current.get()
+    if record is not None:
+        record.last_verification = {"verdict": verdict, "source": source, "bug_report": bug_report}
+
+
+def write_result(path, record):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_result(path):
+    """Returns the record written to path, or None if the agent did not get to write one."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def summarize(records):
+    """
+    Aggregates result records: solved count, calls, tokens, cost and wall
+    time over all agents, and their per-phase call metrics.
+    """
+    records = [record for record in records if record is not None]
+    summary = {
+        "agents": len(records),
+        "solved": sum(1 for record in records if record["solved"]),
+        "runs": sum(record["runs"] for record in records),
+        "iterations": sum(record["iterations"] for record in records),
+    }
+    for key in ("calls", "prompt_tokens", "output_tokens", "reasoning_tokens", "total_tokens"):
+        summary[key] = sum(record.get(key, 0) for record in records)
+    summary["cost"] = round(sum(record.get("cost", 0.0) for record in records), 6)
+    wall_times = [record["wall_time"] for record in records]
+    summary["mean_wall_time"] = round(sum(wall_times) / len(wall_times), 3) if wall_times else 0.0
+    summary["max_wall_time"] = max(wall_times, default=0.0)
+    summary["phases"] = call_metrics.merge(record.get("phases") for record in records)
+    return summary
@@ -0,0 +1,229 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import time
+import random
+import asyncio
+import threading
+import email.utils
+import requests
+from api_client import deadline_remaining
+import concurrency
+import fanout
+import call_metrics
+import live_metrics
+
+# --- CONFIGURATION ---
+# Defaults for every provider. They can be overridden with configure_retry()
+# or through environment variables, e.g.
+#   IMO_RETRY_RATE_LIMIT=20           (retries of 429 responses, all providers)
+#   IMO_RETRY_SERVER_ERROR_XAI=0      (no retries of 5xx responses from xAI)
+#   IMO_RETRY_MAX_DELAY=120
+DEFAULT_RETRY_CONFIG = {
+    # Retry budget per call for each error class
+    "rate_limit": 8,      # 429
+    "server_error": 5,    # 5xx, 408
+    "connection": 5,      # connection resets, timeouts, broken streams
+    # Exponential backoff: base_delay * 2**n seconds, capped at max_delay, with full jitter
+    "base_delay": 2.0,
+    "max_delay": 60.0,
+    # Longest Retry-After that is honored; longer values are capped to it
+    "max_retry_after": 300.0,
+}
+ERROR_CLASSES = ("rate_limit", "server_error", "connection")
+
+_retry_config = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _env_value(name, provider):
+    value = os.getenv(f"{name}_{provider.upper()}")
+    if value is None:
+        value = os.getenv(name)
+    return value
+
+
+def get_retry_config(provider):
+    """Returns the effective retry configuration for a provider."""
+    config = dict(DEFAULT_RETRY_CONFIG)
+    for key in DEFAULT_RETRY_CONFIG:
+        value = _env_value(f"IMO_RETRY_{key.upper()}", provider)
+        if value:
+            config[key] = type(DEFAULT_RETRY_CONFIG[key])(value)
+    config.update(_retry_config.get(provider, {}))
+    return config
+
+
+def configure_retry(provider, **options):
+    """Overrides the retry configuration of a provider."""
+    unknown = set(options) - set(DEFAULT_RETRY_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown retry option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        _retry_config.setdefault(provider, {}).update(options)
+
+
+def classify(error):
+    """Returns the error class of a failed request, or None if it must not be retried."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = getattr(error.response, "status_code", None)
+        if status == 429:
+            return "rate_limit"
+        if status is not None and (status >= 500 or status == 408):
+            return "server_error"
+        return None
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return "connection"
+    return None
+
+
+def retry_after(error, config):
+    """Returns the server's Retry-After delay in seconds, or None."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), config["max_retry_after"])
+
+
+def backoff_delay(retry_number, config):
+    """Full-jitter exponential backoff for the n-th retry (starting at 0)."""
+    return random.uniform(0, min(config["max_delay"], config["base_delay"] * 2 ** retry_number))
+
+
+def _count(provider, counter, error_class, wait=0.0):
+    with _lock:
+        stats = _stats.setdefault(provider, {"retries": {}, "gave_up": {}, "retry_wait": 0.0})
+        stats[counter][error_class] = stats[counter].get(error_class, 0) + 1
+        stats["retry_wait"] += wait
+
+
+def retry_stats():
+    """Returns {provider: {"retries": {class: n}, "gave_up": {class: n}, "retry_wait": seconds}}."""
+    with _lock:
+        return {provider: {"retries": dict(stats["retries"]), "gave_up": dict(stats["gave_up"]),
+                           "retry_wait": round(stats["retry_wait"], 3)}
+                for provider, stats in _stats.items()}
+
+
+def _next_delay(provider, error, retries, config, log):
+    """Returns the delay before the next attempt, or raises the error when it must not be retried."""
+    error_class = classify(error)
+    if error_class is None:
+        raise error
+    if retries[error_class] >= config[error_class]:
+        _count(provider, "gave_up", error_class)
+        raise error
+    delay = retry_after(error, config)
+    if delay is None:
+        delay = backoff_delay(retries[error_class], config)
+    remaining = deadline_remaining()
+    if remaining is not None and delay >= remaining:
+        # The agent would be past its deadline before the retry is sent
+        _count(provider, "gave_up", error_class)
+        raise error
+    retries[error_class] += 1
+    _count(provider, "retries", error_class, delay)
+    call_metrics.note_retry(delay)
+    if log is not None:
+        log(f">>>>>>> {error_class} error ({error}), retry {retries[error_class]}/{config[error_class]} in {delay:.1f}s")
+    return delay
+
+
+def call_with_retry(provider, attempt, log=None):
+    """
+    Calls attempt() until it succeeds, retrying 429s, 5xx responses and
+    connection errors with exponential backoff and jitter, or after the
+    server's Retry-After. Each error class has its own retry budget per call;
+    other errors, and an error whose budget is used up, are raised.
+    With adaptive concurrency (see concurrency.py) every attempt first waits
+    for a request slot of the provider and reports its outcome.
+    """
+    config = get_retry_config(provider)
+    retries = dict.fromkeys(ERROR_CLASSES, 0)
+    controller = concurrency.get_controller(provider)
+    while True:
+        # An abandoned fan-out branch neither sends nor retries
+        fanout.check_cancelled()
+        started = controller.acquire() if controller else None
+        call_metrics.note_attempt()
+        live_metrics.attempt_started(provider)
+        try:
+            result = attempt()
+        except requests.exceptions.RequestException as e:
+            live_metrics.attempt_finished(provider, classify(e) or "error")
+            if controller:
+                controller.release(started, classify(e) or "error")
+            time.sleep(_next_delay(provider, e, retries, config, log))
+            continue
+        except BaseException:
+            live_metrics.attempt_finished(provider, "error")
+            if controller:
+                controller.release(started, "error")
+            raise
+        live_metrics.attempt_finished(provider, None)
+        if controller:
+            controller.release(started, None)
+        return result
+
+
+async def call_with_retry_async(provider, attempt, log=None):
+    """Asyncio counterpart of call_with_retry(); attempt is a coroutine function."""
+    config = get_retry_config(provider)
+    retries = dict.fromkeys(ERROR_CLASSES, 0)
+    controller = concurrency.get_controller(provider)
+    while True:
+        started = await controller.acquire_async() if controller else None
+        call_metrics.note_attempt()
+        live_metrics.attempt_started(provider)
+        try:
+            result = await attempt()
+        except requests.exceptions.RequestException as e:
+            live_metrics.attempt_finished(provider, classify(e) or "error")
+            if controller:
+                controller.release(started, classify(e) or "error")
+            await asyncio.sleep(_next_delay(provider, e, retries, config, log))
+            continue
+        except BaseException as e:
+            # A cancelled branch says nothing about the provider's health
+            outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            live_metrics.attempt_finished(provider, outcome)
+            if controller:
+                controller.release(started, outcome)
+            raise
+        live_metrics.attempt_finished(provider, None)
+        if controller:
+            controller.release(started, None)
+        return result
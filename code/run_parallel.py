@@ -29,16 +29,87 @@ import os
 import sys
 import argparse
 import time
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from collections import deque
 import signal
 import threading
 import json
-import re
+import importlib.util
+import result_record
+import sweep_manifest
+import budget
+import call_metrics
+import live_metrics
+import tracing
 
 # Globals used within worker processes to forward termination to child agent
 current_child_process = None
 _signal_handlers_installed = False
 
+# How often a worker checks whether its agent was cancelled, in seconds
+CANCEL_POLL_INTERVAL = 1.0
+# How long a cancelled agent gets to write its log and result record after SIGTERM, before SIGKILL
+CANCEL_GRACE_PERIOD = 5.0
+
+
+class OutputCapture:
+    """
+    Copies one output pipe of a child agent to a file on a background thread,
+    so the worker never holds the agent's output in memory.
+
+    At most max_bytes are kept on disk. Output beyond that is still drained
+    (the agent never blocks on a full pipe) but only its beginning and its
+    end are kept, separated by a marker with the number of dropped bytes.
+    """
+
+    TAIL_BYTES = 64 * 1024
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, pipe, path, max_bytes):
+        self.pipe = pipe
+        self.path = path
+        self.max_bytes = max_bytes
+        self.tail_bytes = min(self.TAIL_BYTES, max_bytes // 2)
+        self.head_bytes = max_bytes - self.tail_bytes
+        self.total = 0
+        # Output after the head, trimmed to tail_bytes, and the last bytes of all output
+        self._rest = b""
+        self._rest_size = 0
+        self._last = b""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        with open(self.path, "wb") as f:
+            while True:
+                chunk = self.pipe.read1(self.READ_SIZE)
+                if not chunk:
+                    break
+                self._last = (self._last + chunk)[-8192:]
+                room = max(self.head_bytes - self.total, 0)
+                if room:
+                    f.write(chunk[:room])
+                if len(chunk) > room:
+                    self._rest = (self._rest + chunk[room:])[-self.tail_bytes:] if self.tail_bytes else b""
+                    self._rest_size += len(chunk) - room
+                self.total += len(chunk)
+            if self._rest_size > len(self._rest):
+                f.write(f"\n... [{self._rest_size - len(self._rest)} bytes dropped, output capped at {self.max_bytes} bytes] ...\n".encode())
+            f.write(self._rest)
+        self.pipe.close()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def last_lines(self, count=20):
+        """Returns the last lines of the output, e.g. a traceback."""
+        lines = self._last.decode("utf-8", errors="replace").splitlines()
+        return "\n".join(lines[-count:])
+
+    def summary(self):
+        return {"path": self.path, "bytes": self.total, "dropped": self._rest_size - len(self._rest)}
+
+
 def _install_worker_signal_handlers():
     """Install SIGTERM/SIGINT handlers in worker to terminate spawned agent."""
     global _signal_handlers_installed
@@ -66,7 +137,10 @@ def _install_worker_signal_handlers():
     _signal_handlers_installed = True
 
 def run_agent(agent_id, problem_file, log_dir, timeout=None, other_prompts=[], agent_file='agent.py',
-               benchmark=None, level=None, benchmark_index=None):
+               benchmark=None, level=None, benchmark_index=None, parallel_confirm=False,
+               correction_branches=1, cache=None, cache_max_mb=1024, cache_ttl=None,
+               record=None, replay=None, replay_speed=1.0, checkpoint_dir=None, events_dir=None,
+               max_output_mb=50, cancel_file=None, budget_limits=None, trace_dir=None):
     """
     Run a single agent instance with the specified parameters.
 
@@ -80,11 +154,35 @@ def run_agent(agent_id, problem_file, log_dir, timeout=None, other_prompts=[], a
         benchmark: Benchmark to use (gradingbench or proofbench, optional)
         level: Level to filter by (Basic, Advanced, optional)
         benchmark_index: Index of problem to load from benchmark (optional)
+        parallel_confirm: Run the agent's confirmation verifications in parallel
+        correction_branches: Number of correction branches the agent races after a failed verification
+        cache: SQLite response cache shared by all agents (optional)
+        cache_max_mb: Size limit of the response cache in MB
+        cache_ttl: Maximum age of reused cache entries in seconds (None for no expiry)
+        record: Cassette file that all agents record their API calls into (optional)
+        replay: Cassette file that all agents replay their API calls from (optional)
+        replay_speed: Replay speed relative to the recorded latencies (0 for instant)
+        checkpoint_dir: Directory of per-agent checkpoint journals; existing journals are resumed (optional)
+        events_dir: Directory of per-agent event logs and their shared blob store (optional)
+        max_output_mb: Cap on each of the agent's stdout/stderr files in MB
+        cancel_file: Stop the agent as soon as this file exists (optional)
+        budget_limits: The agent's budget, the keyword arguments of budget.Budget (optional)
+        trace_dir: Directory of per-agent Chrome traces (optional)
+
+    The agent's stdout and stderr are streamed to agent_XX.stdout and
+    agent_XX.stderr in log_dir instead of being returned.
 
     Returns:
-        tuple: (agent_id, return_code, stdout, stderr, solution_found)
+        tuple: (agent_id, return_code, output, error, record), where output
+        maps "stdout"/"stderr" to the path, size and dropped bytes of each stream,
+        error is a short message (the last lines of stderr on failure) and record
+        is the result record the agent wrote to agent_XX.result.json (None if it
+        did not get to write one, e.g. on timeout)
     """
     log_file = os.path.join(log_dir, f"agent_{agent_id:02d}.log")
+    result_file = os.path.abspath(os.path.join(log_dir, f"agent_{agent_id:02d}.result.json"))
+    stdout_file = os.path.join(log_dir, f"agent_{agent_id:02d}.stdout")
+    stderr_file = os.path.join(log_dir, f"agent_{agent_id:02d}.stderr")
 
     # Build command based on whether we're using a problem file or benchmark
     if benchmark:
@@ -92,6 +190,7 @@ def run_agent(agent_id, problem_file, log_dir, timeout=None, other_prompts=[], a
             sys.executable, agent_file,
             "--benchmark", benchmark,
             "--log", log_file,
+            "--result", result_file,
             "--other_prompts", f'\"{",".join(other_prompts)}\"'
         ]
         if level:
@@ -103,9 +202,39 @@ def run_agent(agent_id, problem_file, log_dir, timeout=None, other_prompts=[], a
             sys.executable, agent_file,
             problem_file,
             "--log", log_file,
+            "--result", result_file,
             "--other_prompts", f'\"{",".join(other_prompts)}\"'
         ]
-    
+    if parallel_confirm:
+        cmd.append("--parallel-confirm")
+    if correction_branches > 1:
+        cmd.extend(["--correction-branches", str(correction_branches)])
+    if cache or record or replay:
+        # Each agent samples in its own namespace, so agents don't replay each other's responses
+        cmd.extend(["--cache-namespace", f"agent_{agent_id:02d}"])
+    if cache:
+        cmd.extend(["--cache", os.path.abspath(cache), "--cache-max-mb", str(cache_max_mb)])
+        if cache_ttl is not None:
+            cmd.extend(["--cache-ttl", str(cache_ttl)])
+    if record:
+        cmd.extend(["--record", os.path.abspath(record)])
+    if replay:
+        cmd.extend(["--replay", os.path.abspath(replay), "--replay-speed", str(replay_speed)])
+    if checkpoint_dir:
+        cmd.extend(["--checkpoint", os.path.abspath(os.path.join(checkpoint_dir, f"agent_{agent_id:02d}.jsonl"))])
+    if events_dir:
+        cmd.extend(["--events", os.path.abspath(os.path.join(events_dir, f"agent_{agent_id:02d}.jsonl")),
+                    "--blob-dir", os.path.abspath(os.path.join(events_dir, "blobs"))])
+    if trace_dir:
+        cmd.extend(["--trace", os.path.abspath(agent_trace_path(trace_dir, agent_id))])
+    for flag, key in (("--budget-tokens", "max_tokens"), ("--budget-usd", "max_cost"),
+                      ("--budget-downgrade-at", "downgrade_at"), ("--budget-downgrade-model", "downgrade_model")):
+        if budget_limits and budget_limits.get(key) is not None:
+            cmd.extend([flag, str(budget_limits[key])])
+    # Don't report a record left over from an earlier run
+    if os.path.exists(result_file):
+        os.remove(result_file)
+
     try:
         # Ensure worker can forward signals to child agent process
         _install_worker_signal_handlers()
@@ -116,54 +245,634 @@ def run_agent(agent_id, problem_file, log_dir, timeout=None, other_prompts=[], a
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
             cwd=os.path.dirname(os.path.abspath(__file__)),
             start_new_session=True,
         )
+        max_bytes = int(max_output_mb * 1024 * 1024)
+        stdout_capture = OutputCapture(current_child_process.stdout, stdout_file, max_bytes)
+        stderr_capture = OutputCapture(current_child_process.stderr, stderr_file, max_bytes)
 
+        timed_out = False
+        cancelled = False
         try:
-            if timeout:
-                stdout_text, stderr_text = current_child_process.communicate(timeout=timeout)
-            else:
-                stdout_text, stderr_text = current_child_process.communicate()
-        except subprocess.TimeoutExpired:
-            # Kill process group on timeout
-            try:
-                os.killpg(os.getpgid(current_child_process.pid), signal.SIGKILL)
-            except Exception:
+            timed_out, cancelled = _wait_for_agent(current_child_process, timeout, cancel_file)
+            if cancelled:
+                # Let the agent flush its log before it goes
                 try:
-                    current_child_process.kill()
+                    os.killpg(os.getpgid(current_child_process.pid), signal.SIGTERM)
+                    current_child_process.wait(timeout=CANCEL_GRACE_PERIOD)
                 except Exception:
                     pass
-            return (agent_id, -1, "", f"Agent {agent_id} timed out after {timeout} seconds", False)
+            if timed_out or cancelled:
+                # Kill process group on timeout, or if the agent ignored SIGTERM
+                try:
+                    os.killpg(os.getpgid(current_child_process.pid), signal.SIGKILL)
+                except Exception:
+                    try:
+                        current_child_process.kill()
+                    except Exception:
+                        pass
+                current_child_process.wait()
         finally:
             return_code = current_child_process.returncode
             current_child_process = None
+            # The pipes close when the agent exits; don't hang on grandchildren that keep them open
+            stdout_capture.join(timeout=5)
+            stderr_capture.join(timeout=5)
+            output = {"stdout": stdout_capture.summary(), "stderr": stderr_capture.summary()}
+        if timed_out:
+            return (agent_id, -1, output, f"Agent {agent_id} timed out after {timeout} seconds", None)
 
-        # Check if a solution was found by looking for the success message
-        solution_found = False
-        if return_code == 0:
-            if "Found a correct solution in run" in stdout_text:
-                solution_found = True
-            try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    log_content = f.read()
-                    if "Found a correct solution in run" in log_content:
-                        solution_found = True
-            except Exception:
-                pass
-
-        return (agent_id, return_code, stdout_text, stderr_text, solution_found)
+        # A cancelled agent writes its record on SIGTERM, so its spend still counts
+        agent_record = result_record.read_result(result_file)
+        if agent_record is not None:
+            agent_record["agent_id"] = agent_id
+        if cancelled:
+            return (agent_id, -1, output, f"Agent {agent_id} cancelled", agent_record)
+        error = ""
+        if return_code != 0:
+            # Agents report most errors through their log, i.e. on stdout
+            error = stderr_capture.last_lines() or stdout_capture.last_lines(5)
+        return (agent_id, return_code, output, error, agent_record)
     except Exception as e:
-        return (agent_id, -1, "", f"Agent {agent_id} failed with error: {str(e)}", False)
+        return (agent_id, -1, {}, f"Agent {agent_id} failed with error: {str(e)}", None)
 
-def print_status(agent_id, status, stdout="", stderr=""):
+def _wait_for_agent(process, timeout, cancel_file):
+    """Waits for the agent process to exit; returns (timed_out, cancelled)."""
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        wait_time = None
+        if cancel_file:
+            wait_time = CANCEL_POLL_INTERVAL
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return True, False
+            wait_time = remaining if wait_time is None else min(wait_time, remaining)
+        try:
+            process.wait(timeout=wait_time)
+            return False, False
+        except subprocess.TimeoutExpired:
+            if cancel_file and os.path.exists(cancel_file):
+                return False, True
+
+# --- In-process mode: agents run as threads of the worker processes ---
+_agent_modules = {}
+_worker_configured = False
+_benchmark_entries = {}
+
+
+def _load_agent_module(agent_file):
+    """Imports an agent file into this worker process (once) and returns the module."""
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(code_dir, agent_file)
+    if path not in _agent_modules:
+        if code_dir not in sys.path:
+            sys.path.insert(0, code_dir)
+        name = os.path.splitext(os.path.basename(path))[0]
+        module = sys.modules.get(name)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+        _agent_modules[path] = module
+    return _agent_modules[path]
+
+
+def _configure_worker(cache, cache_max_mb, cache_ttl, record, replay, replay_speed):
+    """Sets up the response cache and cassette of this worker process, shared by its agents."""
+    global _worker_configured
+    if _worker_configured:
+        return
+    import response_cache
+    import cassette
+    if cache:
+        response_cache.configure_cache(cache, max_bytes=cache_max_mb * 1024 * 1024, ttl=cache_ttl)
+    if record or replay:
+        cassette.configure_cassette(record or replay, "record" if record else "replay", speed=replay_speed)
+    _worker_configured = True
+
+
+def _load_problem(module, problem_file, benchmark, level, benchmark_index):
+    if not benchmark:
+        return module.read_file_content(problem_file)
+    from benchmark_loader import BenchmarkLoader
+    key = (benchmark, level)
+    if key not in _benchmark_entries:
+        loader = BenchmarkLoader()
+        if benchmark == 'gradingbench':
+            _benchmark_entries[key] = loader.load_gradingbench(level=level)
+        else:
+            _benchmark_entries[key] = loader.load_proofbench(level=level)
+    return _benchmark_entries[key][benchmark_index].get('Problem', '')
+
+
+def _run_agent_in_thread(module, agent_id, problem_statement, log_dir, timeout, other_prompts, max_runs,
+                         parallel_confirm, correction_branches, sample_namespace, checkpoint_dir, events_dir,
+                         blob_store, cancel_file=None, budget_limits=None, trace_dir=None):
+    """
+    Runs the outer max_runs loop of one agent on the current thread, the same
+    way the agent's __main__ does, with its own log file, journal, event log,
+    trace and budget. Once cancel_file exists, the agent stops at its next API call.
+    Writes the agent's result record to agent_XX.result.json in log_dir and
+    returns (record, timed_out, cancelled), with the record as a dict.
+    """
+    import api_client
+    import checkpoint
+    import events
+    import log_writer
+    import response_cache
+
+    log = module.log_print
+    log_file = log_writer.open_log(os.path.join(log_dir, f"agent_{agent_id:02d}.log"))
+    # Threads start with a fresh context, so these only affect this agent
+    module.use_agent_log(log_file, echo=False)
+    if sample_namespace:
+        response_cache.use_cache_namespace(f"agent_{agent_id:02d}")
+    deadline = time.time() + timeout if timeout else None
+    api_client.set_deadline(deadline)
+    if cancel_file:
+        api_client.set_cancel_check(lambda: os.path.exists(cancel_file))
+
+    journal = None
+    event_log = None
+    tracer = None
+    sol = None
+    cancelled = False
+    result = result_record.ResultRecord(agent_id)
+    run_budget = budget.Budget(**(budget_limits or {}))
+    try:
+        if checkpoint_dir:
+            journal = checkpoint.Journal(os.path.join(checkpoint_dir, f"agent_{agent_id:02d}.jsonl"))
+            checkpoint.use_journal(journal)
+            if journal.loaded:
+                log(f">>>>>>> Resuming from checkpoint: {journal.loaded} calls journaled")
+        if events_dir:
+            event_log = events.EventLog(os.path.join(events_dir, f"agent_{agent_id:02d}.jsonl"), blob_store)
+            events.use_event_log(event_log)
+        if trace_dir:
+            tracer = tracing.Tracer("agent")
+            tracing.use_tracer(tracer)
+        with result, run_budget:
+            for i in range(max_runs):
+                log(f"\n\n>>>>>>>>>>>>>>>>>>>>>>>>>> Run {i} of {max_runs} ...")
+                checkpoint.set_state(run=i, iteration=0, correct_count=0, error_count=0)
+                try:
+                    sol = module.agent(problem_statement, other_prompts, parallel_confirm=parallel_confirm,
+                                       correction_branches=correction_branches)
+                    result.finish_run(i, sol)
+                    events.emit("run_end", solved=sol is not None, solution=sol)
+                    if(sol is not None):
+                        log(f">>>>>>> Found a correct solution in run {i}.")
+                        log(json.dumps(sol, indent=4))
+                        break
+                except budget.BudgetExceeded as e:
+                    log(f">>>>>>> Stopping in run {i}: {e}")
+                    result.finish_run(i, None, error=e)
+                    events.emit("run_end", solved=False, error=str(e))
+                    break
+                except Exception as e:
+                    log(f">>>>>>> Error in run {i}: {e}")
+                    result.finish_run(i, None, error=e)
+                    events.emit("run_end", solved=False, error=str(e))
+                if deadline is not None and time.time() >= deadline:
+                    log(f">>>>>>> Timed out after {timeout} seconds")
+                    break
+                if cancel_file and os.path.exists(cancel_file):
+                    log(">>>>>>> Cancelled")
+                    cancelled = True
+                    break
+    finally:
+        if run_budget.limited():
+            log(f">>>>>>> Budget stats: {json.dumps(run_budget.as_dict())}")
+        if result.calls.records:
+            log(f">>>>>>> Phase stats: {json.dumps(result.calls.phases())}")
+        if journal is not None:
+            log(f">>>>>>> Checkpoint stats: {json.dumps(journal.stats())}")
+            journal.close()
+        if event_log is not None:
+            log(f">>>>>>> Event log stats: {json.dumps(event_log.stats())}")
+            event_log.close()
+        if tracer is not None:
+            tracer.write(agent_trace_path(trace_dir, agent_id))
+        result.write(os.path.join(log_dir, f"agent_{agent_id:02d}.result.json"))
+        log_file.close()
+    timed_out = sol is None and not cancelled and deadline is not None and time.time() >= deadline
+    return result.as_dict(), timed_out, cancelled
+
+
+def run_agents_in_process(agent_ids, problem_file, log_dir, timeout=None, other_prompts=[], agent_file='agent.py',
+                          benchmark=None, level=None, benchmark_indices=None, parallel_confirm=False,
+                          correction_branches=1, cache=None, cache_max_mb=1024, cache_ttl=None,
+                          record=None, replay=None, replay_speed=1.0, checkpoint_dir=None, events_dir=None,
+                          max_runs=10, cancel_files=None, budget_limits=None, trace_dir=None):
+    """
+    Runs a batch of agents as threads of this worker process: the agent
+    module is imported once per worker and agent() is called directly, with
+    no interpreter per agent. The agents share the worker's HTTP connection
+    pools, response cache and cassette; each has its own log file, checkpoint
+    journal, event log and a budget with budget_limits. The timeout is enforced
+    at the agent's next API call, and so is the cancellation of an agent whose
+    entry in cancel_files exists.
+
+    Returns:
+        list: one (agent_id, return_code, output, error, record) tuple per agent,
+        like run_agent(); output is empty since the agents log to their files only
+    """
+    try:
+        module = _load_agent_module(agent_file)
+        _configure_worker(cache, cache_max_mb, cache_ttl, record, replay, replay_speed)
+        blob_store = None
+        if events_dir:
+            import events
+            blob_store = events.BlobStore(os.path.join(events_dir, "blobs"))
+    except Exception as e:
+        return [(agent_id, -1, {}, f"Agent {agent_id} failed with error: {str(e)}", None) for agent_id in agent_ids]
+
+    results = {}
+
+    def run(agent_id, benchmark_index, cancel_file):
+        try:
+            problem_statement = _load_problem(module, problem_file, benchmark, level, benchmark_index)
+            agent_record, timed_out, cancelled = _run_agent_in_thread(
+                module, agent_id, problem_statement, log_dir, timeout, other_prompts, max_runs,
+                parallel_confirm, correction_branches, bool(cache or record or replay),
+                checkpoint_dir, events_dir, blob_store, cancel_file, budget_limits, trace_dir)
+            if timed_out:
+                results[agent_id] = (agent_id, -1, {}, f"Agent {agent_id} timed out after {timeout} seconds", agent_record)
+            elif cancelled:
+                results[agent_id] = (agent_id, -1, {}, f"Agent {agent_id} cancelled", agent_record)
+            else:
+                results[agent_id] = (agent_id, 0, {}, "", agent_record)
+        except BaseException as e:
+            results[agent_id] = (agent_id, 1, {}, f"Agent {agent_id} failed with error: {str(e)}", None)
+
+    threads = []
+    for n, agent_id in enumerate(agent_ids):
+        benchmark_index = benchmark_indices[n] if benchmark_indices else None
+        cancel_file = cancel_files[n] if cancel_files else None
+        thread = threading.Thread(target=run, args=(agent_id, benchmark_index, cancel_file), name=f"agent-{agent_id:02d}")
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    # Worker processes skip atexit handlers, so push the final counters now
+    live_metrics.flush()
+    return [results[agent_id] for agent_id in agent_ids]
+
+
+def _completed_results(future_to_agent):
+    """Yields agent results as they complete; in-process workers return a batch of them at once."""
+    for future in as_completed(future_to_agent):
+        result = future.result()
+        for agent_result in (result if isinstance(result, list) else [result]):
+            yield agent_result
+
+def _format_size(num_bytes):
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes / 1024 / 1024:.1f} MB"
+
+def print_status(agent_id, status, output=None, error=""):
     """Print status information for an agent."""
     print(f"[Agent {agent_id:02d}] {status}")
-    if stdout.strip():
-        print(f"[Agent {agent_id:02d}] STDOUT: {stdout.strip()}")
-    if stderr.strip():
-        print(f"[Agent {agent_id:02d}] STDERR: {stderr.strip()}")
+    for name, stream in (output or {}).items():
+        if stream["bytes"]:
+            capped = f", {_format_size(stream['dropped'])} dropped" if stream["dropped"] else ""
+            print(f"[Agent {agent_id:02d}] {name.upper()}: {stream['path']} ({_format_size(stream['bytes'])}{capped})")
+    if error.strip():
+        print(f"[Agent {agent_id:02d}] ERROR: {error.strip()}")
+
+def _split(limit, parts):
+    if limit is None:
+        return None
+    return limit // parts if isinstance(limit, int) else limit / parts
+
+
+def budget_ledger(args, agents=1, agents_per_problem=1):
+    """
+    Ledger of the --budget-*, --problem-budget-* and --agent-budget-*
+    ceilings. Without a job queue, every agent starts at once, so the run
+    and problem ceilings are split evenly between the agents sharing them.
+    """
+    return budget.BudgetLedger(
+        agent={"tokens": args.agent_budget_tokens, "cost": args.agent_budget_usd},
+        problem={"tokens": _split(args.problem_budget_tokens, agents_per_problem),
+                 "cost": _split(args.problem_budget_usd, agents_per_problem)},
+        run={"tokens": _split(args.budget_tokens, agents), "cost": _split(args.budget_usd, agents)},
+        downgrade_at=args.budget_downgrade_at, downgrade_model=args.budget_downgrade_model)
+
+
+def print_budget(ledger, summary):
+    """Prints the cost of the run and, with budgets, what they allowed."""
+    if summary["cost"] or ledger.limited():
+        print(f"Cost: ${summary['cost']:.4f} at the IMO_PRICES rates")
+    if ledger.limited():
+        spent = ledger.as_dict()
+        ceilings = ", ".join(
+            f"{scope} " + " and ".join(f"${limit:g}" if key == "cost" else f"{limit} tokens" for key, limit in limits.items())
+            for scope, limits in spent["limits"].items())
+        print(f"Budget: {spent['tokens']} tokens and ${spent['cost']:.4f} charged; ceilings: {ceilings}")
+
+
+def print_phases(summary):
+    """Prints where the API calls of all agents spent their time and money, per agent phase."""
+    if summary.get("phases"):
+        print("Calls per phase:")
+        for line in call_metrics.format_table(summary["phases"]):
+            print(f"  {line}")
+
+
+def agent_trace_path(trace_dir, agent_id):
+    return os.path.join(trace_dir, f"agent_{agent_id:02d}.trace.json")
+
+
+def trace_agent(tracer, trace_dir, agent_id, submitted, label):
+    """
+    Adds an agent to the scheduler's rows of the run trace, when its result
+    has come back: queued (and starting up) from its submission until its
+    first span, then running.
+    """
+    finished = time.time()
+    bounds = tracing.trace_bounds(agent_trace_path(trace_dir, agent_id))
+    started = min(max(bounds[0], submitted), finished) if bounds else submitted
+    lane = tracer.lane(label)
+    if started > submitted:
+        tracer.add("queued", submitted, started, "schedule", lane, agent_id=agent_id)
+    tracer.add("running", started, finished, "schedule", lane, agent_id=agent_id)
+
+
+def write_run_trace(tracer, trace_dir, labels):
+    """Merges the scheduler's rows and the traces of the agents in labels ({agent_id: label}) into trace_dir/trace.json."""
+    path = os.path.join(trace_dir, "trace.json")
+    agent_traces = {agent_id + 1: (label, agent_trace_path(trace_dir, agent_id)) for agent_id, label in labels.items()}
+    found = tracing.merge_traces(path, tracer, agent_traces)
+    print(f"Trace of {found} agents: {os.path.abspath(path)} (open it in https://ui.perfetto.dev or chrome://tracing)")
+
+
+def start_metrics(args, status):
+    """Starts the live metrics of --metrics-port/--metrics-file; status() returns the agents running and queued."""
+    if args.metrics_port is None and not args.metrics_file:
+        return None
+    collector = live_metrics.MetricsCollector(status)
+    try:
+        collector.start(args.metrics_port, args.metrics_file)
+    except OSError as e:
+        print(f"Error: cannot serve the metrics on 127.0.0.1:{args.metrics_port}: {e}")
+        sys.exit(1)
+    if args.metrics_port is not None:
+        print(f"Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_file:
+        print(f"Metrics file: {os.path.abspath(args.metrics_file)}")
+    return collector
+
+
+def _submit_job(executor, args, agent_id, benchmark_index, cancel_file, other_prompts, budget_limits):
+    """Submits one sweep attempt to the pool, as a subprocess or an in-process agent."""
+    options = dict(benchmark=args.benchmark, level=args.level,
+                   parallel_confirm=args.parallel_confirm,
+                   correction_branches=args.correction_branches,
+                   cache=args.cache, cache_max_mb=args.cache_max_mb,
+                   cache_ttl=args.cache_ttl, record=args.record,
+                   replay=args.replay, replay_speed=args.replay_speed,
+                   checkpoint_dir=args.checkpoint_dir, events_dir=args.events_dir,
+                   budget_limits=budget_limits, trace_dir=args.trace_dir)
+    if args.in_process:
+        return executor.submit(run_agents_in_process, [agent_id], None, args.log_dir, args.timeout,
+                               other_prompts, args.agent_file, benchmark_indices=[benchmark_index],
+                               cancel_files=[cancel_file], **options)
+    return executor.submit(run_agent, agent_id, None, args.log_dir, args.timeout, other_prompts, args.agent_file,
+                           benchmark_index=benchmark_index, max_output_mb=args.max_output_mb,
+                           cancel_file=cancel_file, **options)
+
+
+def run_sweep(args):
+    """
+    Runs --attempts-per-problem attempts on each of --num-problems benchmark
+    problems with a fixed pool of --max-workers workers.
+
+    The (problem, attempt) jobs wait in a queue in this process, ordered
+    attempt by attempt so that every problem gets its first attempt before
+    any gets its second. When an attempt solves a problem, the problem's
+    queued attempts are dropped and its running attempts are cancelled
+    (through a cancel file that their workers poll), so the freed workers
+    go to the problems that are still unsolved.
+
+    Agent ids are problem * attempts + attempt, so the attempts of problem p
+    log to agent_XX.log files with consecutive numbers.
+
+    The state of every job is kept in sweep_manifest.json in the log
+    directory. With --resume, a sweep continues from its manifest: finished
+    jobs are not run again, and the jobs that were running or still queued
+    when it was interrupted are queued again, the running ones first.
+
+    With budgets, each attempt gets an agent budget of what is left of its
+    problem's and the sweep's ceilings. Once a problem (or the whole sweep)
+    reaches a ceiling, its queued attempts are skipped and its running ones
+    cancelled, like for a solved problem.
+    """
+    attempts = args.attempts_per_problem
+    problems = list(range(args.benchmark_start_index, args.benchmark_start_index + args.num_problems))
+    pool_size = args.max_workers or args.num_agents
+    other_prompts = args.other_prompts.split(',') if args.other_prompts else []
+
+    cancel_dir = os.path.join(args.log_dir, "cancel")
+    os.makedirs(cancel_dir, exist_ok=True)
+    for name in os.listdir(cancel_dir):
+        os.remove(os.path.join(cancel_dir, name))
+
+    def cancel_file(problem):
+        return os.path.join(cancel_dir, f"problem_{problem:03d}")
+
+    settings = {"benchmark": args.benchmark, "level": args.level, "agent_file": args.agent_file,
+                "benchmark_start_index": args.benchmark_start_index, "num_problems": args.num_problems,
+                "attempts_per_problem": attempts}
+    manifest_path = os.path.join(args.log_dir, "sweep_manifest.json")
+    if args.resume and os.path.exists(manifest_path):
+        try:
+            manifest = sweep_manifest.SweepManifest.load(manifest_path, settings)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: cannot resume the sweep: {e}")
+            return 1
+        queue = deque(manifest.unfinished())
+        counts = manifest.counts()
+        print(f"Resuming sweep from {manifest_path}: {counts.get(sweep_manifest.RUNNING, 0)} jobs were running, "
+              f"{counts.get(sweep_manifest.PENDING, 0)} pending")
+    else:
+        if args.resume:
+            print(f"No sweep manifest at {manifest_path}; starting a new sweep")
+        # (agent_id, problem, attempt), attempt-major
+        jobs = [(slot * attempts + attempt, problem, attempt)
+                for attempt in range(attempts)
+                for slot, problem in enumerate(problems)]
+        manifest = sweep_manifest.SweepManifest(manifest_path, settings, jobs)
+        manifest.write()
+        queue = deque(jobs)
+    print(f"Sweeping {len(problems)} problems (benchmark indices {problems[0]}-{problems[-1]}) "
+          f"with {attempts} attempts each")
+    print(f"Benchmark: {args.benchmark}")
+    if args.level:
+        print(f"Level filter: {args.level}")
+    print(f"Agent file: {args.agent_file}")
+    print(f"Log directory: {args.log_dir}")
+    if args.timeout:
+        print(f"Timeout per attempt: {args.timeout} seconds")
+    print(f"Max workers: {pool_size}")
+    if args.in_process and args.agents_per_worker > 1:
+        print("Note: --agents-per-worker is ignored in a sweep; each worker runs one attempt at a time")
+    print("-" * 50)
+
+    solved_by = manifest.solved_by()
+    records = {}
+    attempts_run = {problem: 0 for problem in problems}
+    ledger = budget_ledger(args)
+    for agent_id, job in manifest.jobs.items():
+        if job["state"] not in sweep_manifest.UNFINISHED + (sweep_manifest.SKIPPED,):
+            attempts_run[job["problem"]] += 1
+        if job["result"]:
+            records[agent_id] = result_record.read_result(os.path.join(args.log_dir, job["result"]))
+            ledger.charge(job["problem"], records[agent_id])
+    # Problems stopped by their budget
+    out_of_budget = set()
+    budget_skipped = 0
+    running = {}
+    metrics = start_metrics(args, lambda: (len(running), len(queue)))
+    run_trace = tracing.Tracer("run_parallel", pid=0) if args.trace_dir else None
+    if run_trace is not None:
+        # The top row spans the whole sweep
+        run_trace.lane("sweep")
+    labels = {agent_id: f"Agent {agent_id:02d} (problem {job['problem']}, attempt {job['attempt']})"
+              for agent_id, job in manifest.jobs.items()}
+    submitted = {}
+    start_time = time.time()
+
+    try:
+        with ProcessPoolExecutor(max_workers=pool_size) as executor:
+            while queue or running:
+                # Jobs whose budget is held by running attempts wait for them, in order
+                waiting = []
+                while queue and len(running) < pool_size:
+                    agent_id, problem, attempt = queue.popleft()
+                    if problem in solved_by:
+                        manifest.update(agent_id, sweep_manifest.SKIPPED)
+                        continue
+                    # Every attempt that may run alongside this one gets its share
+                    others = [job[1] for job in queue] + [job[1] for job in waiting] + \
+                             [p for p, _ in running.values()]
+                    budget_limits = ledger.allocate(problem, agent_id, ledger.sharing(problem, others, pool_size))
+                    if budget_limits is None:
+                        manifest.update(agent_id, sweep_manifest.SKIPPED, error="budget exhausted")
+                        budget_skipped += 1
+                        continue
+                    if budget_limits == budget.WAIT:
+                        waiting.append((agent_id, problem, attempt))
+                        continue
+                    future = _submit_job(executor, args, agent_id, problem, cancel_file(problem), other_prompts,
+                                         budget_limits)
+                    running[future] = (problem, attempt)
+                    submitted[agent_id] = time.time()
+                    attempts_run[problem] += 1
+                    manifest.update(agent_id, sweep_manifest.RUNNING)
+                queue.extendleft(reversed(waiting))
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    problem, attempt = running.pop(future)
+                    result = future.result()
+                    for agent_id, return_code, output, error, record in (result if isinstance(result, list) else [result]):
+                        records[agent_id] = record
+                        ledger.charge(problem, record, agent_id)
+                        if run_trace is not None:
+                            trace_agent(run_trace, args.trace_dir, agent_id, submitted[agent_id], labels[agent_id])
+                        scope = ledger.exhausted(problem)
+                        if scope is not None:
+                            # Stop the running attempts of the problem, or of all problems
+                            stopped = [p for p in (problems if scope == "run" else [problem])
+                                       if p not in out_of_budget and p not in solved_by]
+                            for p in stopped:
+                                out_of_budget.add(p)
+                                with open(cancel_file(p), "w"):
+                                    pass
+                            if stopped:
+                                print(f"Budget exhausted ({scope}); stopping problems {stopped}")
+                        label = f"problem {problem}, attempt {attempt}"
+                        if record is not None and record["solved"]:
+                            if problem not in solved_by:
+                                solved_by[problem] = agent_id
+                                # Stop the attempts of this problem that are still running
+                                with open(cancel_file(problem), "w"):
+                                    pass
+                            state = sweep_manifest.SOLVED
+                            status = f"SOLVED {label}"
+                        elif problem in solved_by and return_code != 0:
+                            state = sweep_manifest.CANCELLED
+                            status = f"CANCELLED {label} (solved by Agent {solved_by[problem]:02d})"
+                            error = ""
+                        elif problem in out_of_budget and return_code != 0:
+                            state = sweep_manifest.CANCELLED
+                            status = f"CANCELLED {label} (budget exhausted)"
+                            error = "budget exhausted"
+                        elif return_code == 0:
+                            state = sweep_manifest.UNSOLVED
+                            status = f"COMPLETED {label} (no solution found)"
+                        elif " timed out after " in error:
+                            state = sweep_manifest.TIMED_OUT
+                            status = f"TIMED OUT {label}"
+                        else:
+                            state = sweep_manifest.FAILED
+                            status = f"FAILED {label} (return code: {return_code})"
+                        result = f"agent_{agent_id:02d}.result.json" if record is not None else None
+                        manifest.update(agent_id, state, return_code, error, result)
+                        print_status(agent_id, status, output, error)
+                print(f"Progress: {len(solved_by)}/{len(problems)} problems solved, "
+                      f"{len(running)} attempts running, {len(queue)} queued")
+                print("-" * 30)
+    except KeyboardInterrupt:
+        print("\nReceived interrupt signal. Shutting down gracefully...")
+    if metrics is not None:
+        metrics.stop()
+    if run_trace is not None:
+        run_trace.add("sweep", start_time, time.time(), "schedule", run_trace.lane("sweep"))
+        write_run_trace(run_trace, args.trace_dir, labels)
+
+    total_time = time.time() - start_time
+    print("\n" + "=" * 50)
+    print("SWEEP SUMMARY")
+    print("=" * 50)
+    print(f"Total execution time: {total_time:.2f} seconds")
+    print(f"Problems solved: {len(solved_by)}/{len(problems)}")
+    counts = manifest.counts()
+    print(f"Attempts run: {sum(attempts_run.values())}, cancelled: {counts.get(sweep_manifest.CANCELLED, 0)}, "
+          f"skipped: {counts.get(sweep_manifest.SKIPPED, 0)}, failed: {counts.get(sweep_manifest.FAILED, 0)}, "
+          f"timed out: {counts.get(sweep_manifest.TIMED_OUT, 0)}")
+    if budget_skipped or out_of_budget:
+        print(f"Out of budget: {len(out_of_budget)} problems stopped, {budget_skipped} attempts skipped")
+    unfinished = counts.get(sweep_manifest.PENDING, 0) + counts.get(sweep_manifest.RUNNING, 0)
+    if unfinished:
+        print(f"Unfinished jobs: {unfinished}; rerun with --resume to continue the sweep")
+    summary = result_record.summarize(records.values())
+    if summary["agents"]:
+        print(f"Runs: {summary['runs']}, iterations: {summary['iterations']}, API calls: {summary['calls']}")
+        print(f"Tokens: {summary['total_tokens']} total ({summary['prompt_tokens']} prompt, "
+              f"{summary['output_tokens']} output, {summary['reasoning_tokens']} reasoning)")
+    print_budget(ledger, summary)
+    print_phases(summary)
+    spent = ledger.as_dict()["problems"]
+    for problem in problems:
+        if problem in solved_by:
+            outcome = f"solved by Agent {solved_by[problem]:02d}"
+        elif problem in out_of_budget:
+            outcome = "unsolved, out of budget"
+        else:
+            outcome = "unsolved"
+        cost = spent.get(problem, {"tokens": 0, "cost": 0.0})
+        print(f"  Problem {problem}: {outcome} ({attempts_run[problem]} attempts run, "
+              f"{cost['tokens']} tokens, ${cost['cost']:.4f})")
+    print(f"\nLog files are available in: {os.path.abspath(args.log_dir)}")
+    print(f"Sweep manifest: {os.path.abspath(manifest_path)}")
+    return 0 if len(solved_by) == len(problems) else 1
 
 def main():
     parser = argparse.ArgumentParser(description='Run multiple IMO agent instances in parallel')
@@ -188,6 +897,62 @@ def main():
                        help='Filter benchmark by level (Basic, Advanced). Case-insensitive.')
     parser.add_argument('--benchmark-start-index', type=int, default=0,
                        help='Starting index for benchmark problems (default: 0)')
+    parser.add_argument('--parallel-confirm', action='store_true',
+                       help='Let each agent run its confirmation verifications in parallel')
+    parser.add_argument('--correction-branches', type=int, default=1,
+                       help='Number of correction branches each agent races after a failed verification (default: 1)')
+    parser.add_argument('--cache', type=str,
+                       help='SQLite file that caches API responses across runs, shared by all agents (optional)')
+    parser.add_argument('--cache-max-mb', type=int, default=1024,
+                       help='Size limit of the response cache in MB (default: 1024)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                       help='Ignore cache entries older than this many seconds (default: no expiry)')
+    parser.add_argument('--record', type=str,
+                       help='Record the API calls of all agents into this cassette file (optional)')
+    parser.add_argument('--replay', type=str,
+                       help='Replay the API calls of all agents offline from this cassette file (optional)')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                       help='Replay speed relative to the recorded latencies; 0 replays instantly (default: 1)')
+    parser.add_argument('--checkpoint-dir', type=str,
+                       help='Directory for per-agent checkpoint journals; rerunning with the same directory resumes every agent at its last call (optional)')
+    parser.add_argument('--events-dir', type=str,
+                       help='Directory for per-agent structured event logs; all agents share one blob store in it (optional)')
+    parser.add_argument('--max-output-mb', type=float, default=50,
+                       help="Cap on each agent's stdout/stderr file in the log directory, in MB (default: 50)")
+    parser.add_argument('--in-process', action='store_true',
+                       help='Run agents as threads of the worker processes instead of one agent subprocess each')
+    parser.add_argument('--agents-per-worker', type=int, default=1,
+                       help='With --in-process, number of agents each worker process runs at once (default: 1)')
+    parser.add_argument('--adaptive-concurrency', type=int, metavar='MAX',
+                       help='Let each agent process (each worker process with --in-process) limit its requests in flight per provider with an AIMD controller, up to MAX (optional)')
+    parser.add_argument('--trace-dir', type=str,
+                       help='Trace every agent into DIR/agent_XX.trace.json and merge them into DIR/trace.json, a Chrome trace of the whole run (optional)')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                       help='Serve live metrics in the Prometheus format on http://127.0.0.1:PORT/metrics (optional)')
+    parser.add_argument('--metrics-file', metavar='FILE',
+                       help='Keep live metrics in the Prometheus format in FILE, e.g. for the node_exporter textfile collector (optional)')
+    parser.add_argument('--budget-tokens', type=int,
+                       help='Token ceiling of the whole run or sweep; split evenly between the agents outside sweep mode (optional)')
+    parser.add_argument('--budget-usd', type=float,
+                       help='USD ceiling of the whole run or sweep at the IMO_PRICES rates; split evenly between the agents outside sweep mode (optional)')
+    parser.add_argument('--problem-budget-tokens', type=int,
+                       help='Token ceiling per problem, over all of its attempts (optional)')
+    parser.add_argument('--problem-budget-usd', type=float,
+                       help='USD ceiling per problem, over all of its attempts (optional)')
+    parser.add_argument('--agent-budget-tokens', type=int,
+                       help='Token ceiling of each agent (optional)')
+    parser.add_argument('--agent-budget-usd', type=float,
+                       help='USD ceiling of each agent (optional)')
+    parser.add_argument('--budget-downgrade-model', type=str,
+                       help='Send the calls an agent makes past --budget-downgrade-at of its budget to this cheaper model (optional)')
+    parser.add_argument('--budget-downgrade-at', type=float, default=None,
+                       help='Share of a ceiling after which agents switch to --budget-downgrade-model (default: 0.8)')
+    parser.add_argument('--attempts-per-problem', type=int, default=None,
+                       help='Sweep mode: run this many attempts on each of --num-problems benchmark problems from a shared job queue, cancelling the other attempts of a problem once it is solved')
+    parser.add_argument('--num-problems', type=int, default=1,
+                       help='Sweep mode: number of benchmark problems, starting at --benchmark-start-index (default: 1)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Sweep mode: continue the interrupted sweep recorded in the log directory, running only unfinished jobs')
 
 
     args = parser.parse_args()
@@ -200,6 +965,34 @@ def main():
     
     # Create log directory if it doesn't exist
     os.makedirs(args.log_dir, exist_ok=True)
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+    if args.events_dir:
+        os.makedirs(args.events_dir, exist_ok=True)
+    if args.trace_dir:
+        os.makedirs(args.trace_dir, exist_ok=True)
+    if args.in_process and os.path.basename(args.agent_file) == 'agent_async.py':
+        print("Error: --in-process runs the synchronous agents; use agent_async.py -n N to run many asyncio agents in one process")
+        sys.exit(1)
+    if args.adaptive_concurrency:
+        # Inherited by the agent subprocesses and the in-process workers
+        os.environ["IMO_CONCURRENCY_MAX"] = str(args.adaptive_concurrency)
+    if args.attempts_per_problem:
+        if not args.benchmark:
+            print("Error: --attempts-per-problem sweeps benchmark problems; use --benchmark")
+            sys.exit(1)
+        return run_sweep(args)
+    agents_per_worker = max(1, args.agents_per_worker) if args.in_process else 1
+    batches = [list(range(i, min(i + agents_per_worker, args.num_agents)))
+               for i in range(0, args.num_agents, agents_per_worker)]
+    max_workers = min(args.max_workers or len(batches), len(batches))
+    ledger = budget_ledger(args)
+    # With a benchmark every agent has a problem of its own
+    shares = budget_ledger(args, args.num_agents, 1 if args.benchmark else args.num_agents)
+    budget_limits = shares.allocate(None)
+    if budget_limits is None:
+        print("Error: the budget leaves nothing for the agents")
+        sys.exit(1)
     
     print(f"Starting {args.num_agents} parallel agents...")
     if args.benchmark:
@@ -214,7 +1007,11 @@ def main():
     print(f"Exit behavior: {'Immediate exit' if args.exit_immediately else 'Run all agents to completion'} when solution found")
     if args.timeout:
         print(f"Timeout per agent: {args.timeout} seconds")
-    print(f"Max workers: {args.max_workers or args.num_agents}")
+    print(f"Max workers: {max_workers}")
+    if args.in_process:
+        print(f"In-process mode: {agents_per_worker} agent(s) per worker")
+    if ledger.limited():
+        print(f"Budget per agent: {json.dumps(budget_limits)}")
     if not args.exit_immediately:
         print("Note: All agents will run to completion regardless of solution found")
     print("-" * 50)
@@ -225,45 +1022,103 @@ def main():
     failed_agents = []
     solution_found = False
     solution_agent_id = None
+    records = {}
 
     other_prompts = []
     if args.other_prompts:
         other_prompts = args.other_prompts.split(',')
-    
+
+    future_to_agent = {}
+    batch_sizes = {batch[0]: len(batch) for batch in batches}
+
+    def agent_counts():
+        running = queued = 0
+        for future, agent_id in list(future_to_agent.items()):
+            if not future.done():
+                if future.running():
+                    running += batch_sizes[agent_id]
+                else:
+                    queued += batch_sizes[agent_id]
+        return running, queued
+
+    metrics = start_metrics(args, agent_counts)
+    run_trace = tracing.Tracer("run_parallel", pid=0) if args.trace_dir else None
+    if run_trace is not None:
+        # The top row spans the whole run
+        run_trace.lane("run")
+    labels = {agent_id: f"Agent {agent_id:02d}" for agent_id in range(args.num_agents)}
     start_time = time.time()
     
     try:
-        with ProcessPoolExecutor(max_workers=args.max_workers or args.num_agents) as executor:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
             # Submit all agent tasks
-            if args.benchmark:
+            if args.in_process:
+                # Each task runs a batch of agents as threads of one worker process.
+                # Relative problem paths resolve from the code directory, as for agent subprocesses.
+                problem_file = None
+                if args.problem_file:
+                    problem_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), args.problem_file)
+                future_to_agent = {
+                    executor.submit(run_agents_in_process, batch, problem_file, args.log_dir, args.timeout,
+                                    other_prompts, args.agent_file,
+                                    benchmark=args.benchmark, level=args.level,
+                                    benchmark_indices=[args.benchmark_start_index + i for i in batch] if args.benchmark else None,
+                                    parallel_confirm=args.parallel_confirm,
+                                    correction_branches=args.correction_branches,
+                                    cache=args.cache, cache_max_mb=args.cache_max_mb,
+                                    cache_ttl=args.cache_ttl, record=args.record,
+                                    replay=args.replay, replay_speed=args.replay_speed,
+                                    checkpoint_dir=args.checkpoint_dir,
+                                    events_dir=args.events_dir,
+                                    budget_limits=budget_limits, trace_dir=args.trace_dir): batch[0]
+                    for batch in batches
+                }
+            elif args.benchmark:
                 # When using benchmark, each agent gets a different benchmark index
                 future_to_agent = {
                     executor.submit(
                         run_agent, i, args.problem_file, args.log_dir, args.timeout, other_prompts, args.agent_file,
-                        args.benchmark, args.level, args.benchmark_start_index + i
+                        args.benchmark, args.level, args.benchmark_start_index + i,
+                        args.parallel_confirm, args.correction_branches,
+                        args.cache, args.cache_max_mb, args.cache_ttl,
+                        args.record, args.replay, args.replay_speed, args.checkpoint_dir,
+                        args.events_dir, args.max_output_mb, budget_limits=budget_limits,
+                        trace_dir=args.trace_dir
                     ): i
                     for i in range(args.num_agents)
                 }
             else:
                 # When using a problem file, all agents work on the same problem
                 future_to_agent = {
-                    executor.submit(run_agent, i, args.problem_file, args.log_dir, args.timeout, other_prompts, args.agent_file): i
+                    executor.submit(run_agent, i, args.problem_file, args.log_dir, args.timeout, other_prompts, args.agent_file,
+                                    parallel_confirm=args.parallel_confirm,
+                                    correction_branches=args.correction_branches,
+                                    cache=args.cache, cache_max_mb=args.cache_max_mb,
+                                    cache_ttl=args.cache_ttl, record=args.record,
+                                    replay=args.replay, replay_speed=args.replay_speed,
+                                    checkpoint_dir=args.checkpoint_dir,
+                                    events_dir=args.events_dir,
+                                    max_output_mb=args.max_output_mb,
+                                    budget_limits=budget_limits, trace_dir=args.trace_dir): i
                     for i in range(args.num_agents)
                 }
             
             # Process completed agents
-            for future in as_completed(future_to_agent):
-                agent_id, return_code, stdout, stderr, found_solution = future.result()
+            for agent_id, return_code, output, error, record in _completed_results(future_to_agent):
                 completed_agents.append(agent_id)
+                records[agent_id] = record
+                ledger.charge(None, record)
+                if run_trace is not None:
+                    trace_agent(run_trace, args.trace_dir, agent_id, start_time, labels[agent_id])
                 
-                if found_solution:
+                if record is not None and record["solved"]:
                     solution_found = True
                     solution_agent_id = agent_id
                     status = "FOUND CORRECT SOLUTION!"
                     successful_agents.append(agent_id)
                     print(f"\n🎉 SOLUTION FOUND by Agent {agent_id:02d}! 🎉")
                     print(f"[Agent {agent_id:02d}] {status}")
-                    print_status(agent_id, status, stdout, stderr)
+                    print_status(agent_id, status, output, error)
                     
                     if args.exit_immediately:
                         # Exit immediately when solution is found
@@ -318,13 +1173,18 @@ def main():
                     status = f"FAILED (return code: {return_code})"
                     failed_agents.append(agent_id)
                 
-                print_status(agent_id, status, stdout, stderr)
+                print_status(agent_id, status, output, error)
                 print(f"Progress: {len(completed_agents)}/{args.num_agents} agents completed")
                 print("-" * 30)
     
     except KeyboardInterrupt:
         print("\nReceived interrupt signal. Shutting down gracefully...")
         # The ProcessPoolExecutor will handle cleanup automatically
+    if metrics is not None:
+        metrics.stop()
+    if run_trace is not None:
+        run_trace.add("run", start_time, time.time(), "schedule", run_trace.lane("run"))
+        write_run_trace(run_trace, args.trace_dir, labels)
     
     end_time = time.time()
     total_time = end_time - start_time
@@ -339,28 +1199,23 @@ def main():
     print(f"Failed agents: {len(failed_agents)}")
     print(f"Success rate: {len(successful_agents)/args.num_agents*100:.1f}%")
     
+    summary = result_record.summarize(records.values())
+    if summary["agents"]:
+        print(f"Runs: {summary['runs']}, iterations: {summary['iterations']}, API calls: {summary['calls']}")
+        print(f"Tokens: {summary['total_tokens']} total ({summary['prompt_tokens']} prompt, "
+              f"{summary['output_tokens']} output, {summary['reasoning_tokens']} reasoning)")
+        print(f"Agent wall time: {summary['mean_wall_time']:.2f}s mean, {summary['max_wall_time']:.2f}s max")
+    print_budget(ledger, summary)
+    print_phases(summary)
+
     if solution_found:
-        print(f"\n🎉 SOLUTION FOUND by Agent {solution_agent_id:02d}! 🎉")
+        record = records[solution_agent_id]
+        print(f"\n🎉 SOLUTION FOUND by Agent {solution_agent_id:02d} in run {record['solved_in_run']}! 🎉")
         print(f"Log file with solution: {os.path.join(args.log_dir, f'agent_{solution_agent_id:02d}.log')}")
-        
-        # Try to extract and display the solution
-        solution_log_file = os.path.join(args.log_dir, f"agent_{solution_agent_id:02d}.log")
-        try:
-            with open(solution_log_file, 'r', encoding='utf-8') as f:
-                log_content = f.read()
-                # Look for the solution in the log
-                if "Found a correct solution in run" in log_content:
-                    # Extract the solution JSON
-                    solution_match = re.search(r'Found a correct solution in run \d+\.\s*\n(.*?)(?=\n\n|\n>>>>>>>|\Z)', 
-                                            log_content, re.DOTALL)
-                    if solution_match:
-                        solution_text = solution_match.group(1).strip()
-                        print(f"\nSOLUTION FOUND:")
-                        print("=" * 50)
-                        print(solution_text)
-                        print("=" * 50)
-        except Exception as e:
-            print(f"Could not extract solution from log file: {e}")
+        print(f"\nSOLUTION FOUND:")
+        print("=" * 50)
+        print(record["solution"])
+        print("=" * 50)
     
     if successful_agents:
         print(f"\nSuccessful agent IDs: {sorted(successful_agents)}")
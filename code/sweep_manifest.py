@@ -0,0 +1,123 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import os
+import json
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+SOLVED = "solved"
+UNSOLVED = "unsolved"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+
+# States a job can be left in when the sweep is interrupted
+UNFINISHED = (PENDING, RUNNING)
+
+
+class SweepManifest:
+    """
+    Durable state of a benchmark sweep: the settings it was started with and
+    one entry per (problem, attempt) job with its state, return code, error
+    and the path of its result record.
+
+    Every transition rewrites the whole file through a temporary file, fsync
+    and rename, so a sweep killed at any point leaves either the previous or
+    the new manifest on disk, never a torn one. A resumed sweep skips the
+    jobs that finished and queues again the ones that were pending or
+    running.
+    """
+
+    def __init__(self, path, settings, jobs):
+        """jobs is a list of (agent_id, problem, attempt) in queue order."""
+        self.path = path
+        self.settings = dict(settings)
+        self.jobs = {
+            agent_id: {"problem": problem, "attempt": attempt, "state": PENDING,
+                       "return_code": None, "error": "", "result": None, "updated": None}
+            for agent_id, problem, attempt in jobs
+        }
+        self.order = [agent_id for agent_id, _, _ in jobs]
+
+    @classmethod
+    def load(cls, path, settings):
+        """
+        Reads the manifest at path. Raises ValueError if it was written by a
+        sweep with different settings, since its job ids would not match.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data["settings"] != settings:
+            raise ValueError(f"manifest {path} was written with different settings: {data['settings']}")
+        manifest = cls(path, settings, [])
+        manifest.jobs = {int(agent_id): job for agent_id, job in data["jobs"].items()}
+        manifest.order = data["order"]
+        return manifest
+
+    def update(self, agent_id, state, return_code=None, error="", result=None):
+        """Moves a job to state and writes the manifest."""
+        job = self.jobs[agent_id]
+        job["state"] = state
+        job["return_code"] = return_code
+        job["error"] = error
+        if result is not None:
+            job["result"] = result
+        job["updated"] = time.time()
+        self.write()
+
+    def write(self):
+        data = {"settings": self.settings, "order": self.order,
+                "jobs": {str(agent_id): job for agent_id, job in self.jobs.items()}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def unfinished(self):
+        """Returns the jobs to run, in-flight ones first, as (agent_id, problem, attempt) in queue order."""
+        in_flight = [agent_id for agent_id in self.order if self.jobs[agent_id]["state"] == RUNNING]
+        pending = [agent_id for agent_id in self.order if self.jobs[agent_id]["state"] == PENDING]
+        return [(agent_id, self.jobs[agent_id]["problem"], self.jobs[agent_id]["attempt"])
+                for agent_id in in_flight + pending]
+
+    def solved_by(self):
+        """Maps each solved problem to the first job that solved it."""
+        solved = {}
+        for agent_id in self.order:
+            job = self.jobs[agent_id]
+            if job["state"] == SOLVED:
+                solved.setdefault(job["problem"], agent_id)
+        return solved
+
+    def counts(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return counts
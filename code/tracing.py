@@ -0,0 +1,247 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import json
+import time
+import asyncio
+import inspect
+import functools
+import threading
+import itertools
+import contextvars
+from contextlib import contextmanager
+import checkpoint
+
+# Tracer of the agent running in the current context (thread or asyncio task), and its open span
+_tracer = contextvars.ContextVar("tracer", default=None)
+_span = contextvars.ContextVar("trace_span", default=None)
+_ids = itertools.count(1)
+
+
+def _micros(seconds):
+    return int(seconds * 1e6)
+
+
+class _Span:
+    def __init__(self, tracer, tid):
+        self.tracer = tracer
+        self.tid = tid
+        self.id = next(_ids)
+
+
+class Tracer:
+    """
+    Collects the spans of one agent in the Chrome trace event format, which
+    chrome://tracing and https://ui.perfetto.dev open:
+
+        tracer = Tracer("Agent 03")
+        use_tracer(tracer)
+        with span("verify_solution"):
+            ...
+        tracer.write("agent_03.trace.json")
+
+    Each thread or asyncio task that runs spans of the agent gets a lane
+    (a trace "thread") of its own: the first one is "main", and parallel
+    verifications or correction branches get "branch N" lanes, linked to the
+    span that started them by a flow arrow. Timestamps are wall-clock
+    microseconds, so the traces of several agents line up when merged.
+    """
+
+    def __init__(self, name="agent", pid=None):
+        self.name = name
+        self.pid = os.getpid() if pid is None else pid
+        self.events = []
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def lane(self, label=None):
+        """Returns the lane (tid) of label, or of the current thread or asyncio task."""
+        if label is None:
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                task = None
+            key = ("task", id(task)) if task is not None else ("thread", threading.get_ident())
+        else:
+            key = ("label", label)
+        with self._lock:
+            tid = self._lanes.get(key)
+            if tid is None:
+                tid = self._lanes[key] = len(self._lanes) + 1
+                if label is None:
+                    label = "main" if tid == 1 else f"branch {tid - 1}"
+                self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                                    "args": {"name": label}})
+                self.events.append({"name": "thread_sort_index", "ph": "M", "pid": self.pid, "tid": tid,
+                                    "args": {"sort_index": tid}})
+        return tid
+
+    def add(self, name, started, ended, cat="phase", tid=None, parent=None, **args):
+        """Adds a finished span; parent is the _Span it belongs to, linked by a flow arrow when it is on another lane."""
+        tid = self.lane() if tid is None else tid
+        event = {"name": name, "cat": cat, "ph": "X", "pid": self.pid, "tid": tid,
+                 "ts": _micros(started), "dur": max(_micros(ended) - _micros(started), 1), "args": args}
+        with self._lock:
+            self.events.append(event)
+            if parent is not None and parent.tracer is self and parent.tid != tid:
+                # Process-local ids: agents of other processes count from 1 too
+                flow = {"local": next(_ids)}
+                self.events.append({"name": name, "cat": "flow", "ph": "s", "id2": flow, "pid": self.pid,
+                                    "tid": parent.tid, "ts": _micros(started)})
+                self.events.append({"name": name, "cat": "flow", "ph": "f", "bp": "e", "id2": flow,
+                                    "pid": self.pid, "tid": tid, "ts": _micros(started)})
+
+    def as_dict(self):
+        with self._lock:
+            events = list(self.events)
+        process = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": self.name}}]
+        return {"traceEvents": process + events, "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """Writes the trace to path atomically."""
+        _write_json(path, self.as_dict())
+
+
+def use_tracer(tracer):
+    """Makes tracer the tracer of the current context (thread or asyncio task); None turns tracing off."""
+    _tracer.set(tracer)
+    _span.set(None)
+
+
+def get_tracer():
+    return _tracer.get()
+
+
+@contextmanager
+def span(name, cat="phase", **args):
+    """
+    Records the block as a span of the current agent, with the agent's run,
+    iteration and phase at its start and the given args. Does nothing
+    without a tracer.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        yield
+        return
+    parent = _span.get()
+    current = _Span(tracer, tracer.lane())
+    token = _span.set(current)
+    started = time.time()
+    args = dict(checkpoint.get_state(), **args)
+    try:
+        yield
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        _span.reset(token)
+        tracer.add(name, started, time.time(), cat, current.tid, parent, **args)
+
+
+def traced(name):
+    """Decorator recording every call of a function or coroutine function as a span."""
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def run_async(*args, **kwargs):
+                with span(name):
+                    return await function(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(function)
+        def run(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return run
+    return decorate
+
+
+def add_span(name, started, cat="api", **args):
+    """Records a span from started until now in the current span, e.g. an API call measured elsewhere."""
+    tracer = _tracer.get()
+    if tracer is not None:
+        tracer.add(name, started, time.time(), cat, None, _span.get(), **args)
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_trace(path):
+    """Returns the events of a trace file, or [] if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["traceEvents"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def write_traces(path, tracers):
+    """Writes the spans of several tracers, e.g. of the agents of one process, to one trace file."""
+    events = []
+    for tracer in tracers:
+        events.extend(tracer.as_dict()["traceEvents"])
+    _write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+def merge_traces(path, tracer, agent_traces):
+    """
+    Writes one trace of a whole run to path: the events of tracer (e.g. the
+    scheduler's spans of every agent) followed by the agent traces, given as
+    {pid: (name, trace file)}. Each agent's events are moved to its own
+    process, so the agents show up as separate rows, and its flow ids are
+    scoped to that process so arrows of different agents never join.
+    Returns the number of agent traces found.
+    """
+    events = tracer.as_dict()["traceEvents"]
+    found = 0
+    for pid, (name, trace_path) in sorted(agent_traces.items()):
+        agent_events = read_trace(trace_path)
+        if not agent_events:
+            continue
+        found += 1
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": name}})
+        events.append({"name": "process_sort_index", "ph": "M", "pid": pid, "tid": 0, "args": {"sort_index": pid}})
+        for event in agent_events:
+            if event["ph"] == "M" and event["name"] == "process_name":
+                continue
+            event = dict(event, pid=pid)
+            if "id" in event and event.get("cat") == "flow":
+                # Traces written before flow ids were process-local
+                event["id2"] = {"local": event.pop("id")}
+            events.append(event)
+    _write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+    return found
+
+
+def trace_bounds(trace_path):
+    """Returns (first, last) timestamp in seconds of a trace's spans, or None if it has none."""
+    spans = [event for event in read_trace(trace_path) if event["ph"] == "X"]
+    if not spans:
+        return None
+    return min(e["ts"] for e in spans) / 1e6, max(e["ts"] + e["dur"] for e in spans) / 1e6
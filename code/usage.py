@@ -0,0 +1,193 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import threading
+import contextvars
+
+# Meters that are active in the current context (thread or asyncio task)
+_active_meters = contextvars.ContextVar("active_meters", default=())
+
+# USD per million (prompt, output) tokens; output includes reasoning tokens.
+# List prices at the time of writing; override them with
+# IMO_PRICES="model=prompt/output,..." Models not listed here cost nothing.
+DEFAULT_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gpt-5": (1.25, 10.0),
+    "gpt-5-mini": (0.25, 2.0),
+    "gpt-5-nano": (0.05, 0.40),
+    "grok-4-0709": (3.0, 15.0),
+    "grok-3-mini": (0.30, 0.50),
+}
+
+
+def parse_prices(spec):
+    """Parses "model=prompt/output,..." (USD per million tokens) into {model: (prompt, output)}."""
+    prices = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        model, _, rates = item.partition("=")
+        prompt, _, output = rates.partition("/")
+        prices[model.strip()] = (float(prompt), float(output or prompt))
+    return prices
+
+
+_prices = dict(DEFAULT_PRICES, **parse_prices(os.getenv("IMO_PRICES")))
+
+
+def set_price(model, prompt, output):
+    """Sets the USD price per million prompt and output tokens of model."""
+    _prices[model] = (prompt, output)
+
+
+def usage_cost(usage, model):
+    """Returns the USD cost of a normalized usage (see extract_usage) on model."""
+    prompt, output = _prices.get(model, (0.0, 0.0))
+    return (usage["prompt_tokens"] * prompt + usage["output_tokens"] * output) / 1e6
+
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def extract_usage(response_data):
+    """
+    Normalizes the token usage reported by any of the providers to
+    {"prompt_tokens", "output_tokens", "reasoning_tokens", "total_tokens"}.
+    output_tokens counts every generated token, including reasoning tokens.
+
+    Supports Gemini `usageMetadata`, OpenAI Responses `usage` and
+    chat-completions `usage` (xAI, sglang). Missing fields count as 0.
+    """
+    if not isinstance(response_data, dict):
+        return {"prompt_tokens": 0, "output_tokens": 0, "reasoning_tokens": 0, "total_tokens": 0}
+
+    if "usageMetadata" in response_data:
+        # Gemini: thoughts are reported separately from the candidates
+        meta = response_data.get("usageMetadata") or {}
+        prompt_tokens = _int(meta.get("promptTokenCount"))
+        reasoning_tokens = _int(meta.get("thoughtsTokenCount"))
+        output_tokens = _int(meta.get("candidatesTokenCount")) + reasoning_tokens
+        total_tokens = _int(meta.get("totalTokenCount")) or prompt_tokens + output_tokens
+    else:
+        usage = response_data.get("usage") or {}
+        if "input_tokens" in usage or "output_tokens" in usage:
+            # OpenAI Responses API: output_tokens already include reasoning
+            prompt_tokens = _int(usage.get("input_tokens"))
+            output_tokens = _int(usage.get("output_tokens"))
+            details = usage.get("output_tokens_details") or {}
+        else:
+            # Chat completions: some servers leave reasoning out of completion_tokens
+            prompt_tokens = _int(usage.get("prompt_tokens"))
+            output_tokens = _int(usage.get("completion_tokens"))
+            details = usage.get("completion_tokens_details") or {}
+            if _int(usage.get("total_tokens")):
+                output_tokens = max(output_tokens, _int(usage.get("total_tokens")) - prompt_tokens)
+        reasoning_tokens = _int(details.get("reasoning_tokens"))
+        total_tokens = _int(usage.get("total_tokens")) or prompt_tokens + output_tokens
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "reasoning_tokens": reasoning_tokens,
+        "total_tokens": total_tokens,
+    }
+
+
+class UsageMeter:
+    """
+    Accumulates the number of API calls and their token usage while active:
+
+        meter = UsageMeter()
+        with meter:
+            send_api_request(...)
+        print(meter.as_dict())
+
+    Meters nest, and every active meter of the current thread or asyncio
+    task sees each call reported with record_usage().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = []
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.reasoning_tokens = 0
+        self.total_tokens = 0
+        self.cost = 0.0
+
+    def add(self, usage):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            self.reasoning_tokens += usage["reasoning_tokens"]
+            self.total_tokens += usage["total_tokens"]
+            self.cost += usage.get("cost", 0.0)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "reasoning_tokens": self.reasoning_tokens,
+                "total_tokens": self.total_tokens,
+                "cost": round(self.cost, 6),
+            }
+
+    def __enter__(self):
+        self._tokens.append(_active_meters.set(_active_meters.get() + (self,)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_meters.reset(self._tokens.pop())
+        return False
+
+
+def active_meters():
+    """Returns the meters that are active in the current context, outermost first."""
+    return _active_meters.get()
+
+
+def record_usage(response_data, model=None):
+    """
+    Reports one successful API call to every active meter. Returns the
+    normalized usage of the call, with its USD "cost" on model (by default
+    the model named in the response).
+    """
+    usage = extract_usage(response_data)
+    if model is None and isinstance(response_data, dict):
+        model = response_data.get("model") or response_data.get("modelVersion")
+    usage["cost"] = usage_cost(usage, model)
+    for meter in _active_meters.get():
+        meter.add(usage)
+    return usage
@@ -0,0 +1,103 @@
+"""
+MIT License
+
+Copyright (c) 2025 Lin Yang, Yichen Huang
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import re
+
+# Phrases in the Final Verdict sentence that mean the solution does not pass
+_FAIL_VERDICT = re.compile(
+    r"\b(invalid|incorrect|wrong|flawed|fails?|unsound|incomplete|critical\s+errors?)\b"
+    r"|\bnot\s+(?:\w+\s+)?(?:correct|valid|rigorous|complete|sound)\b",
+    re.IGNORECASE,
+)
+_PASS_VERDICT = re.compile(r"\b(correct|valid|rigorous|sound)\b", re.IGNORECASE)
+_GAP = re.compile(r"\bjustification\s+gaps?\b", re.IGNORECASE)
+_CRITICAL = re.compile(r"\bcritical\s+errors?\b", re.IGNORECASE)
+# A verdict that praises the answer but still mentions problems with the proof is not a pass
+_CONCERN = re.compile(r"\b(gaps?|errors?|issues?|flaws?|mistakes?|problems?)\b", re.IGNORECASE)
+# A finding's "Issue:" line, which should carry its classification
+_ISSUE_LINE = re.compile(r"^[\s\-\u2022]*Issue\s*:", re.IGNORECASE)
+# "... contains Justification Gaps; therefore not fully rigorous" restates the gaps, it is no failure of its own
+_NOT_RIGOROUS = re.compile(r"\bnot\s+(?:fully\s+|entirely\s+|completely\s+|quite\s+)?rigorous\b", re.IGNORECASE)
+_ISSUE = r"(?:critical\s+errors?|justification\s+gaps?|errors?|issues?|gaps?)"
+# "no critical errors or justification gaps", "free of errors", "neither Critical Errors nor Justification Gaps", ...
+_NEGATED_ISSUES = re.compile(
+    r"\b(?:no|without|free\s+of|neither|not\s+(?:contain|have)s?\s+any)\s+(?:major\s+|minor\s+)?" + _ISSUE
+    + r"(?:\s*,?\s*(?:or|and|nor)\s+(?:major\s+|minor\s+)?" + _ISSUE + r")*",
+    re.IGNORECASE,
+)
+
+
+def _verdict_section(text):
+    """Returns (verdict sentence, findings text) from the verifier's summary."""
+    text = text.replace("*", "")
+    # Verifiers that think out loud may draft a verdict before the final summary
+    summary_idx = text.rfind("Summary")
+    if summary_idx != -1 and "Final Verdict" in text[summary_idx:]:
+        text = text[summary_idx:]
+
+    match = re.search(r"Final Verdict\s*:?[ \t]*(.*?)(?:\n\s*\n|\n\s*List of Findings|\Z)", text, re.DOTALL)
+    if match is None:
+        return None, ""
+    verdict = _NEGATED_ISSUES.sub(" ", " ".join(match.group(1).split()))
+
+    findings = ""
+    match = re.search(r"List of Findings\s*:?(.*?)(?:\n\s*#|Detailed Verification|\Z)", text, re.DOTALL)
+    if match is not None:
+        findings = match.group(1)
+    return verdict, findings
+
+
+def parse_verdict(text):
+    """
+    Decides from the verifier's own summary whether a solution passes.
+
+    Reads the **Final Verdict** sentence and the **List of Findings** that the
+    verification prompt asks for. Returns False when the verdict calls the
+    solution invalid or a finding is a Critical Error, True when the verdict
+    says the solution is correct and no finding is listed, and None when the
+    summary is missing or ambiguous (e.g. only Justification Gaps, whose
+    severity still needs the LLM yes/no check, even when the verdict calls
+    the write-up "not fully rigorous" because of them; a verdict that also
+    mentions gaps or errors; or a finding with no classification).
+    """
+    if not text:
+        return None
+    verdict, findings = _verdict_section(text)
+    if not verdict:
+        return None
+
+    if _GAP.search(verdict) and not _CRITICAL.search(verdict):
+        verdict = _NOT_RIGOROUS.sub(" ", verdict)
+
+    lines = [_NEGATED_ISSUES.sub(" ", line) for line in findings.splitlines()]
+    issues = [line for line in lines if _CRITICAL.search(line) or _GAP.search(line) or _ISSUE_LINE.match(line)]
+
+    if _FAIL_VERDICT.search(verdict) or any(_CRITICAL.search(line) for line in issues):
+        return False
+    if _CONCERN.search(verdict) or issues:
+        return None
+    if _PASS_VERDICT.search(verdict):
+        return True
+    return None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Test script to verify the asyncio HTTP pool against the mock server (keep-alive, chunked bodies, limits, proxies)."""
+
+import os
+import sys
+import json
+import asyncio
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import api_client
+import mock_server
+
+GEMINI_PATH = "/v1beta/models/gemini-2.5-pro:generateContent"
+PAYLOAD = {"contents": [{"role": "user", "parts": [{"text": "Solve it."}]}]}
+HEADERS = {"Content-Type": "application/json"}
+
+
+def _post(pool, url, payload=PAYLOAD):
+    return pool.request("POST", url, HEADERS, json.dumps(payload).encode("utf-8"), timeout=10)
+
+
+def test_keep_alive_and_chunked_bodies():
+    server = mock_server.start_server(latency="0")
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    async def run():
+        pool = api_client.AsyncHTTPPool(pool_maxsize=4)
+        try:
+            for _ in range(3):
+                response = await _post(pool, base + GEMINI_PATH)
+                assert response.status_code == 200 and "candidates" in response.json()
+            # The SSE stream of agent_gpt_oss.py is chunked
+            stream = await _post(pool, base + "/v1/chat/completions", dict(PAYLOAD, stream=True))
+            assert stream.text.endswith("data: [DONE]\n\n") and "chat.completion.chunk" in stream.text
+            return pool.connection_counts()
+        finally:
+            pool.close()
+
+    try:
+        assert asyncio.run(run()) == (1, 4)
+    finally:
+        server.shutdown()
+
+
+def test_connections_are_capped_at_pool_maxsize():
+    server = mock_server.start_server(latency="0.2")
+    url = f"http://127.0.0.1:{server.server_port}{GEMINI_PATH}"
+
+    async def run():
+        pool = api_client.AsyncHTTPPool(pool_maxsize=2)
+        try:
+            responses = await asyncio.gather(*(_post(pool, url) for _ in range(6)))
+            assert all(response.status_code == 200 for response in responses)
+            return pool.num_connections
+        finally:
+            pool.close()
+
+    try:
+        assert asyncio.run(run()) == 2
+        assert server.llm.snapshot()["max_in_flight"] == 2
+    finally:
+        server.shutdown()
+
+
+def test_body_size_limit_without_content_length():
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\n" + b"x" * 5000)
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+        try:
+            response = await api_client.AsyncHTTPPool().request("GET", url, {}, timeout=10)
+            assert response.content == b"x" * 5000
+            try:
+                await api_client.AsyncHTTPPool(max_body=1000).request("GET", url, {}, timeout=10)
+            except api_client.ResponseTooLarge:
+                pass
+            else:
+                raise AssertionError("expected ResponseTooLarge")
+        finally:
+            server.close()
+
+    asyncio.run(run())
+
+
+def test_malformed_status_line_is_a_connection_error():
+    responses = [b"garbage\r\n\r\n", b"HTTP/1.1\r\n\r\n", b"HTTP/1.1 20x OK\r\n\r\n"]
+
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(responses.pop(0))
+        await writer.drain()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+        pool = api_client.AsyncHTTPPool()
+        try:
+            for _ in range(3):
+                try:
+                    await pool.request("GET", url, {}, timeout=10)
+                except requests.exceptions.ConnectionError as e:
+                    assert "Malformed status line" in str(e)
+                else:
+                    raise AssertionError("expected ConnectionError")
+            # Each broken connection was dropped instead of going back to the pool
+            assert pool.connection_counts() == (3, 3) and not any(pool._idle.values())
+        finally:
+            pool.close()
+            server.close()
+
+    asyncio.run(run())
+
+
+def test_proxied_requests_go_through_requests():
+    # The mock server routes by path, so it can stand in for a forward proxy
+    server = mock_server.start_server(latency="0")
+    saved = {name: os.environ.pop(name, None) for name in ("http_proxy", "HTTP_PROXY", "no_proxy", "NO_PROXY")}
+    os.environ["http_proxy"] = f"http://127.0.0.1:{server.server_port}"
+    try:
+        response = asyncio.run(api_client.post_async("proxy-test", "http://llm.invalid" + GEMINI_PATH, HEADERS, PAYLOAD))
+        assert response.status_code == 200 and "candidates" in response.json()
+        assert server.llm.snapshot()["by_format"] == {"gemini": 1}
+    finally:
+        os.environ.pop("http_proxy")
+        os.environ.update({name: value for name, value in saved.items() if value is not None})
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_keep_alive_and_chunked_bodies()
+    test_connections_are_capped_at_pool_maxsize()
+    test_body_size_limit_without_content_length()
+    test_malformed_status_line_is_a_connection_error()
+    test_proxied_requests_go_through_requests()
+    print("All tests passed!")
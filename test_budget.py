@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Test script to verify token and cost budgets (pricing, agent budgets, downgrades, stopping the agent loop, the sweep ledger)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import budget
+import mock_server
+from usage import record_usage, parse_prices
+
+
+def _gemini(prompt, output, thoughts):
+    return {"usageMetadata": {"promptTokenCount": prompt, "candidatesTokenCount": output,
+                              "thoughtsTokenCount": thoughts, "totalTokenCount": prompt + output + thoughts}}
+
+
+def test_cost_counts_thinking_tokens_as_output():
+    usage = record_usage(_gemini(1_000_000, 100_000, 900_000), "gemini-2.5-pro")
+    # $1.25 per million prompt tokens, $10 per million output tokens including thoughts
+    assert usage["output_tokens"] == 1_000_000
+    assert abs(usage["cost"] - 11.25) < 1e-9
+    assert record_usage(_gemini(10, 10, 10), "unknown-model")["cost"] == 0.0
+    assert parse_prices("m1=1/2, m2=3") == {"m1": (1.0, 2.0), "m2": (3.0, 3.0)}
+
+
+def test_budget_downgrades_then_stops():
+    run_budget = budget.Budget(max_tokens=1000, downgrade_model="cheap")
+    with run_budget:
+        budget.check_budget()
+        assert budget.budget_model("big") == "big"
+        record_usage(_gemini(500, 200, 100))
+        # 800 of 1000 tokens reaches the default downgrade point
+        assert budget.budget_model("big") == "cheap"
+        budget.check_budget()
+        record_usage(_gemini(150, 50, 0))
+        try:
+            budget.check_budget()
+        except budget.BudgetExceeded:
+            pass
+        else:
+            raise AssertionError("expected BudgetExceeded")
+    # Outside the block no budget applies
+    budget.check_budget()
+    assert budget.budget_model("big") == "big"
+    assert run_budget.as_dict()["downgraded_after"] == 1
+
+
+def test_agent_loop_stops_when_budget_is_exhausted():
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ.setdefault("XAI_API_KEY", "test")
+    for name, path in (("agent_oai", "/v1/responses"), ("agent_xai", "/v1/chat/completions"),
+                       ("agent_gpt_oss", "/v1/chat/completions")):
+        module = __import__(name)
+        server = mock_server.start_server(latency="0", verdicts="fail")
+        module.API_URL = f"http://127.0.0.1:{server.server_port}{path}"
+        try:
+            # A run that never passes verification ends after 10 failed iterations
+            meter = budget.Budget()
+            with meter:
+                assert module.agent("Problem") is None
+            calls = server.llm.snapshot()["requests"]
+
+            # With half of its tokens the run stops in the correction loop instead of retrying iterations
+            run_budget = budget.Budget(max_tokens=meter.total_tokens // 2)
+            try:
+                with run_budget:
+                    module.agent("Problem")
+            except budget.BudgetExceeded:
+                pass
+            else:
+                raise AssertionError(f"{name}: expected BudgetExceeded")
+            assert run_budget.exceeded() and run_budget.calls < calls
+            assert server.llm.snapshot()["requests"] == calls + run_budget.calls
+        finally:
+            server.shutdown()
+
+
+def test_ledger_allocates_what_is_left():
+    ledger = budget.BudgetLedger(agent={"tokens": 600}, problem={"tokens": 1000}, run={"cost": 2.0},
+                                 downgrade_model="cheap")
+    assert ledger.allocate(0) == {"downgrade_model": "cheap", "max_tokens": 600, "max_cost": 2.0, "downgrade_at": 0.8}
+    ledger.charge(0, {"total_tokens": 700, "cost": 0.5})
+    # 300 tokens are left of problem 0, whose downgrade point (800) is 100 of them away
+    limits = ledger.allocate(0)
+    assert limits["max_tokens"] == 300 and limits["max_cost"] == 1.5
+    assert abs(limits["downgrade_at"] - 1 / 3) < 1e-3
+    assert ledger.exhausted(0) is None
+    ledger.charge(0, {"total_tokens": 300, "cost": 0.5})
+    assert ledger.exhausted(0) == "problem" and ledger.allocate(0) is None
+    assert ledger.as_dict()["problems"][0] == {"tokens": 1000, "cost": 1.0}
+
+
+def test_running_attempts_hold_their_budget():
+    ledger = budget.BudgetLedger(run={"cost": 2.0})
+    assert ledger.allocate(0, agent_id=0)["max_cost"] == 2.0
+    # The first attempt holds the whole run budget until it is charged
+    assert ledger.allocate(1, agent_id=1) == budget.WAIT
+    ledger.charge(0, {"total_tokens": 10, "cost": 1.5}, agent_id=0)
+    assert ledger.allocate(1, agent_id=1)["max_cost"] == 0.5
+    ledger.release(1)
+    ledger.charge(1, {"total_tokens": 10, "cost": 0.5})
+    assert ledger.exhausted(2) == "run" and ledger.allocate(2) is None
+
+
+def test_concurrent_attempts_share_the_ceilings():
+    ledger = budget.BudgetLedger(problem={"tokens": 1000}, run={"cost": 2.0})
+    # Two problems with four attempts each, run four at a time
+    queue = [0, 1] * 4
+    limits = []
+    for agent_id in range(4):
+        problem = queue.pop(0)
+        limits.append(ledger.allocate(problem, agent_id, ledger.sharing(problem, queue + [0, 1][:agent_id], 4)))
+    # None of them waits; each holds a quarter of the run and of its problem's ceiling
+    assert budget.WAIT not in limits
+    assert [(l["max_tokens"], l["max_cost"]) for l in limits] == [(250, 0.5)] * 4
+    # A finished attempt frees what it did not spend: its successor gets a third of the 900 tokens left of
+    # problem 0 (three attempts share them), and the $0.40 of the run that the others do not hold
+    ledger.charge(0, {"total_tokens": 100, "cost": 0.1}, agent_id=0)
+    problem = queue.pop(0)
+    limits = ledger.allocate(problem, 4, ledger.sharing(problem, queue + [1, 0, 1], 4))
+    assert limits["max_tokens"] == 300 and limits["max_cost"] == 0.4
+    # Without sharing, one attempt takes all that is left
+    ledger = budget.BudgetLedger(run={"cost": 2.0})
+    assert ledger.allocate(0, agent_id=0)["max_cost"] == 2.0 and ledger.allocate(1, agent_id=1) == budget.WAIT
+
+
+if __name__ == "__main__":
+    test_cost_counts_thinking_tokens_as_output()
+    test_budget_downgrades_then_stops()
+    test_agent_loop_stops_when_budget_is_exhausted()
+    test_ledger_allocates_what_is_left()
+    test_running_attempts_hold_their_budget()
+    test_concurrent_attempts_share_the_ceilings()
+    print("All tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Test script to verify per-call metrics records (phases, retries, rollup per agent and per run)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import checkpoint
+import call_metrics
+
+
+def _response(prompt, output):
+    return {"usage": {"prompt_tokens": prompt, "completion_tokens": output, "total_tokens": prompt + output}}
+
+
+def _call(source, response_data=None, error=None, retries=0):
+    call_metrics.start_call("openai", "gpt-5")
+    for _ in range(retries):
+        call_metrics.note_retry(1.5)
+        call_metrics.note_attempt()
+    call_metrics.note_first_byte()
+    return call_metrics.finish_call(source, response_data, error)
+
+
+def test_records_carry_phase_tokens_and_retries():
+    calls = call_metrics.CallLog()
+    with calls:
+        checkpoint.set_state(run=0, iteration=0, phase="init")
+        _call("api", _response(100, 20), retries=2)
+        checkpoint.set_state(phase="verify")
+        _call("api", _response(300, 40))
+        _call("cache", _response(300, 40))
+        _call("api", error=RuntimeError("boom"))
+    # Outside the block nothing is collected, and nothing is recorded without start_call()
+    _call("api", _response(1, 1))
+    assert call_metrics.finish_call("api", _response(1, 1)) is None
+
+    first = calls.records[0]
+    assert first["phase"] == "init" and first["model"] == "gpt-5" and first["provider"] == "openai"
+    assert first["prompt_tokens"] == 100 and first["retries"] == 2 and first["retry_wait"] == 3.0
+    assert first["ttfb"] is not None and first["cost"] > 0
+
+    phases = calls.phases()
+    assert list(phases) == ["init", "verify"]
+    verify = phases["verify"]
+    # Cache hits cost nothing and errors carry no tokens
+    assert verify["calls"] == 3 and verify["api_calls"] == 2 and verify["errors"] == 1
+    assert verify["prompt_tokens"] == 300 and verify["ttfb_calls"] == 3
+
+
+def test_merge_adds_up_agents_in_phase_order():
+    a = {"verify": dict(call_metrics._new_row(), calls=2, latency=3.0, max_latency=2.0, cost=0.5),
+         "init": dict(call_metrics._new_row(), calls=1, latency=1.0, max_latency=1.0)}
+    b = {"verify": dict(call_metrics._new_row(), calls=1, latency=4.0, max_latency=4.0, cost=0.25)}
+    run = call_metrics.merge([a, None, b])
+    assert list(run) == ["init", "verify"]
+    assert run["verify"]["calls"] == 3 and run["verify"]["latency"] == 7.0
+    assert run["verify"]["max_latency"] == 4.0 and run["verify"]["cost"] == 0.75
+    lines = call_metrics.format_table(run)
+    assert len(lines) == 3 and lines[2].startswith("verify")
+
+
+if __name__ == "__main__":
+    test_records_carry_phase_tokens_and_retries()
+    test_merge_adds_up_agents_in_phase_order()
+    print("All tests passed!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Test script to verify cassette record/replay (sample order, recorded errors, misses)."""
+
+import os
+import sys
+import tempfile
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import cassette
+import mock_server
+import response_cache
+
+
+def _verify_payload(text):
+    return {"contents": [{"role": "user", "parts": [{"text": f"{text}\n### Verification Task Reminder ###"}]}]}
+
+
+def test_record_and_replay_round_trip():
+    import agent
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run.cassette")
+        server = mock_server.start_server(latency="0", verdicts="pass,fail")
+        os.environ.setdefault("GOOGLE_API_KEY", "test")
+        agent.API_URL = f"http://127.0.0.1:{server.server_port}/v1beta/models/{agent.MODEL_NAME}:generateContent"
+        try:
+            cassette.configure_cassette(path, "record")
+            response_cache.use_cache_namespace("")
+            recorded = [agent.send_api_request("test", _verify_payload("Solution")) for _ in range(2)]
+            assert cassette.cassette_stats()["recorded"] == 2
+        finally:
+            cassette.close_cassette()
+            server.shutdown()
+        assert "Critical Error" not in agent.extract_text_from_response(recorded[0])
+        assert "Critical Error" in agent.extract_text_from_response(recorded[1])
+
+        # Offline: the same calls get the recorded samples back in order
+        cassette.configure_cassette(path, "replay", speed=0)
+        response_cache.use_cache_namespace("")
+        try:
+            assert [agent.send_api_request("test", _verify_payload("Solution")) for _ in range(2)] == recorded
+            # A call past the recording falls back to the recorded samples of the same request
+            assert agent.send_api_request("test", _verify_payload("Solution")) == recorded[0]
+            assert cassette.cassette_stats() == {"mode": "replay", "recorded": 0, "replayed": 3, "misses": 0}
+        finally:
+            cassette.close_cassette()
+
+
+def test_replay_miss_and_recorded_errors():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run.cassette")
+        cassette.configure_cassette(path, "record")
+        response_cache.use_cache_namespace("")
+        cassette.record("gemini", "url", _verify_payload("A"), 0.0,
+                        error=requests.exceptions.ConnectionError("connection reset"))
+        cassette.close_cassette()
+
+        cassette.configure_cassette(path, "replay", speed=0)
+        response_cache.use_cache_namespace("")
+        try:
+            try:
+                cassette.replay("gemini", "url", _verify_payload("A"))
+            except requests.exceptions.ConnectionError as e:
+                assert str(e) == "connection reset"
+            else:
+                raise AssertionError("expected the recorded ConnectionError")
+            try:
+                cassette.replay("gemini", "url", _verify_payload("B"))
+            except cassette.CassetteMiss:
+                pass
+            else:
+                raise AssertionError("expected CassetteMiss")
+            assert cassette.cassette_stats()["misses"] == 1
+        finally:
+            cassette.close_cassette()
+
+
+if __name__ == "__main__":
+    test_record_and_replay_round_trip()
+    test_replay_miss_and_recorded_errors()
+    print("All tests passed!")
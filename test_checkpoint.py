@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Test script to verify the checkpoint journal (torn last line, replay by digest and slot)."""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import checkpoint
+import response_cache
+
+
+def _payload(text):
+    return {"contents": [{"role": "user", "parts": [{"text": text}]}]}
+
+
+def _call(text, response_data):
+    """Runs one call through the journal; returns (response, replayed)."""
+    ticket, journaled = checkpoint.replay_call("gemini", "url", _payload(text))
+    if journaled is not None:
+        return journaled, True
+    return checkpoint.record_call(ticket, "gemini", _payload(text), response_data), False
+
+
+def test_torn_line_is_dropped_and_calls_replay_by_slot():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agent.journal")
+        journal = checkpoint.Journal(path)
+        checkpoint.use_journal(journal)
+        response_cache.use_cache_namespace("")
+        checkpoint.set_state(phase="verify")
+        assert _call("verify", {"n": 0}) == ({"n": 0}, False)
+        # Two samples of one prompt, the second answered first (as in a fan-out)
+        tickets = [checkpoint.replay_call("gemini", "url", _payload("confirm"))[0] for _ in range(2)]
+        checkpoint.record_call(tickets[1], "gemini", _payload("confirm"), {"n": 2})
+        checkpoint.record_call(tickets[0], "gemini", _payload("confirm"), {"n": 1})
+        journal.close()
+        complete_size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(b'{"seq": 3, "digest": "')  # killed mid-write
+
+        journal = checkpoint.Journal(path)
+        assert journal.loaded == 3 and os.path.getsize(path) == complete_size
+        checkpoint.use_journal(journal)
+        response_cache.use_cache_namespace("")
+        assert _call("verify", None) == ({"n": 0}, True)
+        assert _call("confirm", None) == ({"n": 1}, True)
+        assert _call("confirm", None) == ({"n": 2}, True)
+        # The first call that was never answered goes live and is journaled after the others
+        assert _call("confirm", {"n": 3}) == ({"n": 3}, False)
+        journal.close()
+        checkpoint.use_journal(None)
+        checkpoint._state.set({})
+
+        with open(path, "rb") as f:
+            entries = [json.loads(line) for line in f]
+        assert [e["seq"] for e in entries] == [0, 1, 2, 3]
+        assert [e["slot"] for e in entries] == [0, 1, 0, 2]
+        assert entries[0]["state"]["phase"] == "verify"
+
+
+if __name__ == "__main__":
+    test_torn_line_is_dropped_and_calls_replay_by_slot()
+    print("All tests passed!")
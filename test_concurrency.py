@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Test script to verify the AIMD concurrency controller (growth, backoff, latency spikes, gating)."""
+
+import os
+import sys
+import time
+import threading
+import contextvars
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import checkpoint
+import concurrency
+
+
+def _controller(**options):
+    config = dict(concurrency.DEFAULT_CONCURRENCY_CONFIG, max_limit=16)
+    config.update(options)
+    return concurrency.AIMDController("test", config)
+
+
+def test_limit_grows_only_while_in_use():
+    # Sub-millisecond test latencies are too noisy for spike detection
+    controller = _controller(initial_limit=2, spike_factor=1e9)
+    # One request at a time never uses a limit of 2
+    for _ in range(20):
+        controller.release(controller.acquire(), None)
+    assert controller.limit == 2
+    # Two at a time fill the limit, which grows until it is no longer in use
+    for _ in range(10):
+        first, second = controller.acquire(), controller.acquire()
+        controller.release(first, None)
+        controller.release(second, None)
+    assert 3 <= controller.limit < 4
+    assert controller.as_dict()["increases"] == 1
+
+
+def test_rate_limit_halves_once_per_window():
+    controller = _controller(initial_limit=8, spike_factor=1e9)
+    started = [controller.acquire() for _ in range(4)]
+    time.sleep(0.01)
+    # Four 429s from requests sent before the first decrease: one decrease
+    for ticket in started:
+        controller.release(ticket, "rate_limit")
+    assert controller.limit == 4
+    controller.release(controller.acquire(), "rate_limit")
+    assert controller.limit == 2
+    assert controller.as_dict()["decreases"] == {"rate_limit": 2, "latency": 0}
+
+
+def test_latency_spike_backs_off():
+    controller = _controller(initial_limit=8)
+    now = time.time()
+    for _ in range(5):
+        controller.acquire()
+        controller.release(now - 0.1, None)
+    limit = controller.limit
+    controller.acquire()
+    controller.release(time.time() - 1.0, None)
+    assert controller.limit == limit / 2
+    assert controller.as_dict()["decreases"]["latency"] == 1
+
+
+def test_mixed_length_calls_are_not_spikes():
+    controller = _controller(initial_limit=8)
+
+    def call(phase, seconds):
+        checkpoint.set_state(phase=phase)
+        controller.acquire()
+        controller.release(time.time() - seconds, None)
+
+    def run():
+        # Minute-long generations between second-long yes/no checks are healthy
+        for _ in range(5):
+            call("check_verification", 1.0)
+            call("generate", 60.0)
+            call("check_verification", 1.2)
+        assert controller.as_dict()["decreases"]["latency"] == 0
+        # A check ten times slower than the other checks still is a spike
+        call("check_verification", 10.0)
+        assert controller.as_dict()["decreases"]["latency"] == 1
+
+    contextvars.copy_context().run(run)
+    assert set(controller.as_dict()["latency_avg"]) == {"check_verification None", "generate None"}
+
+
+def test_acquire_waits_for_a_free_slot():
+    controller = _controller(initial_limit=1, spike_factor=1e9)
+    ticket = controller.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (controller.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    controller.release(ticket, "cancelled")
+    assert acquired.wait(1.0)
+    thread.join()
+    assert controller.as_dict()["queued"] == 1 and controller.as_dict()["errors"] == 0
+
+
+if __name__ == "__main__":
+    test_limit_grows_only_while_in_use()
+    test_rate_limit_halves_once_per_window()
+    test_latency_spike_backs_off()
+    test_mixed_length_calls_are_not_spikes()
+    test_acquire_waits_for_a_free_slot()
+    print("All tests passed!")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Test script to verify the event log and its content-addressed blob store."""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import events
+import checkpoint
+
+
+def test_blob_store_writes_each_text_once():
+    text = "A long solution. " * 40
+    with tempfile.TemporaryDirectory() as tmp:
+        store = events.BlobStore(tmp)
+        digest = store.put(text)
+        assert store.put(text) == digest
+        assert store.stats()["stored"] == 1 and store.stats()["reused"] == 1
+        assert os.path.exists(os.path.join(tmp, digest[:2], digest + ".gz"))
+        # A second store on the same directory (another process) finds the blob on disk
+        other = events.BlobStore(tmp)
+        assert other.put(text) == digest and other.stats() == {"stored": 0, "reused": 1, "bytes_written": 0}
+        assert events.load_blob(tmp, digest) == text
+        assert not [name for _, _, names in os.walk(tmp) for name in names if name.endswith(".tmp")]
+
+
+def test_event_log_writes_state_and_blob_references():
+    solution = "Step " * 100
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agent.events")
+        event_log = events.EventLog(path)
+        events.use_event_log(event_log)
+        try:
+            checkpoint.set_state(run=0, phase="verify")
+            events.emit("verification", verdict="pass", solution=solution, notes=["short", solution])
+            events.emit("run_result", solved=True)
+            assert event_log.stats()["events"] == 2 and event_log.stats()["stored"] == 1
+        finally:
+            events.use_event_log(None)
+            event_log.close()
+            checkpoint._state.set({})
+        # Without an event log nothing is written and dumps are in full
+        events.emit("ignored")
+        assert events.dump(solution) == json.dumps(solution, indent=4)
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert [r["event"] for r in records] == ["verification", "run_result"]
+        first = records[0]
+        assert first["run"] == 0 and first["phase"] == "verify" and first["verdict"] == "pass"
+        ref = first["solution"]
+        assert ref["chars"] == len(solution) and ref["bytes"] == len(json.dumps(solution))
+        assert first["notes"] == ["short", ref]
+        assert events.load_blob(os.path.join(tmp, "blobs"), ref["blob"]) == solution
+
+
+if __name__ == "__main__":
+    test_blob_store_writes_each_text_once()
+    test_event_log_writes_state_and_blob_references()
+    print("All tests passed!")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Test script to verify fan-out calls (cancellation, first-to-pass selection, confirmations, correction branches)."""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import fanout
+import mock_server
+from fanout import FanOut, first_to_pass
+
+
+def _after(delay, value):
+    def call(branch, stop):
+        time.sleep(delay)
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return call
+
+
+def _race(branches):
+    return first_to_pass(lambda branch, stop: branches[branch](branch, stop), len(branches), lambda r: r == "pass")
+
+
+def test_cancelled_calls_make_no_more_api_calls():
+    release = threading.Event()
+    outcome = []
+
+    def slow():
+        release.wait(5)
+        try:
+            fanout.check_cancelled()
+            outcome.append("called")
+        except fanout.BranchCancelled:
+            outcome.append("cancelled")
+
+    with FanOut([lambda: "fast", slow]) as results:
+        assert next(iter(results)) == (0, "fast")
+    release.set()
+    for _ in range(100):
+        if outcome:
+            break
+        time.sleep(0.01)
+    assert outcome == ["cancelled"]
+    # Outside any fan-out nothing is cancelled
+    fanout.check_cancelled()
+
+
+def test_first_to_pass_picks_the_first_passing_branch():
+    result, records = _race([_after(0.3, "pass"), _after(0.0, "fail"), _after(0.1, "pass")])
+    assert result == "pass"
+    assert [record["status"] for record in records] == ["cancelled", "failed", "passed"]
+
+
+def test_losing_branches_are_cancelled():
+    verified = []
+
+    def attempt(branch, stop):
+        if branch == 1:
+            time.sleep(0.1)
+            # A losing branch that finished its correction does not go on to verify it
+            fanout.check_cancelled()
+            verified.append(branch)
+        return "pass"
+
+    result, records = first_to_pass(attempt, 2, lambda r: r == "pass")
+    time.sleep(0.3)
+    assert result == "pass" and verified == []
+    assert [record["status"] for record in records] == ["passed", "cancelled"]
+
+
+def test_first_to_pass_keeps_the_first_result_when_none_passes():
+    result, records = _race([_after(0.1, "late"), _after(0.0, "early"), _after(0.05, RuntimeError("boom"))])
+    assert result == "early"
+    assert [record["status"] for record in records] == ["failed", "failed", "error"]
+    assert records[2]["error"] == "boom"
+
+
+def test_first_to_pass_raises_when_every_branch_raises():
+    try:
+        _race([_after(0.0, ValueError("first")), _after(0.05, ValueError("last"))])
+    except ValueError as e:
+        assert str(e) == "last"
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def _agent_with_mock(**config):
+    import agent
+    server = mock_server.start_server(latency="0", **config)
+    os.environ.setdefault("GOOGLE_API_KEY", "test")
+    agent.API_URL = f"http://127.0.0.1:{server.server_port}/v1beta/models/{agent.MODEL_NAME}:generateContent"
+    return agent, server
+
+
+def test_confirm_solution_counts_passes_and_stops_at_a_failure():
+    agent, server = _agent_with_mock(verdicts="pass")
+    try:
+        passed, _, good_verify = agent.confirm_solution("Problem", "Solution", 3)
+        assert passed == 3 and good_verify == "yes"
+    finally:
+        server.shutdown()
+    agent, server = _agent_with_mock(verdicts="fail")
+    try:
+        passed, verify, good_verify = agent.confirm_solution("Problem", "Solution", 3)
+        assert passed == 0 and good_verify == "no" and "Critical Error" in verify
+    finally:
+        server.shutdown()
+
+
+def test_branch_corrections_continues_with_a_corrected_solution():
+    agent, server = _agent_with_mock(verdicts="fail")
+    try:
+        solution, verify, good_verify = agent.branch_corrections("Problem", [], "Solution", "Bug report", 3)
+        # No branch passes: the first corrected solution is kept with its failing verification
+        assert "Detailed Solution" in solution and good_verify == "no"
+        assert server.llm.snapshot()["by_kind"] == {"generate": 3, "verify_fail": 3}
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_cancelled_calls_make_no_more_api_calls()
+    test_first_to_pass_picks_the_first_passing_branch()
+    test_losing_branches_are_cancelled()
+    test_first_to_pass_keeps_the_first_result_when_none_passes()
+    test_first_to_pass_raises_when_every_branch_raises()
+    test_confirm_solution_counts_passes_and_stops_at_a_failure()
+    test_branch_corrections_continues_with_a_corrected_solution()
+    print("All tests passed!")
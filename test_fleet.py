@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Test script to verify the fleet coordinator (job hand-out, cancellation, re-queueing, TCP protocol)."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import budget
+import fleet
+import sweep_manifest
+
+# Two problems with two attempts each, attempt-major like a sweep
+JOBS = [(0, 0, 0), (2, 1, 0), (1, 0, 1), (3, 1, 1)]
+
+
+def _coordinator(tmp):
+    manifest = sweep_manifest.SweepManifest(os.path.join(tmp, "sweep_manifest.json"), {}, JOBS)
+    return fleet.Coordinator(manifest, tmp, {"agent_file": "agent.py"}, heartbeat_timeout=0.0)
+
+
+def test_solved_problem_cancels_and_skips_siblings():
+    with tempfile.TemporaryDirectory() as tmp:
+        coordinator = _coordinator(tmp)
+        coordinator.register("a")
+        coordinator.register("b")
+        assert coordinator.pull("a")["agent_id"] == 0
+        assert coordinator.pull("b")["agent_id"] == 2
+        assert coordinator.pull("b")["agent_id"] == 1
+        status, _ = coordinator.report("a", 0, 0, "", {"solved": True})
+        assert status.startswith("SOLVED")
+        # Agent 1 works on the solved problem 0 and must stop
+        assert coordinator.heartbeat("b", [2, 1]) == [1]
+        coordinator.report("b", 1, -1, "Agent 1 cancelled", None)
+        assert coordinator.manifest.jobs[1]["state"] == sweep_manifest.CANCELLED
+        assert coordinator.pull("a")["agent_id"] == 3
+        assert not coordinator.finished()
+        coordinator.report("b", 2, 0, "", {"solved": False})
+        coordinator.report("a", 3, 0, "", {"solved": False})
+        assert coordinator.finished()
+        assert coordinator.manifest.jobs[0]["result"] == "agent_00.result.json"
+
+
+def test_lost_worker_jobs_are_queued_again_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        coordinator = _coordinator(tmp)
+        coordinator.register("a")
+        coordinator.pull("a")
+        coordinator.pull("a")
+        # A heartbeat timeout of 0 drops every worker on the next reap
+        coordinator.reap()
+        assert coordinator.requeued == 2
+        assert [job[0] for job in coordinator.queue] == [0, 2, 1, 3]
+        assert coordinator.manifest.jobs[0]["state"] == sweep_manifest.PENDING
+        # Late results from the dropped worker are ignored
+        assert coordinator.report("a", 0, 0, "", {"solved": True}) is None
+
+
+def test_jobs_share_the_budget_of_a_busy_fleet():
+    with tempfile.TemporaryDirectory() as tmp:
+        coordinator = _coordinator(tmp)
+        coordinator.ledger = budget.BudgetLedger(run={"cost": 2.0})
+        coordinator.register("a", slots=3)
+        # All three slots get a job and a third of the run budget; none of them waits
+        jobs = [coordinator.pull("a") for _ in range(3)]
+        assert [job["agent_id"] for job in jobs] == [0, 2, 1]
+        assert [job["budget"]["max_cost"] for job in jobs] == [0.666667, 0.666667, 0.666666]
+
+
+def test_reaped_worker_that_keeps_talking_is_refused():
+    with tempfile.TemporaryDirectory() as tmp:
+        coordinator = _coordinator(tmp)
+        coordinator.register("a")
+        assert coordinator.pull("a")["agent_id"] == 0
+        coordinator.reap()
+        # The reaped worker gets no more jobs and must stop the agents it still runs
+        assert coordinator.pull("a") is None
+        assert coordinator.heartbeat("a", [0]) == [0]
+        assert coordinator.report("a", 0, 0, "", {"solved": False}) is None
+        # A job still assigned to a forgotten worker is queued again when it disconnects
+        coordinator.register("b")
+        assert coordinator.pull("b")["agent_id"] == 0
+        coordinator.workers.pop("b")
+        coordinator.drop_worker("b", "disconnected")
+        assert not coordinator.assigned and coordinator.queue[0][0] == 0
+
+        # Over TCP, the dropped worker is told so and disconnected, and its job goes to another worker
+        coordinator.heartbeat_timeout = 60.0
+        server = fleet.start_coordinator(coordinator)
+        try:
+            address = f"127.0.0.1:{server.server_address[1]}"
+            client = fleet.CoordinatorClient(address, "c", 1)
+            assert client.request({"op": "pull"})["job"]["agent_id"] == 0
+            coordinator.heartbeat_timeout = 0.0
+            coordinator.reap()
+            try:
+                client.request({"op": "heartbeat", "jobs": [0]})
+            except ConnectionError as e:
+                assert "worker c was dropped" in str(e)
+            else:
+                raise AssertionError("expected ConnectionError")
+            client.close()
+            coordinator.heartbeat_timeout = 60.0
+            other = fleet.CoordinatorClient(address, "d", 1)
+            for agent_id in (0, 2, 1, 3):
+                assert other.request({"op": "pull"})["job"]["agent_id"] == agent_id
+                other.request({"op": "result", "agent_id": agent_id, "return_code": 0, "error": "",
+                               "record": {"solved": False}})
+            assert other.request({"op": "pull"}) == {"job": None, "finished": True}
+            assert coordinator.finished()
+            other.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def test_protocol_over_tcp():
+    with tempfile.TemporaryDirectory() as tmp:
+        coordinator = _coordinator(tmp)
+        coordinator.heartbeat_timeout = 60.0
+        server = fleet.start_coordinator(coordinator)
+        try:
+            client = fleet.CoordinatorClient(f"127.0.0.1:{server.server_address[1]}", "w", 1)
+            job = client.request({"op": "pull"})["job"]
+            assert job["agent_id"] == 0 and job["agent_file"] == "agent.py"
+            assert client.request({"op": "heartbeat", "jobs": [0]}) == {"cancel": []}
+            client.request({"op": "result", "agent_id": 0, "return_code": 0, "error": "", "record": {"solved": False}})
+            assert coordinator.manifest.jobs[0]["state"] == sweep_manifest.UNSOLVED
+            client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    test_solved_problem_cancels_and_skips_siblings()
+    test_lost_worker_jobs_are_queued_again_first()
+    test_jobs_share_the_budget_of_a_busy_fleet()
+    test_reaped_worker_that_keeps_talking_is_refused()
+    test_protocol_over_tcp()
+    print("All tests passed!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Test script to verify the live metrics collector (merging pushes, stale in-flight requests, Prometheus text)."""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import live_metrics
+
+
+def _push(pid, in_flight, attempts, rate_limited, latencies, passed, failed):
+    buckets = [0] * len(live_metrics.LATENCY_BUCKETS)
+    for latency in latencies:
+        buckets[next(i for i, bound in enumerate(live_metrics.LATENCY_BUCKETS) if latency <= bound)] += 1
+    counters = {"in_flight": in_flight, "attempts": attempts, "rate_limited": rate_limited,
+                "calls": len(latencies), "errors": 0, "tokens": 100 * len(latencies),
+                "latency_sum": sum(latencies), "latency_buckets": buckets}
+    return {"pid": pid, "providers": {"gemini": counters}, "verifications": {"pass": passed, "fail": failed}}
+
+
+def _value(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[-1])
+    raise AssertionError(f"{name} missing")
+
+
+def test_collector_merges_processes_and_drops_stale_in_flight():
+    # The collector adds this process's own counters; start them from zero whatever ran before
+    live_metrics._providers.clear()
+    live_metrics._verifications.update({"pass": 0, "fail": 0})
+    collector = live_metrics.MetricsCollector(status=lambda: (3, 5))
+    collector.tick()
+    collector.receive(_push(1, 2, 10, 1, [1.5] * 4, 3, 1))
+    collector.receive(_push(2, 1, 10, 3, [1.5] * 5 + [40.0], 0, 4))
+    # A process killed mid-request stops pushing; its counters stay, its requests in flight do not
+    collector._sources[3] = (time.time() - 60, _push(3, 4, 5, 0, [], 0, 0))
+    text = collector.render()
+
+    assert _value(text, "imo_agents_running") == 3 and _value(text, "imo_agents_queued") == 5
+    assert _value(text, 'imo_api_requests_in_flight{provider="gemini"}') == 3
+    assert _value(text, 'imo_api_attempts_total{provider="gemini"}') == 25
+    assert _value(text, 'imo_api_rate_limited_ratio{provider="gemini"}') == 0.16
+    assert _value(text, 'imo_api_calls_total{provider="gemini"}') == 10
+    assert _value(text, 'imo_api_call_latency_seconds_bucket{provider="gemini",le="+Inf"}') == 10
+    assert 1.0 < _value(text, 'imo_api_call_latency_quantile_seconds{provider="gemini",quantile="0.5"}') <= 2.0
+    assert 30.0 < _value(text, 'imo_api_call_latency_quantile_seconds{provider="gemini",quantile="0.99"}') <= 45.0
+    assert _value(text, "imo_verification_pass_ratio") == 0.375
+    assert "# TYPE imo_api_call_latency_seconds histogram" in text
+
+
+def test_quantile_interpolates_inside_buckets():
+    buckets = [0] * len(live_metrics.LATENCY_BUCKETS)
+    # Ten calls between 1s and 2s
+    buckets[3] = 10
+    assert live_metrics._quantile(0.5, buckets) == 1.5
+    assert live_metrics._quantile(0.5, [0] * len(buckets)) != live_metrics._quantile(0.5, [0] * len(buckets))
+
+
+if __name__ == "__main__":
+    test_collector_merges_processes_and_drops_stale_in_flight()
+    test_quantile_interpolates_inside_buckets()
+    print("All tests passed!")
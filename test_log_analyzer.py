@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Test script to verify the log analyzer (marker parsing, adapter detection, blob references, aggregation)."""
+
+import os
+import sys
+import math
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import events
+import log_analyzer
+
+# A run of agent_oai.py: init, one failed verdict, one correction, one passing verdict
+OAI_LOG = """Logging to file: agent_00.log
+
+
+>>>>>>>>>>>>>>>>>>>>>>>>>> Run 0 of 2 ...
+[2025-08-12 07:00:00] >>>>>> Initial prompt.
+{"input": "0123456789"}
+[2025-08-12 07:00:30] >>>>>> Response:
+{}
+[2025-08-12 07:00:30] >>>>>>> First solution: 
+[2025-08-12 07:00:30] >>>>>>> Self improvement start:
+[2025-08-12 07:00:50] >>>>>> Response:
+[2025-08-12 07:00:50] >>>>>>> Corrected solution: 
+[2025-08-12 07:00:50] >>>>>>> Vefify the solution.
+[2025-08-12 07:00:50] >>>>>>> Start verification.
+[2025-08-12 07:00:50] >>>>>>> Verification prompt:
+{"input": "abc"}
+[2025-08-12 07:01:30] >>>>>> Response:
+[2025-08-12 07:01:30] >>>>>>> Verification results:
+[2025-08-12 07:01:35] >>>>>>> Is verification good? (LLM check)
+"No"
+[2025-08-12 07:01:35] >>>>>>>Bug report:
+Number of iterations: 0, number of corrects: 1, number of errors: 0
+[2025-08-12 07:01:35] >>>>>>> Verification does not pass, correcting ...
+[2025-08-12 07:01:35] >>>>>>> New prompt:
+{"input": "0123456789abcdefghij"}
+[2025-08-12 07:02:35] >>>>>> Response:
+[2025-08-12 07:02:35] >>>>>>> Corrected solution:
+[2025-08-12 07:02:35] >>>>>>> Verify the solution.
+[2025-08-12 07:02:35] >>>>>>> Start verification.
+[2025-08-12 07:03:05] >>>>>>> Verification results:
+[2025-08-12 07:03:05] >>>>>>> Is verification good? (parsed from verdict)
+"yes"
+[2025-08-12 07:03:05] >>>>>>>Bug report:
+[2025-08-12 07:03:05] >>>>>>> Correct solution found.
+[2025-08-12 07:03:05] >>>>>>> Found a correct solution in run 0.
+[2025-08-12 07:03:05] >>>>>>> Phase stats: {"init": {"calls": 1, "prompt_tokens": 500, "output_tokens": 200, "cost": 0.01}, "verify": {"calls": 2, "prompt_tokens": 3000, "output_tokens": 900, "cost": 0.05}}
+"""
+
+# The Gemini run logs have neither timestamps nor response markers
+GEMINI_LOG = """Logging to file: agent_01.log
+
+
+>>>>>>>>>>>>>>>>>>>>>>>>>> Run 0 of 1 ...
+>>>>>> Initial prompt.
+{}
+>>>>>>> Start verification.
+>>>>>>> Is verification good?
+no
+Number of iterations: 0, number of corrects: 1, number of errors: 0
+>>>>>>> Failed in finding a correct solution.
+"""
+
+
+def _write(tmp, name, text):
+    with open(os.path.join(tmp, name), "w") as f:
+        f.write(text)
+
+
+def test_parse_log_reads_phases_verdicts_and_prompts():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write(tmp, "agent_00.log", OAI_LOG)
+        row, phases, verifications, prompts, calls = log_analyzer.parse_log(os.path.join(tmp, "agent_00.log"))
+    stats = dict(zip((name for name, _ in log_analyzer.LOG_COLUMNS), row))
+    assert log_analyzer.ADAPTERS[stats["adapter"]] == "openai"
+    assert stats["runs"] == 1 and stats["iterations"] == 1
+    assert stats["solved"] and stats["solved_run"] == 0 and stats["iterations_to_success"] == 1
+    assert stats["verifications"] == 2 and stats["passes"] == 1
+    assert stats["wall_time"] == 185.0
+    # Responses and prompt dumps stay inside their phase
+    assert stats["init_seconds"] == 30.0 and stats["self_improve_seconds"] == 20.0
+    assert stats["verify_seconds"] == 70.0 and stats["check_seconds"] == 5.0 and stats["correction_seconds"] == 60.0
+    assert list(verifications["passed"]) == [0, 1] and list(verifications["iteration"]) == [-1, 0]
+    assert list(verifications["seconds"]) == [45.0, 30.0]
+    assert [log_analyzer.VERDICT_SOURCES[n] for n in verifications["source"]] == ["llm", "parsed"]
+    assert list(calls["phase"]) == [0, 2] and list(calls["calls"]) == [1, 2] and list(calls["prompt_tokens"]) == [500, 3000]
+    assert list(prompts["kind"]) == [0, 2, 1]
+    assert list(prompts["bytes"]) == [len('\n{"input": "0123456789"}'), len('\n{"input": "abc"}'),
+                                      len('\n{"input": "0123456789abcdefghij"}')]
+
+
+def test_prompt_sizes_count_blob_references_at_full_size():
+    payload = {"contents": [{"role": "user", "parts": [{"text": "Prove that " * 100}, {"text": "short"}]}]}
+    with tempfile.TemporaryDirectory() as tmp:
+        event_log = events.EventLog(os.path.join(tmp, "agent_00.events"))
+        events.use_event_log(event_log)
+        try:
+            dumped = events.dump(payload)
+        finally:
+            events.use_event_log(None)
+            event_log.close()
+        assert '"blob"' in dumped and len(dumped) < len(events.dump(payload))
+        _write(tmp, "agent_00.log", f"Logging to file: agent_00.log\n>>>>>> Initial prompt.\n{dumped}\n")
+        prompts = log_analyzer.parse_log(os.path.join(tmp, "agent_00.log"))[3]
+    assert list(prompts["bytes"]) == [len("\n" + events.dump(payload) + "\n")]
+
+
+def test_analyze_aggregates_per_adapter():
+    with tempfile.TemporaryDirectory() as tmp:
+        _write(tmp, "agent_00.log", OAI_LOG)
+        _write(tmp, "agent_01.log", GEMINI_LOG)
+        _write(tmp, "agent_01.stdout", OAI_LOG)
+        archive = log_analyzer.analyze([tmp], jobs=1)
+    assert [os.path.basename(path) for path in archive.paths] == ["agent_00.log", "agent_01.log"]
+    assert list(archive.verifications["log"]) == [0, 0, 1]
+
+    aggregates = log_analyzer.aggregate(archive)
+    assert list(aggregates) == ["gemini", "openai", "all"]
+    gemini, everything = aggregates["gemini"], aggregates["all"]
+    assert gemini["solved"] == 0 and gemini["timed_logs"] == 0 and math.isnan(gemini["wall_time"]["mean"])
+    assert everything["solve_rate"] == 0.5 and everything["verifications"] == 3
+    assert everything["pass_after_fail"] == 1.0 and math.isnan(everything["pass_after_pass"])
+    assert everything["phases"]["verify"]["segments"] == 3 and everything["phases"]["verify"]["count"] == 2
+    assert log_analyzer.format_report(aggregates)[0].startswith("gemini: 1 logs")
+
+
+if __name__ == "__main__":
+    test_parse_log_reads_phases_verdicts_and_prompts()
+    test_prompt_sizes_count_blob_references_at_full_size()
+    test_analyze_aggregates_per_adapter()
+    print("All tests passed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Test script to verify the buffered log writer (batching, memory bound, flush on close)."""
+
+import io
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import log_writer
+
+
+class CountingStream(io.StringIO):
+    """Counts the batches it receives."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    def write(self, text):
+        self.batches += 1
+        return super().write(text)
+
+
+def test_close_writes_everything_in_order():
+    stream = CountingStream()
+    writer = log_writer.LogWriter(stream, close_stream=False)
+    for i in range(1000):
+        writer.write(f"line {i}\n")
+    writer.close()
+    assert stream.getvalue() == "".join(f"line {i}\n" for i in range(1000))
+    # Lines are batched instead of being written one by one
+    assert stream.batches < 10
+    writer.write("after close\n")
+    assert "after close" not in stream.getvalue()
+
+
+def test_buffer_is_bounded():
+    stream = CountingStream()
+    writer = log_writer.LogWriter(stream, close_stream=False)
+    line = "x" * 1023 + "\n"
+    for _ in range(2 * log_writer.MAX_BUFFER_CHARS // len(line)):
+        writer.write(line)
+        assert len(writer._chunks) * len(line) <= log_writer.MAX_BUFFER_CHARS
+    assert writer.overflows >= 1
+    writer.close()
+
+
+def test_concurrent_writers():
+    stream = CountingStream()
+    writer = log_writer.LogWriter(stream, close_stream=False)
+
+    def log(thread):
+        for i in range(2000):
+            writer.write(f"{thread} {i}\n")
+
+    threads = [threading.Thread(target=log, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 8000
+    for t in range(4):
+        mine = [line for line in lines if line.startswith(f"{t} ")]
+        assert mine == [f"{t} {i}" for i in range(2000)]
+
+
+if __name__ == "__main__":
+    test_close_writes_everything_in_order()
+    test_buffer_is_bounded()
+    test_concurrent_writers()
+    print("All tests passed!")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Test script to verify the mock LLM server (wire formats, verdict scripts, injected errors, capacity)."""
+
+import os
+import sys
+import json
+import random
+import threading
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import mock_server
+from usage import extract_usage
+
+VERIFY = "Check this proof.\n### Verification Task Reminder ###"
+
+
+def test_wire_formats_and_usage():
+    server = mock_server.start_server(latency="0", output_tokens=50, reasoning_tokens=7, verdicts="fail")
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        gemini = requests.post(f"{base}/v1beta/models/gemini-2.5-pro:generateContent",
+                               json={"contents": [{"role": "user", "parts": [{"text": "Solve it"}]}]}).json()
+        assert "Detailed Solution" in gemini["candidates"][0]["content"]["parts"][0]["text"]
+        assert extract_usage(gemini)["reasoning_tokens"] == 7
+
+        responses = requests.post(f"{base}/v1/responses", json={"input": VERIFY}).json()
+        assert "Critical Error" in responses["output"][0]["content"][0]["text"]
+        assert extract_usage(responses)["output_tokens"] == 50 + 7
+
+        chat = requests.post(f"{base}/v1/chat/completions", json={"messages": [
+            {"role": "user", "content": 'Critical Error - ... Response in "yes" or "no".'}]}).json()
+        assert chat["choices"][0]["message"]["content"] == "no"
+
+        # sglang-style SSE stream: content deltas, then a usage chunk and [DONE]
+        stream = requests.post(f"{base}/v1/chat/completions", stream=True,
+                               json={"stream": True, "messages": [{"role": "user", "content": "Solve it"}]})
+        lines = [line for line in stream.iter_lines(decode_unicode=True) if line]
+        assert lines[-1] == "data: [DONE]"
+        chunks = [json.loads(line[len("data: "):]) for line in lines[:-1]]
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+        assert "Detailed Solution" in text and len(text.split()) == 50
+        assert chunks[-1]["usage"]["completion_tokens"] == 57
+
+        assert requests.post(f"{base}/v1/unknown", json={}).status_code == 404
+        stats = requests.get(f"{base}/stats").json()
+        assert stats["by_format"] == {"gemini": 1, "openai": 1, "chat": 1, "sglang_stream": 1}
+        assert stats["by_kind"] == {"generate": 2, "verify_fail": 1, "check": 1}
+    finally:
+        server.shutdown()
+
+
+def test_verdict_script_repeats_in_order():
+    llm = mock_server.MockLLM(verdicts="pass,gap,fail")
+    payload = {"input": VERIFY}
+    assert [llm.answer(payload)[0] for _ in range(4)] == ["verify_pass", "verify_gap", "verify_fail", "verify_pass"]
+    try:
+        mock_server.MockLLM(verdicts="pass,maybe")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError for an unknown verdict")
+
+
+def test_injected_errors_and_capacity():
+    server = mock_server.start_server(latency="0", rate_429=1.0, retry_after=3)
+    url = f"http://127.0.0.1:{server.server_port}/v1/responses"
+    try:
+        response = requests.post(url, json={"input": "Solve it"})
+        assert response.status_code == 429 and response.headers["Retry-After"] == "3"
+    finally:
+        server.shutdown()
+
+    # Requests beyond the capacity in flight are turned away at once
+    server = mock_server.start_server(latency="0.3", capacity=2)
+    url = f"http://127.0.0.1:{server.server_port}/v1/responses"
+    statuses = []
+    try:
+        threads = [threading.Thread(target=lambda: statuses.append(requests.post(url, json={"input": "x"}).status_code))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(statuses) == [200, 200, 429, 429]
+        assert server.llm.snapshot()["max_in_flight"] > 2
+    finally:
+        server.shutdown()
+
+
+def test_latency_specs():
+    rng = random.Random(1)
+    assert mock_server.parse_latency("0.5")(rng) == 0.5
+    assert all(0.2 <= mock_server.parse_latency("uniform:0.2,2")(rng) <= 2 for _ in range(100))
+    assert all(mock_server.parse_latency("exp:1")(rng) >= 0 for _ in range(100))
+    samples = sorted(mock_server.parse_latency("lognormal:2,0.5")(rng) for _ in range(1001))
+    assert 1.7 < samples[500] < 2.3
+    try:
+        mock_server.parse_latency("pareto:1")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError for an unknown distribution")
+
+
+if __name__ == "__main__":
+    test_wire_formats_and_usage()
+    test_verdict_script_repeats_in_order()
+    test_injected_errors_and_capacity()
+    test_latency_specs()
+    print("All tests passed!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Test script to verify the stopping-policy simulator (solution replay, policies, costs)."""
+
+import os
+import sys
+import math
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import log_analyzer
+import policy_simulator
+
+# The initial solution passes three verdicts and then fails; its correction passes five
+VERDICTS = ["yes", "yes", "yes", "no", "yes", "yes", "yes", "yes", "yes"]
+LOG = "Logging to file: agent_00.log\n\n\n>>>>>>>>>>>>>>>>>>>>>>>>>> Run 0 of 10 ...\n>>>>>> Initial prompt.\n{}\n" + "".join(
+    f">>>>>>> Start verification.\n>>>>>>> Is verification good? (parsed from verdict)\n{verdict}\n" for verdict in VERDICTS
+) + '>>>>>>> Correct solution found.\n>>>>>>> Phase stats: {"verify": {"calls": 9, "prompt_tokens": 900, "output_tokens": 0, "cost": 0.9}}\n'
+
+
+def _profile():
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "agent_00.log"), "w") as f:
+            f.write(LOG)
+        archive = log_analyzer.analyze([tmp], jobs=1)
+    return policy_simulator.Profile(archive, {0})
+
+
+def test_profile_splits_verdicts_into_solutions():
+    profile = _profile()
+    assert profile.init_candidates == [(3, True)] and profile.corrected_candidates == [(5, False)]
+    assert profile.pass_after_pass == 6 / 7 and profile.check_share == 0.0
+    assert profile.recorded_solve_rate == 1.0 and math.isnan(profile.recorded_wall_time)
+    # Phases without logged calls cost the mean call
+    assert profile.tokens["verify"] == 100.0 and profile.tokens["correction"] == 100.0
+
+
+def test_simulate_replays_recorded_solutions():
+    profile = _profile()
+    baseline = policy_simulator.simulate(profile, policy_simulator.BASELINE, trials=10)
+    # init + self improvement, 4 verdicts, 1 correction, 5 verdicts
+    assert baseline["solve_rate"] == 1.0 and baseline["calls"] == 12 and baseline["runs"] == 1
+    assert baseline["tokens"] == 1200.0 and math.isclose(baseline["cost_per_solve"], 1.2)
+    assert math.isnan(baseline["seconds"])
+
+    eager = policy_simulator.simulate(profile, dict(policy_simulator.BASELINE, confirmations=3), trials=10)
+    assert eager["solve_rate"] == 1.0 and eager["calls"] == 5
+
+    # Beyond the five logged passes the verdicts are drawn, so a stricter policy costs more
+    strict = dict(policy_simulator.BASELINE, confirmations=7)
+    assert policy_simulator.simulate(profile, strict, trials=200)["calls"] > 14
+    assert policy_simulator.simulate(profile, strict, trials=200, seed=1) == policy_simulator.simulate(profile, strict, trials=200, seed=1)
+
+
+def test_policy_grid():
+    grid = policy_simulator.policy_grid([3, 5], [10], [30], [1, 10])
+    assert [policy_simulator.policy_label(policy) for policy in grid] == [
+        "c3 e10 i30 r1", "c3 e10 i30 r10", "c5 e10 i30 r1", "c5 e10 i30 r10"]
+
+
+if __name__ == "__main__":
+    test_profile_splits_verdicts_into_solutions()
+    test_simulate_replays_recorded_solutions()
+    test_policy_grid()
+    print("All tests passed!")
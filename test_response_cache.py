@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Test script to verify the SQLite response cache (slots, LRU eviction, TTL, bypass of fan-out verifications)."""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import mock_server
+import response_cache
+
+
+def _response(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15}}
+
+
+def test_slots_and_replay():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        payload = {"contents": [{"role": "user", "parts": [{"text": "Prove it."}]}]}
+
+        response_cache.configure_cache(path)
+        response_cache.use_cache_namespace("")
+        keys = [response_cache.cache_key("gemini", "url", payload) for _ in range(2)]
+        assert keys[0] != keys[1], "repeated samples of one prompt must get distinct slots"
+        for i, key in enumerate(keys):
+            assert response_cache.cache_get(key) is None
+            response_cache.cache_put(key, "gemini", _response(f"sample {i}"))
+
+        # A re-run replays the samples in the same order
+        response_cache.configure_cache(path)
+        response_cache.use_cache_namespace("")
+        for i in range(2):
+            key = response_cache.cache_key("gemini", "url", dict(reversed(list(payload.items()))))
+            assert response_cache.cache_get(key) == _response(f"sample {i}")
+        stats = response_cache.cache_stats()
+        assert stats["hits"] == 2 and stats["misses"] == 0 and stats["tokens_saved"] == 30
+
+        # Another namespace samples on its own
+        response_cache.use_cache_namespace("agent_01")
+        assert response_cache.cache_get(response_cache.cache_key("gemini", "url", payload)) is None
+
+        with response_cache.bypass_cache():
+            assert response_cache.cache_key("gemini", "url", payload) is None
+        response_cache.close_cache()
+
+
+def test_lru_eviction_and_ttl():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = response_cache.ResponseCache(os.path.join(tmp, "cache.db"), max_bytes=2000)
+        big = _response(os.urandom(600).hex())
+        cache.put("a", "gemini", big)
+        cache.put("b", "gemini", big)
+        time.sleep(0.01)
+        assert cache.get("a") is not None  # "a" is now more recently used than "b"
+        cache.put("c", "gemini", big)
+        assert cache.evictions == 1
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        cache.close()
+
+        # Puts below the limit do not scan the table; another writer's entries count once it is crossed
+        cache = response_cache.ResponseCache(os.path.join(tmp, "cache.db"), max_bytes=2000)
+        other = response_cache.ResponseCache(os.path.join(tmp, "cache.db"))
+        statements = []
+        cache._db.set_trace_callback(statements.append)
+        cache.put("d", "gemini", _response("small"))
+        assert not any("SUM" in statement for statement in statements)
+        other.put("e", "gemini", big)
+        other.put("f", "gemini", big)
+        cache.put("g", "gemini", big)
+        assert any("SUM" in statement for statement in statements) and cache.evictions > 0
+        assert cache._size <= 2000
+        other.close()
+        cache.close()
+
+        cache = response_cache.ResponseCache(os.path.join(tmp, "cache.db"), ttl=0.05)
+        time.sleep(0.1)
+        assert cache.get("a") is None
+        cache.close()
+
+
+def test_fan_out_verifications_bypass_the_cache():
+    import agent
+    with tempfile.TemporaryDirectory() as tmp:
+        server = mock_server.start_server(latency="0", verdicts="pass")
+        os.environ.setdefault("GOOGLE_API_KEY", "test")
+        agent.API_URL = f"http://127.0.0.1:{server.server_port}/v1beta/models/{agent.MODEL_NAME}:generateContent"
+        response_cache.configure_cache(os.path.join(tmp, "cache.db"))
+        try:
+            for _ in range(2):
+                response_cache.use_cache_namespace("")
+                assert agent.confirm_solution("Problem", "Solution", 2)[0] == 2
+            # Both runs were sampled fresh and nothing was stored
+            assert server.llm.snapshot()["by_kind"] == {"verify_pass": 4}
+            assert response_cache.cache_stats()["stores"] == 0
+        finally:
+            response_cache.close_cache()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    test_slots_and_replay()
+    test_lru_eviction_and_ttl()
+    test_fan_out_verifications_bypass_the_cache()
+    print("All tests passed!")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Test script to verify agent result records (collection, file round trip, aggregation)."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import checkpoint
+import result_record
+from usage import record_usage
+
+
+def _response(prompt, output):
+    return {"usage": {"prompt_tokens": prompt, "completion_tokens": output, "total_tokens": prompt + output}}
+
+
+def test_record_collects_runs_usage_and_verification():
+    record = result_record.ResultRecord(agent_id=3)
+    with record:
+        checkpoint.set_state(run=0, iteration=4)
+        record_usage(_response(100, 20))
+        result_record.note_verification("fail", "parsed", "bug")
+        record.finish_run(0, None, error="boom")
+        checkpoint.set_state(run=1, iteration=1)
+        record_usage(_response(50, 10))
+        result_record.note_verification("pass", "llm", "")
+        record.finish_run(1, "proof")
+    # Outside the block nothing is recorded any more
+    record_usage(_response(1000, 1000))
+    result_record.note_verification("fail", "parsed", "late")
+
+    data = record.as_dict()
+    assert data["agent_id"] == 3
+    assert data["solved"] and data["solution"] == "proof" and data["solved_in_run"] == 1
+    assert data["runs"] == 2 and data["iterations"] == 7
+    assert data["calls"] == 2 and data["total_tokens"] == 180
+    assert data["last_verification"] == {"verdict": "pass", "source": "llm", "bug_report": ""}
+    assert data["errors"] == ["run 0: boom"]
+
+
+def test_write_and_read_round_trip():
+    record = result_record.ResultRecord(agent_id=1)
+    with record:
+        record.finish_run(0, "proof")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agent_01.result.json")
+        record.write(path)
+        assert result_record.read_result(path) == record.as_dict()
+        assert os.listdir(tmp) == ["agent_01.result.json"]
+        assert result_record.read_result(os.path.join(tmp, "missing.json")) is None
+
+
+def test_summarize_skips_missing_records():
+    records = [
+        {"solved": True, "runs": 1, "iterations": 3, "calls": 5, "total_tokens": 100, "wall_time": 2.0},
+        None,
+        {"solved": False, "runs": 2, "iterations": 4, "calls": 7, "total_tokens": 50, "wall_time": 4.0},
+    ]
+    summary = result_record.summarize(records)
+    assert summary["agents"] == 2 and summary["solved"] == 1
+    assert summary["runs"] == 3 and summary["iterations"] == 7
+    assert summary["calls"] == 12 and summary["total_tokens"] == 150 and summary["prompt_tokens"] == 0
+    assert summary["mean_wall_time"] == 3.0 and summary["max_wall_time"] == 4.0
+
+
+if __name__ == "__main__":
+    test_record_collects_runs_usage_and_verification()
+    test_write_and_read_round_trip()
+    test_summarize_skips_missing_records()
+    print("All tests passed!")
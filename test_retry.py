@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Test script to verify the retry policy (error classes, Retry-After, budgets)."""
+
+import os
+import sys
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import retry
+
+
+def _http_error(status, headers=None):
+    response = requests.models.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(f"{status} Error", response=response)
+
+
+def test_classify():
+    assert retry.classify(_http_error(429)) == "rate_limit"
+    assert retry.classify(_http_error(503)) == "server_error"
+    assert retry.classify(_http_error(400)) is None
+    assert retry.classify(requests.exceptions.ConnectionError("reset")) == "connection"
+    assert retry.classify(requests.exceptions.ReadTimeout("slow")) == "connection"
+
+
+def test_retry_after_and_backoff():
+    config = retry.get_retry_config("test")
+    assert retry.retry_after(_http_error(429, {"Retry-After": "7"}), config) == 7.0
+    assert retry.retry_after(_http_error(429, {"Retry-After": "100000"}), config) == config["max_retry_after"]
+    assert retry.retry_after(_http_error(429), config) is None
+    for n in range(10):
+        assert 0 <= retry.backoff_delay(n, config) <= config["max_delay"]
+
+
+def test_budgets():
+    retry.configure_retry("test", rate_limit=2, server_error=1, base_delay=0.0)
+    errors = [_http_error(429, {"Retry-After": "0"}), _http_error(500), _http_error(429, {"Retry-After": "0"})]
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert retry.call_with_retry("test", attempt) == "ok"
+    assert len(calls) == 4
+    assert retry.retry_stats()["test"]["retries"] == {"rate_limit": 2, "server_error": 1}
+
+    # A third 5xx exceeds the budget of 1 and is raised
+    errors[:] = [_http_error(500), _http_error(500)]
+    try:
+        retry.call_with_retry("test", attempt)
+        assert False, "expected HTTPError"
+    except requests.exceptions.HTTPError:
+        pass
+    assert retry.retry_stats()["test"]["gave_up"] == {"server_error": 1}
+
+    # Client errors are never retried
+    errors[:] = [_http_error(400)]
+    calls.clear()
+    try:
+        retry.call_with_retry("test", attempt)
+        assert False, "expected HTTPError"
+    except requests.exceptions.HTTPError:
+        pass
+    assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_retry_after_and_backoff()
+    test_budgets()
+    print("All tests passed!")
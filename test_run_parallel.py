@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Test script to verify run_parallel.py (output capture, cancellation, in-process agents, sweep resume)."""
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import tempfile
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code')
+sys.path.insert(0, CODE_DIR)
+import mock_server
+import run_parallel
+import sweep_manifest
+
+# An "agent" that ignores SIGTERM, so only SIGKILL stops it
+STUBBORN_AGENT = """import signal, time
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+print("ready", flush=True)
+time.sleep(60)
+"""
+
+
+def _mock_env(server):
+    """Environment that points agent.py subprocesses at the mock server."""
+    return dict(os.environ, GOOGLE_API_KEY="test",
+                GEMINI_API_URL=f"http://127.0.0.1:{server.server_port}/v1beta/models/gemini-2.5-pro:generateContent")
+
+
+def _write_problem(tmp):
+    path = os.path.join(tmp, "problem.txt")
+    with open(path, "w") as f:
+        f.write("Prove that 1 + 1 = 2.")
+    return path
+
+
+def _cancel_after(path, delay):
+    def create():
+        time.sleep(delay)
+        with open(path, "w"):
+            pass
+    threading.Thread(target=create, daemon=True).start()
+
+
+def test_output_capture_keeps_head_and_tail():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agent_00.stdout")
+        script = "import sys\nfor i in range(30000): sys.stdout.write(f'line {i:05d}\\n')\n"
+        process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE)
+        capture = run_parallel.OutputCapture(process.stdout, path, 100 * 1024)
+        process.wait()
+        capture.join()
+        with open(path, "rb") as f:
+            kept = f.read()
+    total = 30000 * len("line 00000\n")
+    assert capture.summary() == {"path": path, "bytes": total, "dropped": total - 100 * 1024}
+    assert kept.startswith(b"line 00000\n") and kept.endswith(b"line 29999\n")
+    assert f"[{total - 100 * 1024} bytes dropped, output capped at {100 * 1024} bytes]".encode() in kept
+    assert capture.last_lines(2) == "line 29998\nline 29999"
+
+
+def test_cancel_file_stops_agent_subprocess_with_its_record():
+    # Every request hangs, so the agent is stuck in its first call when it is cancelled
+    server = mock_server.start_server(latency="30")
+    poll_interval, environ = run_parallel.CANCEL_POLL_INTERVAL, dict(os.environ)
+    run_parallel.CANCEL_POLL_INTERVAL = 0.1
+    os.environ.update(_mock_env(server))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cancel_file = os.path.join(tmp, "cancel")
+            _cancel_after(cancel_file, 2)
+            started = time.time()
+            agent_id, return_code, output, error, record = run_parallel.run_agent(
+                0, _write_problem(tmp), tmp, timeout=60, cancel_file=cancel_file)
+            assert time.time() - started < 2 + run_parallel.CANCEL_GRACE_PERIOD
+            assert return_code == -1 and error == "Agent 0 cancelled"
+            # The agent wrote its record on SIGTERM
+            assert record is not None and record["agent_id"] == 0 and not record["solved"]
+            assert output["stdout"]["path"] == os.path.join(tmp, "agent_00.stdout")
+    finally:
+        run_parallel.CANCEL_POLL_INTERVAL = poll_interval
+        os.environ.clear()
+        os.environ.update(environ)
+        server.shutdown()
+
+
+def test_agent_ignoring_sigterm_is_killed():
+    poll_interval, grace_period = run_parallel.CANCEL_POLL_INTERVAL, run_parallel.CANCEL_GRACE_PERIOD
+    run_parallel.CANCEL_POLL_INTERVAL, run_parallel.CANCEL_GRACE_PERIOD = 0.1, 0.5
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            agent_file = os.path.join(tmp, "stubborn_agent.py")
+            with open(agent_file, "w") as f:
+                f.write(STUBBORN_AGENT)
+            cancel_file = os.path.join(tmp, "cancel")
+            _cancel_after(cancel_file, 1)
+            started = time.time()
+            result = run_parallel.run_agent(0, "problem.txt", tmp, agent_file=agent_file, cancel_file=cancel_file)
+            # SIGTERM is ignored; SIGKILL follows after the grace period
+            assert time.time() - started < 5
+            assert result[1] == -1 and result[3] == "Agent 0 cancelled" and result[4] is None
+            with open(os.path.join(tmp, "agent_00.stdout")) as f:
+                assert f.read() == "ready\n"
+
+            started = time.time()
+            result = run_parallel.run_agent(1, "problem.txt", tmp, timeout=1, agent_file=agent_file)
+            assert time.time() - started < 5
+            assert result[1] == -1 and result[3] == "Agent 1 timed out after 1 seconds"
+    finally:
+        run_parallel.CANCEL_POLL_INTERVAL, run_parallel.CANCEL_GRACE_PERIOD = poll_interval, grace_period
+
+
+def test_in_process_agents_solve_and_stop_when_cancelled():
+    module = run_parallel._load_agent_module("agent.py")
+    os.environ.setdefault("GOOGLE_API_KEY", "test")
+    server = mock_server.start_server(latency="0", verdicts="pass")
+    module.API_URL = f"http://127.0.0.1:{server.server_port}/v1beta/models/{module.MODEL_NAME}:generateContent"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run_parallel.run_agents_in_process([0, 1], _write_problem(tmp), tmp, max_runs=2)
+            assert [(r[0], r[1], r[3]) for r in results] == [(0, 0, ""), (1, 0, "")]
+            assert all(r[4]["solved"] for r in results)
+            with open(os.path.join(tmp, "agent_01.result.json")) as f:
+                assert json.load(f)["solved"]
+    finally:
+        server.shutdown()
+
+    # Verifications always fail and take a while; the agent is cancelled in the middle of its first run
+    server = mock_server.start_server(latency="0.1", verdicts="fail")
+    module.API_URL = f"http://127.0.0.1:{server.server_port}/v1beta/models/{module.MODEL_NAME}:generateContent"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cancel_file = os.path.join(tmp, "cancel")
+            _cancel_after(cancel_file, 1)
+            started = time.time()
+            [result] = run_parallel.run_agents_in_process([0], _write_problem(tmp), tmp, max_runs=3,
+                                                          cancel_files=[cancel_file])
+            assert time.time() - started < 2
+            assert result[1] == -1 and result[3] == "Agent 0 cancelled"
+            assert result[4]["runs"] == 1 and not result[4]["solved"]
+    finally:
+        server.shutdown()
+
+
+def test_agent_loop_stops_when_cancelled():
+    import api_client
+    import agent_oai
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    server = mock_server.start_server(latency="0", verdicts="fail")
+    agent_oai.API_URL = f"http://127.0.0.1:{server.server_port}/v1/responses"
+    checks = []
+    # Cancelled from the 6th request on, inside the correction loop
+    api_client.set_cancel_check(lambda: checks.append(1) or len(checks) > 5)
+    try:
+        agent_oai.agent("Problem")
+    except api_client.AgentCancelled:
+        pass
+    else:
+        raise AssertionError("expected AgentCancelled")
+    finally:
+        api_client.set_cancel_check(None)
+        server.shutdown()
+    # The iteration's error handler does not swallow the cancellation
+    assert server.llm.snapshot()["requests"] == 5 and len(checks) == 6
+
+
+def _sweep(log_dir, env, *extra):
+    command = [sys.executable, os.path.join(CODE_DIR, "run_parallel.py"), "--benchmark", "proofbench",
+               "--attempts-per-problem", "2", "--num-problems", "2", "--max-workers", "1",
+               "--log-dir", log_dir, *extra]
+    return subprocess.run(command, env=env, capture_output=True, text=True, timeout=300)
+
+
+def test_sweep_skips_solved_problems_and_resumes_unfinished_jobs():
+    server = mock_server.start_server(latency="0", verdicts="pass")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            finished = _sweep(tmp, _mock_env(server))
+            assert finished.returncode == 0, finished.stdout + finished.stderr
+            path = os.path.join(tmp, "sweep_manifest.json")
+            with open(path) as f:
+                settings = json.load(f)["settings"]
+            manifest = sweep_manifest.SweepManifest.load(path, settings)
+            # With one worker, the first attempt of each problem solves it before the second can start
+            assert manifest.solved_by() == {0: 0, 1: 2}
+            assert manifest.counts() == {"solved": 2, "skipped": 2}
+
+            # Resuming a finished sweep runs nothing
+            calls = server.llm.snapshot()["requests"]
+            resumed = _sweep(tmp, _mock_env(server), "--resume")
+            assert "0 jobs were running, 0 pending" in resumed.stdout
+            assert server.llm.snapshot()["requests"] == calls
+
+            # Interrupted while problem 1 was running: only its attempts are queued again
+            manifest.update(2, sweep_manifest.RUNNING)
+            manifest.update(3, sweep_manifest.PENDING)
+            first_log = os.path.getmtime(os.path.join(tmp, "agent_00.log"))
+            resumed = _sweep(tmp, _mock_env(server), "--resume")
+            assert resumed.returncode == 0, resumed.stdout + resumed.stderr
+            assert "1 jobs were running, 1 pending" in resumed.stdout
+            manifest = sweep_manifest.SweepManifest.load(path, settings)
+            assert manifest.jobs[2]["state"] == sweep_manifest.SOLVED
+            assert manifest.jobs[3]["state"] == sweep_manifest.SKIPPED
+            assert os.path.getmtime(os.path.join(tmp, "agent_00.log")) == first_log
+            assert server.llm.snapshot()["requests"] > calls
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_output_capture_keeps_head_and_tail()
+    test_cancel_file_stops_agent_subprocess_with_its_record()
+    test_agent_ignoring_sigterm_is_killed()
+    test_in_process_agents_solve_and_stop_when_cancelled()
+    test_agent_loop_stops_when_cancelled()
+    test_sweep_skips_solved_problems_and_resumes_unfinished_jobs()
+    print("All tests passed!")
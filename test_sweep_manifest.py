@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Test script to verify the sweep manifest (atomic writes, resume order, settings check)."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import sweep_manifest
+from sweep_manifest import SweepManifest
+
+SETTINGS = {"benchmark": "proofbench", "num_problems": 2, "attempts_per_problem": 2}
+JOBS = [(0, 0, 0), (2, 1, 0), (1, 0, 1), (3, 1, 1)]
+
+
+def test_resume_requeues_in_flight_jobs_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sweep_manifest.json")
+        manifest = SweepManifest(path, SETTINGS, JOBS)
+        manifest.write()
+        manifest.update(0, sweep_manifest.RUNNING)
+        manifest.update(2, sweep_manifest.RUNNING)
+        manifest.update(0, sweep_manifest.SOLVED, 0, "", "agent_00.result.json")
+        manifest.update(1, sweep_manifest.RUNNING)
+        # Only the manifest itself is left behind, no temporary file
+        assert os.listdir(tmp) == ["sweep_manifest.json"]
+
+        resumed = SweepManifest.load(path, SETTINGS)
+        assert resumed.unfinished() == [(2, 1, 0), (1, 0, 1), (3, 1, 1)]
+        assert resumed.solved_by() == {0: 0}
+        assert resumed.jobs[0]["result"] == "agent_00.result.json"
+        assert resumed.counts() == {"solved": 1, "running": 2, "pending": 1}
+
+
+def test_load_rejects_other_settings():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sweep_manifest.json")
+        SweepManifest(path, SETTINGS, JOBS).write()
+        try:
+            SweepManifest.load(path, dict(SETTINGS, attempts_per_problem=3))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    test_resume_requeues_in_flight_jobs_first()
+    test_load_rejects_other_settings()
+    print("All tests passed!")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Test script to verify phase tracing (nesting, branch lanes, Chrome trace merge)."""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+import checkpoint
+import tracing
+from fanout import FanOut
+
+
+@tracing.traced("verify_solution")
+def _verify():
+    with tracing.span("check"):
+        pass
+    return "yes"
+
+
+def _spans(tracer):
+    return [event for event in tracer.as_dict()["traceEvents"] if event["ph"] == "X"]
+
+
+def test_spans_nest_and_branches_get_lanes():
+    tracer = tracing.Tracer("Agent 00", pid=1)
+    tracing.use_tracer(tracer)
+    try:
+        checkpoint.set_state(run=0, iteration=2)
+        with tracing.span("confirm_solution"):
+            with FanOut([_verify, _verify]) as results:
+                assert [result for _, result in results] == ["yes", "yes"]
+        _verify()
+    finally:
+        tracing.use_tracer(None)
+
+    spans = _spans(tracer)
+    assert sorted(span["name"] for span in spans) == ["check"] * 3 + ["confirm_solution"] + ["verify_solution"] * 3
+    confirm = next(span for span in spans if span["name"] == "confirm_solution")
+    assert confirm["tid"] == 1 and confirm["args"]["run"] == 0 and confirm["args"]["iteration"] == 2
+    # The parallel verifications run on lanes of their own, linked to the span that started them
+    branches = [span for span in spans if span["name"] == "verify_solution" and span["tid"] != 1]
+    assert len(branches) == 2
+    flows = [event for event in tracer.as_dict()["traceEvents"] if event["ph"] in ("s", "f")]
+    assert len(flows) == 4 and {event["tid"] for event in flows if event["ph"] == "s"} == {1}
+    for branch in branches:
+        # Branches that do not overlap may share a lane; take the check that started in this one
+        check = min((span for span in spans if span["name"] == "check" and span["tid"] == branch["tid"]
+                     and span["ts"] >= branch["ts"]), key=lambda span: span["ts"])
+        assert branch["ts"] <= check["ts"] and check["ts"] + check["dur"] <= branch["ts"] + branch["dur"]
+
+
+def test_no_tracer_records_nothing_and_errors_are_kept():
+    assert _verify() == "yes"
+    tracer = tracing.Tracer()
+    tracing.use_tracer(tracer)
+    try:
+        with tracing.span("correction"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    finally:
+        tracing.use_tracer(None)
+    assert _spans(tracer)[0]["args"]["error"] == "ValueError"
+
+
+def test_merge_moves_each_agent_to_its_own_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = tracing.Tracer("agent")
+        tracing.use_tracer(agent)
+        tracing.add_span("api_call", 100.0, provider="gemini")
+        tracing.use_tracer(None)
+        agent.write(os.path.join(tmp, "agent_03.trace.json"))
+
+        scheduler = tracing.Tracer("run_parallel", pid=0)
+        scheduler.add("queued", 99.0, 100.0, "schedule", scheduler.lane("Agent 03"))
+        path = os.path.join(tmp, "trace.json")
+        found = tracing.merge_traces(path, scheduler, {4: ("Agent 03", os.path.join(tmp, "agent_03.trace.json")),
+                                                       5: ("Agent 04", os.path.join(tmp, "missing.json"))})
+        assert found == 1
+        with open(path) as f:
+            events = json.load(f)["traceEvents"]
+        assert {event["pid"] for event in events} == {0, 4}
+        names = [event["args"]["name"] for event in events if event["name"] == "process_name"]
+        assert names == ["run_parallel", "Agent 03"]
+        assert tracing.trace_bounds(os.path.join(tmp, "agent_03.trace.json"))[0] == 100.0
+
+
+def test_merged_flow_ids_stay_within_their_agent():
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = tracing.Tracer("agent")
+        agent.add("branch", 100.0, 101.0, tid=agent.lane("branch"), parent=tracing._Span(agent, agent.lane()))
+        agent.write(os.path.join(tmp, "agent_00.trace.json"))
+        # Agents in other processes count flow ids from 1 as well; an old trace uses global ids
+        with open(os.path.join(tmp, "agent_00.trace.json")) as f:
+            trace = json.load(f)
+        for event in trace["traceEvents"]:
+            if "id2" in event:
+                event["id"] = event.pop("id2")["local"]
+        with open(os.path.join(tmp, "agent_01.trace.json"), "w") as f:
+            json.dump(trace, f)
+
+        path = os.path.join(tmp, "trace.json")
+        traces = {pid + 1: (f"Agent {pid:02d}", os.path.join(tmp, f"agent_{pid:02d}.trace.json")) for pid in (0, 1)}
+        assert tracing.merge_traces(path, tracing.Tracer("run_parallel", pid=0), traces) == 2
+        with open(path) as f:
+            flows = [event for event in json.load(f)["traceEvents"] if event.get("cat") == "flow"]
+        assert len(flows) == 4 and not any("id" in event for event in flows)
+        # The same id in two processes names two flows, each with its start and end
+        assert {event["id2"]["local"] for event in flows} == {flows[0]["id2"]["local"]}
+        assert sorted((event["pid"], event["ph"]) for event in flows) == [(1, "f"), (1, "s"), (2, "f"), (2, "s")]
+
+
+if __name__ == "__main__":
+    test_spans_nest_and_branches_get_lanes()
+    test_no_tracer_records_nothing_and_errors_are_kept()
+    test_merge_moves_each_agent_to_its_own_process()
+    test_merged_flow_ids_stay_within_their_agent()
+    print("All tests passed!")
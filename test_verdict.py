@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Test script to verify parse_verdict reads the verifier's summary correctly."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'code'))
+from verdict import parse_verdict
+
+# Test cases: (name, verifier output, expected verdict)
+test_cases = [
+    ("Correct, no findings",
+     "### Summary ###\n\n**Final Verdict:** The solution is correct.\n\n**List of Findings:**\n*   None.\n\n"
+     "### Detailed Verification Log ###\nStep 2 has no justification gap.",
+     True),
+    ("Invalid with a Critical Error",
+     "**Final Verdict:** The solution is **invalid** because it contains a Critical Error.\n\n"
+     "**List of Findings:**\n*   **Location:** \"...\"\n    *   **Issue:** Critical Error - a logical fallacy.",
+     False),
+    ("Correct verdict but a Critical Error finding",
+     "**Final Verdict:** The solution is correct.\n\n**List of Findings:**\n*   **Issue:** Critical Error - step 3.",
+     False),
+    ("Only Justification Gaps is left to the LLM",
+     "**Final Verdict:** The solution's approach is viable but contains several Justification Gaps.\n\n"
+     "**List of Findings:**\n*   **Issue:** Justification Gap - there is no justification for the limit.",
+     None),
+    ("Negated issues in the verdict",
+     "**Final Verdict:** The solution is correct and contains no critical errors or justification gaps.",
+     True),
+    ("Not correct",
+     "**Final Verdict:** The solution is not fully correct.",
+     False),
+    ("Verdict on the next line",
+     "**Final Verdict:**\nThe solution is complete and rigorous.\n\n**List of Findings:**\nNo issues were found.",
+     True),
+    ("Draft verdict before the final summary",
+     "Thinking... Final Verdict: the solution is invalid? Let me re-check.\n"
+     "### Summary ###\n**Final Verdict:** The solution is correct.\n\n**List of Findings:**\n* None",
+     True),
+    # Real verdicts from run_logs_grok4/solution_p1_grok4.log and run_logs_gpt5/solution_p3_gpt5.log, solution_p4_gpt5.log
+    ("Neither Critical Errors nor Justification Gaps",
+     "**Summary**\n\n**Final Verdict:** The solution is correct, as all steps are rigorously justified, and it arrives "
+     "at the right answer through sound reasoning.\n\n**List of Findings:**  \nNo issues were identified; the solution "
+     "contains neither Critical Errors nor Justification Gaps.\n\n**Detailed Verification Log**\n",
+     True),
+    ("Gaps make the write-up not fully rigorous",
+     "Summary\n\nFinal Verdict: The solution\u2019s approach is essentially correct but contains a few Justification Gaps "
+     "and a minor mis-citation; the final result appears valid, yet the write-up is not fully rigorous as stated.\n\n"
+     "List of Findings:\n- Location: \u201cHence f(b) \u2261 b (mod p).\u201d\n  - Issue: Justification Gap \u2014 one "
+     "must argue that p \u2224 f(b) when p \u2224 b.\n",
+     None),
+    ("Gaps and a slip, therefore not fully rigorous",
+     "Summary\n\nFinal Verdict: The solution\u2019s overall approach is sound and leads to the correct characterization, "
+     "but it contains several Justification Gaps and one minor arithmetic slip in an intermediate step; therefore, the "
+     "write-up is not fully rigorous as stated.\n\nList of Findings:\n- Location: \u201c(34/105)M \u2265 34/105 > 1\u201d\n"
+     "  - Issue: Justification Gap \u2014 The parenthetical justification is false. While the intended inequality is "
+     "true, the stated reason is invalid.\n",
+     None),
+    ("Not rigorous because of a Critical Error",
+     "**Final Verdict:** The solution contains a Critical Error and is not rigorous.",
+     False),
+    ("Correct answer but major gaps in the proof",
+     "**Final Verdict:** The solution reaches the correct answer but the proof has major gaps.",
+     None),
+    ("Correct answer despite a flaw",
+     "**Final Verdict:** The final answer is correct, though the argument has a flaw in the second case.",
+     None),
+    ("Correct verdict but an unclassified finding",
+     "**Final Verdict:** The solution is correct.\n\n**List of Findings:**\n*   **Location:** \"...\"\n"
+     "    *   **Issue:** the bound is unjustified.",
+     None),
+    ("No verdict", "I could not finish the verification.", None),
+    ("Empty", "", None),
+]
+
+
+def test_parse_verdict():
+    for name, text, expected in test_cases:
+        assert parse_verdict(text) is expected, name
+
+
+if __name__ == "__main__":
+    print("Testing parse_verdict function...")
+    print("=" * 80)
+    all_passed = True
+    for i, (name, text, expected) in enumerate(test_cases, 1):
+        result = parse_verdict(text)
+        status = "PASSED" if result is expected else "FAILED"
+        all_passed = all_passed and result is expected
+        print(f"Test {i}: {name}: {status} (expected {expected}, got {result})")
+    print("=" * 80)
+    print("All tests passed!" if all_passed else "Some tests failed!")
+    sys.exit(0 if all_passed else 1)